@@ -0,0 +1,567 @@
+"""
+AI分析报告 - 读取大模型接口配置、整理答题解析、调用大模型生成报告。
+路由在生成报告时才导入本模块，httpx 等依赖不计入服务启动耗时。
+
+报告以流式接口生成：已生成的文本保存在进行中的生成（ReportStream）里，多个连接可以同时读取，
+客户端断开不影响生成，完成后保存到考试记录。同一条记录同时只有一个生成任务。
+"""
+
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+from sqlalchemy.orm import Session
+
+from . import live_feed, llm_guard, llm_usage
+from .config import settings
+from .models import ExamRecord as ExamRecordModel, SystemConfig as SystemConfigModel
+from .report_prompt import compact_wrong_answers, estimate_tokens
+
+logger = logging.getLogger("exam_system.ai_report")
+
+
+class AIReportError(Exception):
+    """报告生成失败，错误信息可直接返回给前端；provider_failure 表示接口不可用（计入熔断）"""
+
+    def __init__(self, message: str, provider_failure: bool = False):
+        super().__init__(message)
+        self.provider_failure = provider_failure
+
+
+def load_api_config(db: Session) -> Optional[dict]:
+    """读取大模型接口配置：优先使用系统配置，其次使用环境变量，都没有时返回 None"""
+    api_config_record = db.query(SystemConfigModel).filter(
+        SystemConfigModel.key == "api_config"
+    ).first()
+
+    api_config = None
+    if api_config_record and api_config_record.value:
+        try:
+            api_config = json.loads(api_config_record.value)
+        except:
+            pass
+
+    # 如果数据库没有配置，使用环境变量
+    if not api_config or not api_config.get('key'):
+        env_api_key = getattr(settings, 'qwen_api_key', '')
+        if not env_api_key:
+            return None
+        api_config = {
+            "provider": "qwen",
+            "url": getattr(settings, 'qwen_api_url', 'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation'),
+            "model": getattr(settings, 'qwen_model', 'qwen-turbo'),
+            "key": env_api_key
+        }
+    return api_config
+
+
+def _analysis(questions_data: list) -> List[dict]:
+    return [{
+        "question": q_data.get("question", ""),
+        "category": q_data.get("category", ""),
+        "type": q_data.get("question_type", "single"),
+        "correct_answer": q_data.get("correct_answer", ""),
+        "user_answer": q_data.get("user_answer", ""),
+        "is_correct": q_data.get("is_correct", False),
+        "explanation": q_data.get("explanation", "")
+    } for q_data in questions_data]
+
+
+def legacy_question_analysis(exam_record: ExamRecordModel, db: Session) -> List[dict]:
+    """没有 questions_data 的旧记录：按 detailed_answers 还原题目（见 legacy_answers），无法还原时返回空列表"""
+    from .legacy_answers import rebuild
+
+    return _analysis(rebuild(db, [exam_record]).get(exam_record.id) or [])
+
+
+def question_analysis(exam_record: ExamRecordModel, db: Session) -> List[dict]:
+    """优先使用前端传递的完整题目数据，没有时按作答还原（保持兼容性）"""
+    analysis = []
+    if exam_record.questions_data:
+        try:
+            questions_data = exam_record.questions_data
+            if isinstance(questions_data, str):
+                questions_data = json.loads(questions_data)
+            analysis = _analysis(questions_data)
+        except Exception as e:
+            logger.warning("解析题目数据失败（%s）: %s", exam_record.id, e)
+            analysis = []
+
+    if not analysis:
+        analysis = legacy_question_analysis(exam_record, db)
+    return analysis
+
+
+def build_prompt(exam_record: ExamRecordModel, analysis: List[dict]) -> str:
+    """生成报告提示词"""
+    return f"""
+基于以下测验结果，请为医药代表生成一份简洁的专业评价报告：
+
+**测验信息：**
+- 姓名：{exam_record.user_name}
+- 得分：{exam_record.score}分（满分100分）
+- 正确率：{exam_record.correct_count}/{exam_record.total_questions} = {round(exam_record.correct_count/exam_record.total_questions*100, 1)}%
+- 用时：{exam_record.duration // 60}分{exam_record.duration % 60}秒
+
+**错题：**
+{compact_wrong_answers(analysis)[0]}
+
+请提供：
+1. **简要表现评价**（2-3句话）
+2. **错题专业解析**（针对每道错题，简述知识点和正确理解）
+3. **改进建议**（2-3条具体建议）
+4. **学习重点**（推荐重点学习的知识模块）
+
+要求：
+- 内容简洁实用，总字数控制在500字以内
+- 专业术语准确，重点突出实用性
+- 针对医药代表工作需要提供指导
+        """
+
+
+# 修改共享报告提示词时递增，使已缓存的报告正文失效
+SHARED_PROMPT_VERSION = 3
+
+# 自动生成报告的参数（减少token限制以保持简洁，降低温度以提高准确性）
+AUTO_REPORT_MAX_TOKENS = 1000
+AUTO_REPORT_TEMPERATURE = 0.3
+
+SHARED_REPORT_REQUIREMENTS = """请提供：
+1. **简要表现评价**（2-3句话）
+2. **错题专业解析**（针对每道错题，简述知识点和正确理解）
+3. **改进建议**（2-3条具体建议）
+4. **学习重点**（推荐重点学习的知识模块）
+
+要求：
+- 内容简洁实用，总字数控制在500字以内
+- 专业术语准确，重点突出实用性
+- 针对医药代表工作需要提供指导
+- 报告会同时发给答错相同题目的多位学员，不要称呼姓名，也不要提及具体分数和用时"""
+
+
+def shared_case(exam_record: ExamRecordModel, analysis: List[dict]) -> str:
+    """共享报告提示词中的测验信息：只包含得分区间和错题"""
+    from .report_cache import score_band
+
+    wrong = sum(1 for item in analysis if not item.get("is_correct"))
+    # 没有答题明细时不写答错题数：正文按得分区间共享，具体题数各不相同
+    counts = f"题目数：{exam_record.total_questions}，答错：{wrong}" if analysis else f"题目数：{exam_record.total_questions}"
+    return f"""**测验信息：**
+- 得分区间：{score_band(exam_record.score)}（满分100分）
+- {counts}
+
+**错题：**
+{compact_wrong_answers(analysis)[0]}"""
+
+
+def build_shared_prompt(exam_record: ExamRecordModel, analysis: List[dict]) -> str:
+    """生成可在答错相同题目的学员之间复用的报告提示词，不含姓名和具体得分"""
+    return f"""
+基于以下测验结果，请为医药代表生成一份简洁的专业评价报告。
+
+{shared_case(exam_record, analysis)}
+
+{SHARED_REPORT_REQUIREMENTS}
+        """
+
+
+def report_key(exam_record: ExamRecordModel, analysis: List[dict], api_config: dict,
+               max_tokens: int, temperature: float) -> str:
+    """报告正文的缓存键（错题指纹 + 模型和生成参数）"""
+    from .report_cache import fingerprint
+
+    return fingerprint(analysis, exam_record.score, exam_record.total_questions, {
+        "model": api_config.get("model"), "url": api_config.get("url"),
+        "max_tokens": max_tokens, "temperature": temperature, "prompt": SHARED_PROMPT_VERSION
+    })
+
+
+def report_header(exam_record: ExamRecordModel) -> str:
+    """报告开头的个人信息，按记录单独生成"""
+    accuracy = round(exam_record.correct_count / exam_record.total_questions * 100, 1) if exam_record.total_questions else 0
+    return (
+        f"**{exam_record.user_name}** 本次测验得分 {exam_record.score} 分（满分100分），"
+        f"答对 {exam_record.correct_count}/{exam_record.total_questions} 题（正确率 {accuracy}%），"
+        f"用时 {exam_record.duration // 60}分{exam_record.duration % 60}秒。\n\n"
+    )
+
+
+class TokenUsage:
+    """大模型调用的token数（可累加多次调用）；接口未返回用量时按提示词和输出文本估算"""
+
+    __slots__ = ("prompt_tokens", "completion_tokens", "estimated")
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated = False
+
+    def merge(self, other: "TokenUsage"):
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.estimated = self.estimated or other.estimated
+
+    def add(self, data: Optional[dict], prompt: str, completion: str):
+        data = data or {}
+        # OpenAI兼容格式为 prompt/completion_tokens，原生接口为 input/output_tokens
+        prompt_tokens = data.get("prompt_tokens", data.get("input_tokens"))
+        completion_tokens = data.get("completion_tokens", data.get("output_tokens"))
+        if prompt_tokens is None or completion_tokens is None:
+            self.estimated = True
+            prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+        self.prompt_tokens += int(prompt_tokens)
+        self.completion_tokens += int(completion_tokens)
+
+
+def _build_request(api_config: dict, prompt: str, max_tokens: int, temperature: float, stream: bool = False):
+    """返回 (请求头, 请求体, 是否OpenAI兼容格式)"""
+    provider = api_config.get('provider', 'qwen')
+    url = api_config['url']
+
+    # 判断是否使用OpenAI兼容格式
+    is_openai_compatible = 'compatible-mode' in url or 'chat/completions' in url or provider != 'qwen'
+
+    headers = {
+        "Authorization": f"Bearer {api_config['key']}",
+        "Content-Type": "application/json"
+    }
+
+    if is_openai_compatible:
+        # OpenAI兼容格式
+        payload = {
+            "model": api_config['model'],
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+    else:
+        # 原生Qwen格式
+        payload = {
+            "model": api_config['model'],
+            "input": {
+                "messages": [
+                    {"role": "user", "content": prompt}
+                ]
+            },
+            "parameters": {
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+        }
+
+    if stream:
+        if is_openai_compatible:
+            payload["stream"] = True
+            # 最后一段返回本次调用的token用量
+            payload["stream_options"] = {"include_usage": True}
+        else:
+            # 原生接口的流式输出：每段只返回新增的文本
+            headers["X-DashScope-SSE"] = "enable"
+            payload["parameters"]["incremental_output"] = True
+    return headers, payload, is_openai_compatible
+
+
+def _timeout() -> httpx.Timeout:
+    # 接口不可达时尽快失败，不占用连接等满读取超时
+    return httpx.Timeout(30.0, connect=settings.llm_connect_timeout_seconds)
+
+
+def _status_error(status_code: int, body: str) -> AIReportError:
+    # 限流和服务端错误计入熔断，密钥错误等其他 4xx 不计入
+    return AIReportError(f"API调用失败: {status_code} - {body}",
+                         provider_failure=status_code == 429 or status_code >= 500)
+
+
+def _record_usage(record, call_usage: TokenUsage, usage: Optional[TokenUsage]):
+    record.prompt_tokens = call_usage.prompt_tokens
+    record.completion_tokens = call_usage.completion_tokens
+    if usage is not None:
+        usage.merge(call_usage)
+
+
+async def request_report(api_config: dict, prompt: str, max_tokens: int, temperature: float,
+                         usage: Optional[TokenUsage] = None, purpose: str = "report") -> str:
+    """调用大模型接口，返回报告文本；传入 usage 时累加本次调用的token数，purpose 为用量统计中的用途"""
+    url = api_config['url']
+    headers, payload, is_openai_compatible = _build_request(api_config, prompt, max_tokens, temperature)
+
+    try:
+        async with llm_guard.call(api_config, purpose) as record:
+            try:
+                async with httpx.AsyncClient(timeout=_timeout()) as client:
+                    response = await client.post(url, headers=headers, json=payload)
+            except httpx.TimeoutException:
+                record.status = "timeout"
+                raise AIReportError("API调用超时，请稍后重试", provider_failure=True)
+            except httpx.TransportError as e:
+                record.status = "connect_error"
+                raise AIReportError(f"API连接失败: {e}", provider_failure=True)
+            record.status = str(response.status_code)
+            if response.status_code != 200:
+                raise _status_error(response.status_code, response.text)
+
+            result = response.json()
+
+            # 根据不同格式解析响应
+            if is_openai_compatible:
+                if 'choices' in result and len(result['choices']) > 0:
+                    text = result['choices'][0]['message']['content']
+                else:
+                    raise ValueError("OpenAI兼容API响应格式异常")
+            elif 'output' in result and 'text' in result['output']:
+                text = result['output']['text']
+            else:
+                raise ValueError("通义千问API响应格式异常")
+            call_usage = TokenUsage()
+            call_usage.add(result.get('usage'), prompt, text)
+            _record_usage(record, call_usage, usage)
+    except llm_guard.ProviderUnavailable as e:
+        raise AIReportError(str(e))
+    return text
+
+
+def _chunk_text(chunk: dict, is_openai_compatible: bool) -> str:
+    if is_openai_compatible:
+        choices = chunk.get('choices') or []
+        if choices:
+            return (choices[0].get('delta') or {}).get('content') or ""
+        return ""
+    return (chunk.get('output') or {}).get('text') or ""
+
+
+async def stream_report(api_config: dict, prompt: str, max_tokens: int, temperature: float,
+                        usage: Optional[TokenUsage] = None, purpose: str = "report") -> AsyncIterator[str]:
+    """流式调用大模型接口，逐段返回报告文本；传入 usage 时在生成结束后累加本次调用的token数"""
+    headers, payload, is_openai_compatible = _build_request(api_config, prompt, max_tokens, temperature, stream=True)
+    produced = []
+    usage_data = None
+
+    try:
+        async with llm_guard.call(api_config, purpose) as record:
+            try:
+                # 整个生成可能超过30秒，只限制连接和两段输出之间的等待时间
+                async with httpx.AsyncClient(timeout=_timeout()) as client:
+                    async with client.stream("POST", api_config['url'], headers=headers, json=payload) as response:
+                        record.status = str(response.status_code)
+                        if response.status_code != 200:
+                            body = (await response.aread()).decode("utf-8", "replace")
+                            raise _status_error(response.status_code, body)
+
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            try:
+                                chunk = json.loads(data)
+                            except ValueError:
+                                continue
+                            # 原生接口每段都带有累计用量，OpenAI兼容格式只在最后一段
+                            usage_data = chunk.get('usage') or usage_data
+                            text = _chunk_text(chunk, is_openai_compatible)
+                            if text:
+                                produced.append(text)
+                                yield text
+            except httpx.TimeoutException:
+                record.status = "timeout"
+                raise AIReportError("API调用超时，请稍后重试", provider_failure=True)
+            except httpx.TransportError as e:
+                record.status = "connect_error"
+                raise AIReportError(f"API连接失败: {e}", provider_failure=True)
+            call_usage = TokenUsage()
+            call_usage.add(usage_data, prompt, "".join(produced))
+            _record_usage(record, call_usage, usage)
+    except llm_guard.ProviderUnavailable as e:
+        raise AIReportError(str(e))
+
+
+class ReportStream:
+    """一次进行中的报告生成，记录已生成的文本分段"""
+
+    def __init__(self, record_id: str):
+        self.record_id = record_id
+        self.chunks: List[str] = []
+        self.error: Optional[str] = None
+        self.done = False
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, text: str):
+        self.chunks.append(text)
+        self._notify()
+
+    def finish(self, error: Optional[str] = None):
+        self.error = error
+        self.done = True
+        self._notify()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    async def follow(self) -> AsyncIterator[str]:
+        """从头读取已生成的文本，之后随生成逐段返回，直到生成结束"""
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            if self.done:
+                return
+            await changed.wait()
+
+
+# 记录ID -> 进行中的生成
+_inflight: Dict[str, ReportStream] = {}
+
+
+def inflight_report(record_id: str) -> Optional[ReportStream]:
+    return _inflight.get(record_id)
+
+
+def claim_report(record_id: str) -> Optional[ReportStream]:
+    """登记由调用方生成的报告（积压处理），该记录正在生成时返回 None；
+    调用方完成后调用 release_report"""
+    if record_id in _inflight:
+        return None
+    stream = _inflight[record_id] = ReportStream(record_id)
+    return stream
+
+
+def release_report(stream: ReportStream, error: Optional[str] = None):
+    _inflight.pop(stream.record_id, None)
+    stream.finish(error)
+
+
+def start_report(record_id: str, max_tokens: int, temperature: float, use_cache: bool = True) -> ReportStream:
+    """在后台开始为考试记录生成报告；该记录正在生成时返回进行中的生成"""
+    from . import background
+
+    stream = _inflight.get(record_id)
+    if stream is None:
+        stream = _inflight[record_id] = ReportStream(record_id)
+        background.spawn(_generate(stream, max_tokens, temperature, use_cache), kind="ai_report")
+    return stream
+
+
+async def _generate(stream: ReportStream, max_tokens: int, temperature: float, use_cache: bool = True):
+    """生成报告并保存到考试记录，错误记录在 stream.error 中。
+    报告由个人信息开头和按错题指纹缓存的正文组成，缓存命中时不调用大模型"""
+    from .database import SessionLocal
+    from .report_cache import cache
+
+    record_id = stream.record_id
+    error = None
+    try:
+        # 调用大模型期间不占用数据库连接
+        db = SessionLocal()
+        try:
+            exam_record = db.query(ExamRecordModel).filter(ExamRecordModel.id == record_id).first()
+            if not exam_record:
+                raise AIReportError("考试记录不存在")
+            api_config = load_api_config(db)
+            if not api_config:
+                raise AIReportError("未配置API密钥，请先在系统配置中设置")
+            analysis = question_analysis(exam_record, db)
+            header = report_header(exam_record)
+            prompt = build_shared_prompt(exam_record, analysis)
+            key = report_key(exam_record, analysis, api_config, max_tokens, temperature)
+        finally:
+            db.close()
+
+        stream.append(header)
+        # 缓存命中时没有调用大模型，token数为0
+        usage = TokenUsage()
+
+        async def generate_body() -> str:
+            chunks = []
+            async for text in stream_report(api_config, prompt, max_tokens, temperature, usage):
+                chunks.append(text)
+                stream.append(text)
+            if not chunks:
+                raise AIReportError("API未返回报告内容")
+            return "".join(chunks)
+
+        body, source = await cache.get_or_generate(key, generate_body, use_cache=use_cache)
+        if source != "miss":
+            stream.append(body)
+        llm_usage.record_cache(api_config, "report", hits=int(source != "miss"), misses=int(source == "miss"))
+
+        # 先保存再通知完成，客户端收到完成事件后读取记录即可看到报告
+        db = SessionLocal()
+        try:
+            db.query(ExamRecordModel).filter(ExamRecordModel.id == record_id).update({
+                "ai_report": stream.text,
+                "ai_report_prompt_tokens": usage.prompt_tokens,
+                "ai_report_completion_tokens": usage.completion_tokens
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        live_feed.ai_report_ready(record_id)
+    except AIReportError as e:
+        error = str(e)
+    except Exception as e:
+        error = f"生成报告失败: {str(e)}"
+    finally:
+        _inflight.pop(record_id, None)
+        stream.finish(error)
+    if error:
+        logger.warning("生成AI报告失败（%s）: %s", record_id, error)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def report_events(stream: ReportStream) -> AsyncIterator[str]:
+    """把进行中的生成转换为 Server-Sent Events：delta（新增文本）、done（已保存）、error"""
+    async for text in stream.follow():
+        yield _sse("delta", {"text": text})
+    if stream.error:
+        yield _sse("error", {"error": stream.error})
+    else:
+        yield _sse("done", {"id": stream.record_id})
+
+
+async def stored_report_events(record_id: str, report: str) -> AsyncIterator[str]:
+    """已有报告时直接推送完整内容"""
+    yield _sse("delta", {"text": report})
+    yield _sse("done", {"id": record_id})
+
+
+async def generate_auto_report_async(record_id: str):
+    """提交考试记录后自动生成AI报告，不阻塞主请求；失败时只记录错误。
+    生成过程中考试页面可以通过流式接口读取同一个生成"""
+    try:
+        from .database import SessionLocal
+        db = SessionLocal()
+
+        try:
+            exam_record = db.query(ExamRecordModel.ai_report).filter(
+                ExamRecordModel.id == record_id
+            ).first()
+
+            if not exam_record or exam_record.ai_report:
+                return  # 记录不存在或已有报告就跳过
+            if not load_api_config(db):
+                return  # 没有API密钥就跳过
+        finally:
+            db.close()
+
+        if record_id in _inflight:
+            return  # 已由流式接口开始生成
+        stream = _inflight[record_id] = ReportStream(record_id)
+        await _generate(stream, max_tokens=AUTO_REPORT_MAX_TOKENS, temperature=AUTO_REPORT_TEMPERATURE)
+
+    except Exception:
+        logger.exception("异步生成AI报告失败（%s）", record_id)
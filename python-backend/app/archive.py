@@ -0,0 +1,373 @@
+"""
+考试记录归档 - 把超过保留期的考试记录按月写入压缩 NDJSON 文件（安装 zstandard 时为 zstd，否则为 gzip），
+同时写入按日汇总统计和记录ID到归档文件的映射，然后从 exam_records 中删除。
+
+- 只归档整月都早于保留期的月份；同一月份之后补录的记录写入该月的下一个分片文件
+- 先写完文件（临时文件写完后重命名），再在一个事务中写入映射和汇总并删除记录，中途失败不会丢失数据
+- GET /api/exam-records/{id} 在 exam_records 中找不到时按映射读取归档文件
+- /api/exam-analytics 的时间范围超出保留期时合并按日汇总统计
+
+命令行: python -m app.archive status|run [--dry-run]|restore --month YYYY-MM
+"""
+
+import gzip
+import io
+import json
+import logging
+import os
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import DateTime, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+try:
+    import zstandard
+except ImportError:  # zstandard 为可选依赖，缺失时使用 gzip
+    zstandard = None
+
+from .config import settings
+from .models import ArchivedExamRecord, ExamRecord as ExamRecordModel, ExamRecordArchive, ExamRecordRollup
+from .question_snapshots import compact, expand
+
+logger = logging.getLogger("exam_system.archive")
+
+_records = ExamRecordModel.__table__
+_EXTENSIONS = {"zstd": ".ndjson.zst", "gzip": ".ndjson.gz"}
+# 写入映射和删除记录时每批的条数
+_BATCH_SIZE = 500
+
+
+def compression() -> str:
+    """当前使用的压缩格式"""
+    configured = settings.archive_compression.lower()
+    if configured == "zstd" and zstandard is None:
+        raise RuntimeError("ARCHIVE_COMPRESSION=zstd 需要安装 zstandard")
+    if configured in ("zstd", "gzip"):
+        return configured
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def _month_range(month: str) -> Tuple[datetime, datetime]:
+    start = datetime.strptime(month, "%Y-%m")
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+def archive_boundary(now: Optional[datetime] = None) -> datetime:
+    """早于该时间的整月可以归档"""
+    cutoff = (now or datetime.now()) - timedelta(days=settings.archive_after_days)
+    return cutoff.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+_ARCHIVE_SELECT = select(*_records.columns)
+
+
+def _encode(row, db: Session) -> bytes:
+    """一条记录为一行JSON，id 放在最前面，按ID查找时只需比较行首；题目快照引用还原为完整内容"""
+    data = {"id": row.id}
+    for column in _records.columns:
+        value = getattr(row, column.name)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif column.name == "questions_data":
+            value = expand(db, value)
+        data[column.name] = value
+    return (json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _decode(line: bytes) -> dict:
+    data = json.loads(line)
+    for column in _records.columns:
+        if isinstance(column.type, DateTime) and data.get(column.name):
+            data[column.name] = datetime.fromisoformat(data[column.name])
+    return data
+
+
+def _line_prefix(record_id: str) -> bytes:
+    return b'{"id":' + json.dumps(record_id, ensure_ascii=False).encode("utf-8") + b","
+
+
+def _path(file_name: str) -> str:
+    return os.path.join(settings.archive_dir, file_name)
+
+
+def _open_writer(path: str, method: str):
+    if method == "zstd":
+        return zstandard.ZstdCompressor(level=10).stream_writer(open(path, "wb"), closefd=True)
+    return gzip.open(path, "wb", compresslevel=6)
+
+
+def _write_file(path: str, rows: Iterator, method: str, db: Session) -> Tuple[List[tuple], Dict[tuple, dict], int]:
+    """写入归档文件，返回 ([(id, created_at)], 按日汇总, 文件字节数)"""
+    written, totals = [], {}
+    tmp_path = path + ".tmp"
+    with _open_writer(tmp_path, method) as writer:
+        for row in rows:
+            writer.write(_encode(row, db))
+            written.append((row.id, row.created_at))
+            _accumulate(totals, row)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return written, totals, os.path.getsize(path)
+
+
+def iter_archive(file_name: str) -> Iterator[bytes]:
+    """逐行读取归档文件（未解析的JSON行）"""
+    path = _path(file_name)
+    with open(path, "rb") as raw:
+        if file_name.endswith(_EXTENSIONS["zstd"]):
+            if zstandard is None:
+                raise RuntimeError(f"读取 {file_name} 需要安装 zstandard")
+            stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+        else:
+            stream = gzip.GzipFile(fileobj=raw, mode="rb")
+        with stream:
+            for line in stream:
+                yield line
+
+
+@lru_cache(maxsize=256)
+def _find_line(file_name: str, record_id: str) -> Optional[bytes]:
+    prefix = _line_prefix(record_id)
+    for line in iter_archive(file_name):
+        if line.startswith(prefix):
+            return line
+    return None
+
+
+def read_archived_record(db: Session, record_id: str) -> Optional[dict]:
+    """按ID读取已归档的考试记录，不存在时返回 None"""
+    file_name = db.query(ArchivedExamRecord.file_name).filter(ArchivedExamRecord.id == record_id).scalar()
+    if file_name is None:
+        return None
+    line = _find_line(file_name, record_id)
+    if line is None:
+        logger.error("归档文件 %s 中缺少记录 %s", file_name, record_id)
+        return None
+    return _decode(line)
+
+
+def _rollup_key(row) -> tuple:
+    return (row.created_at.date(), row.team_id, row.bank_id, row.exam_type, row.department)
+
+
+def _accumulate(totals: Dict[tuple, dict], row):
+    """把一条记录计入按日汇总"""
+    item = totals.setdefault(_rollup_key(row), {
+        "exam_count": 0, "score_sum": 0, "score_min": None, "score_max": None, "high_count": 0,
+        "low_count": 0, "correct_sum": 0, "question_sum": 0, "duration_sum": 0
+    })
+    score = row.score or 0
+    item["exam_count"] += 1
+    item["score_sum"] += score
+    item["score_min"] = score if item["score_min"] is None else min(item["score_min"], score)
+    item["score_max"] = score if item["score_max"] is None else max(item["score_max"], score)
+    item["high_count"] += score >= 80
+    item["low_count"] += score < 60
+    item["correct_sum"] += row.correct_count or 0
+    item["question_sum"] += row.total_questions or 0
+    item["duration_sum"] += row.duration or 0
+
+
+def _merge_rollups(db: Session, totals: Dict[tuple, dict]):
+    if not totals:
+        return
+    days = [key[0] for key in totals]
+    existing = {
+        (rollup.day, rollup.team_id, rollup.bank_id, rollup.exam_type, rollup.department): rollup
+        for rollup in db.query(ExamRecordRollup).filter(
+            ExamRecordRollup.day >= min(days), ExamRecordRollup.day <= max(days)
+        )
+    }
+    for key, item in totals.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            day, team_id, bank_id, exam_type, department = key
+            db.add(ExamRecordRollup(
+                day=day, team_id=team_id, bank_id=bank_id, exam_type=exam_type, department=department, **item
+            ))
+            continue
+        for name in ("exam_count", "score_sum", "high_count", "low_count", "correct_sum", "question_sum", "duration_sum"):
+            setattr(rollup, name, getattr(rollup, name) + item[name])
+        rollup.score_min = min(rollup.score_min, item["score_min"])
+        rollup.score_max = max(rollup.score_max, item["score_max"])
+
+
+def pending_months(db: Session, now: Optional[datetime] = None) -> List[Tuple[str, int]]:
+    """可归档的月份及记录数"""
+    month = func.strftime("%Y-%m", ExamRecordModel.created_at) if db.bind.dialect.name == "sqlite" \
+        else func.to_char(ExamRecordModel.created_at, "YYYY-MM")
+    rows = db.query(month, func.count()).filter(
+        ExamRecordModel.created_at < archive_boundary(now)
+    ).group_by(month).order_by(month).all()
+    return [(key, count) for key, count in rows]
+
+
+def archive_month(db: Session, month: str) -> Optional[dict]:
+    """归档一个月的记录，返回归档文件信息；没有记录时返回 None"""
+    method = compression()
+    start, end = _month_range(month)
+    part = db.query(func.count()).select_from(ExamRecordArchive).filter(ExamRecordArchive.month == month).scalar() + 1
+    file_name = f"exam_records_{month}_{part:02d}{_EXTENSIONS[method]}"
+    os.makedirs(settings.archive_dir, exist_ok=True)
+
+    query = _ARCHIVE_SELECT.where(
+        _records.c.created_at >= start, _records.c.created_at < end
+    ).order_by(_records.c.created_at, _records.c.id)
+    rows, totals, size = _write_file(_path(file_name), db.execute(query).yield_per(1000), method, db)
+    if not rows:
+        os.remove(_path(file_name))
+        return None
+
+    try:
+        # 按写入文件的ID删除，写文件期间新补录的记录留到下次归档
+        for i in range(0, len(rows), _BATCH_SIZE):
+            batch = rows[i:i + _BATCH_SIZE]
+            db.execute(insert(ArchivedExamRecord), [
+                {"id": record_id, "file_name": file_name, "created_at": created_at} for record_id, created_at in batch
+            ])
+            db.execute(delete(_records).where(_records.c.id.in_([record_id for record_id, _ in batch])))
+        _merge_rollups(db, totals)
+        db.add(ExamRecordArchive(
+            file_name=file_name, month=month, record_count=len(rows), size_bytes=size, compression=method
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        os.remove(_path(file_name))
+        raise
+
+    logger.info("已归档 %s: %d 条记录 -> %s（%d 字节）", month, len(rows), file_name, size)
+    return {"month": month, "file_name": file_name, "record_count": len(rows), "size_bytes": size}
+
+
+def run_archive(db: Session, now: Optional[datetime] = None) -> List[dict]:
+    """归档所有超过保留期的整月记录"""
+    archived = []
+    for month, _ in pending_months(db, now):
+        result = archive_month(db, month)
+        if result:
+            archived.append(result)
+    return archived
+
+
+def restore_month(db: Session, month: str) -> int:
+    """把一个月的归档记录恢复到 exam_records，删除该月的映射、汇总和归档文件，返回恢复的记录数"""
+    archives = db.query(ExamRecordArchive).filter(ExamRecordArchive.month == month).all()
+    existing_ids = set()
+    restored = 0
+    for archive in archives:
+        batch = []
+        for line in iter_archive(archive.file_name):
+            data = _decode(line)
+            if data["id"] in existing_ids:
+                continue
+            existing_ids.add(data["id"])
+            batch.append(data)
+            if len(batch) >= _BATCH_SIZE:
+                restored += _restore_batch(db, batch)
+                batch = []
+        restored += _restore_batch(db, batch)
+
+    start, end = _month_range(month)
+    db.execute(delete(ArchivedExamRecord).where(
+        ArchivedExamRecord.file_name.in_([archive.file_name for archive in archives])
+    ))
+    # 某一天的汇总只来自该日所在月份的归档文件
+    db.execute(delete(ExamRecordRollup).where(
+        ExamRecordRollup.day >= start.date(), ExamRecordRollup.day < end.date()
+    ))
+    for archive in archives:
+        db.delete(archive)
+    db.commit()
+
+    _find_line.cache_clear()
+    for archive in archives:
+        os.remove(_path(archive.file_name))
+    return restored
+
+
+def _restore_batch(db: Session, batch: List[dict]) -> int:
+    if not batch:
+        return 0
+    present = {
+        row[0] for row in db.execute(select(_records.c.id).where(_records.c.id.in_([data["id"] for data in batch])))
+    }
+    rows = [data for data in batch if data["id"] not in present]
+    if rows:
+        for data, value in zip(rows, compact(db, [data.get("questions_data") for data in rows])):
+            data["questions_data"] = value
+        db.execute(insert(_records), rows)
+    return len(rows)
+
+
+def rollup_totals(db: Session, start: date, end: date, department: Optional[str] = None) -> List[ExamRecordRollup]:
+    """日期范围内（含首尾）的按日汇总"""
+    query = db.query(ExamRecordRollup).filter(ExamRecordRollup.day >= start, ExamRecordRollup.day <= end)
+    if department:
+        query = query.filter(ExamRecordRollup.department == department)
+    return query.all()
+
+
+def status(db: Session) -> dict:
+    archives = db.query(ExamRecordArchive).order_by(ExamRecordArchive.file_name).all()
+    return {
+        "archive_dir": os.path.abspath(settings.archive_dir),
+        "archive_after_days": settings.archive_after_days,
+        "compression": compression(),
+        "boundary": archive_boundary().isoformat(),
+        "hot_records": db.query(func.count()).select_from(ExamRecordModel).scalar(),
+        "archived_records": sum(archive.record_count for archive in archives),
+        "archived_bytes": sum(archive.size_bytes for archive in archives),
+        "pending_months": [{"month": month, "records": count} for month, count in pending_months(db)],
+        "archives": [
+            {
+                "file_name": archive.file_name,
+                "month": archive.month,
+                "record_count": archive.record_count,
+                "size_bytes": archive.size_bytes,
+                "compression": archive.compression,
+                "created_at": archive.created_at.isoformat() if archive.created_at else None
+            }
+            for archive in archives
+        ]
+    }
+
+
+def main():
+    import argparse
+
+    from .database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="考试记录归档")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="查看归档状态")
+    run_parser = sub.add_parser("run", help="归档超过保留期的整月记录")
+    run_parser.add_argument("--dry-run", action="store_true", help="只列出待归档的月份")
+    restore_parser = sub.add_parser("restore", help="把某月的归档记录恢复到数据库")
+    restore_parser.add_argument("--month", required=True, help="YYYY-MM")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "status":
+            print(json.dumps(status(db), ensure_ascii=False, indent=2))
+        elif args.command == "run" and args.dry_run:
+            for month, count in pending_months(db):
+                print(f"📦 {month}: {count} 条记录")
+        elif args.command == "run":
+            for result in run_archive(db):
+                print(f"✅ {result['month']}: {result['record_count']} 条记录 -> "
+                      f"{result['file_name']}（{result['size_bytes'] / 1024:.1f} KB）")
+        else:
+            print(f"✅ 已恢复 {restore_month(db, args.month)} 条记录")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+管理接口鉴权
+"""
+
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException, Query
+
+from .config import settings
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """校验管理令牌；未配置 ADMIN_TOKEN 时（本地开发）不做限制"""
+    if not settings.admin_token:
+        return
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="无权访问管理接口")
+
+
+async def require_admin_stream(
+    x_admin_token: Optional[str] = Header(None),
+    token: Optional[str] = Query(None, description="管理令牌（EventSource 无法设置请求头时使用）")
+):
+    """事件流接口的鉴权：浏览器 EventSource 不能设置请求头，允许通过查询参数传递令牌"""
+    await require_admin(x_admin_token or token)
@@ -0,0 +1,68 @@
+"""
+后台任务登记 - 请求中创建的异步任务（如AI报告生成）统一在这里登记，
+保持强引用避免任务被提前回收，并在服务停止时等待其完成。
+
+任务在空的上下文中创建：不继承创建时所在请求的上下文变量（如请求的SQL统计），
+后台任务执行的SQL不会计入已结束的请求。
+"""
+
+import asyncio
+import contextvars
+import logging
+from typing import Coroutine, Optional, Set
+
+from .metrics import Gauge, registry
+
+logger = logging.getLogger("exam_system.background")
+
+BACKGROUND_TASKS = registry.register(Gauge(
+    "background_tasks_in_flight", "正在运行的后台任务数", ("kind",)
+))
+
+_tasks: Set[asyncio.Task] = set()
+
+
+def create_task(coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+    """在空的上下文中创建任务（不登记，用于随服务启动和停止的常驻任务）"""
+    return contextvars.Context().run(asyncio.get_running_loop().create_task, coro, name=name)
+
+
+def spawn(coro: Coroutine, kind: str = "default", name: Optional[str] = None) -> asyncio.Task:
+    """创建并登记后台任务"""
+    task = create_task(coro, name=name)
+    _tasks.add(task)
+    BACKGROUND_TASKS.inc(kind)
+
+    def _done(finished: asyncio.Task):
+        _tasks.discard(finished)
+        BACKGROUND_TASKS.dec(kind)
+        if not finished.cancelled() and finished.exception() is not None:
+            logger.error("后台任务 %s 失败: %s", finished.get_name(), finished.exception())
+
+    task.add_done_callback(_done)
+    return task
+
+
+def pending_count() -> int:
+    """尚未完成的后台任务数"""
+    return len(_tasks)
+
+
+async def drain(timeout: float) -> int:
+    """等待所有后台任务完成，超时后取消剩余任务，返回被取消的任务数"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    # 等待期间完成的任务可能又创建新任务，循环直到清空或超时
+    while _tasks:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        await asyncio.wait(set(_tasks), timeout=remaining)
+
+    leftover = list(_tasks)
+    for task in leftover:
+        task.cancel()
+    if leftover:
+        await asyncio.gather(*leftover, return_exceptions=True)
+        logger.warning("停止服务时取消了 %d 个未完成的后台任务", len(leftover))
+    return len(leftover)
@@ -0,0 +1,50 @@
+"""
+压缩JSON字段类型 - 以紧凑JSON存储为二进制，超过一定长度且压缩后更小时使用 zlib 压缩；
+读取时兼容压缩前以JSON文本存储的旧数据
+"""
+
+import json
+import zlib
+
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+# 短于该长度的JSON不压缩（zlib 头尾约占11字节）
+MIN_COMPRESS_SIZE = 64
+
+
+def pack(data: bytes, level: int = 6) -> bytes:
+    """JSON字节串按需压缩；未压缩的JSON以 { [ " 等字符开头，不会被误认为 zlib 数据"""
+    if len(data) < MIN_COMPRESS_SIZE:
+        return data
+    compressed = zlib.compress(data, level)
+    return compressed if len(compressed) < len(data) else data
+
+
+class CompressedJSON(TypeDecorator):
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, level: int = 6, **kwargs):
+        super().__init__(**kwargs)
+        self.level = level
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return pack(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), self.level)
+
+    def process_result_value(self, value, dialect):
+        return decode(value)
+
+
+def decode(value):
+    """解析字段原始值：压缩数据、未压缩的JSON字节串或文本（旧数据）、已解析的对象"""
+    if value is None or isinstance(value, (dict, list)):
+        return value
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    if isinstance(value, bytes):
+        if value[:1] == b"\x78":  # zlib 头
+            value = zlib.decompress(value)
+        value = value.decode("utf-8")
+    return json.loads(value) if value else None
@@ -7,6 +7,11 @@ import os
 class Settings(BaseSettings):
     # 数据库配置
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./exam_system.db")
+    # 连接池大小（非SQLite数据库）
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "20"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    # SQLite 等待写锁的最长时间（秒）
+    sqlite_busy_timeout: float = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
     
     # API配置
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -22,6 +27,72 @@ class Settings(BaseSettings):
     wechat_corp_id: str = os.getenv("WECHAT_CORP_ID", "")
     wechat_secret: str = os.getenv("WECHAT_SECRET", "")
     
+    # AI报告正文缓存（按错题指纹复用）：最多条目数（0 表示不缓存）、有效期（秒）
+    ai_report_cache_size: int = int(os.getenv("AI_REPORT_CACHE_SIZE", "2000"))
+    ai_report_cache_ttl_seconds: float = float(os.getenv("AI_REPORT_CACHE_TTL_SECONDS", "86400"))
+    
+    # 大模型接口限流（每个接口地址）：每秒调用数、突发上限、同时进行的调用数、排队等待上限（秒）
+    llm_rate_per_second: float = float(os.getenv("LLM_RATE_PER_SECOND", "5"))
+    llm_rate_burst: float = float(os.getenv("LLM_RATE_BURST", "10"))
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    llm_queue_timeout_seconds: float = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+    # 大模型接口熔断：连续失败次数、断开后等待多久再探测（秒）、连接超时（秒）
+    llm_circuit_failure_threshold: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    llm_circuit_reset_seconds: float = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+    llm_connect_timeout_seconds: float = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+    
+    # AI报告提示词中错题部分的token预算（超出时截断解析和题干，0 表示不限制）
+    ai_report_prompt_token_budget: int = int(os.getenv("AI_REPORT_PROMPT_TOKEN_BUDGET", "1200"))
+    
+    # 大模型调用用量写入汇总表的间隔（秒）
+    llm_usage_flush_seconds: float = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "30"))
+    
+    # AI报告积压处理：每次合并生成的报告数、同时进行的调用数、每分钟token预算（0 为不限制）
+    ai_report_backlog_batch_size: int = int(os.getenv("AI_REPORT_BACKLOG_BATCH_SIZE", "5"))
+    ai_report_backlog_concurrency: int = int(os.getenv("AI_REPORT_BACKLOG_CONCURRENCY", "4"))
+    ai_report_backlog_tpm: int = int(os.getenv("AI_REPORT_BACKLOG_TPM", "100000"))
+    
+    # 正式考试题目负载缓存：重新读取考试和题目内容、校验是否被修改的间隔（秒，多进程部署时其他进程的修改最多延迟该时间）
+    exam_payload_revalidate_seconds: float = float(os.getenv("EXAM_PAYLOAD_REVALIDATE_SECONDS", "5"))
+    
+    # 管理接口令牌（请求头 X-Admin-Token），为空时不校验
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+    
+    # 慢查询日志
+    slow_query_threshold_ms: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+    slow_query_buffer_size: int = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200"))
+    slow_query_explain: bool = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+    
+    # 索引建议：启动时即开始记录查询使用的列（也可通过管理接口开启）
+    index_advisor_enabled: bool = os.getenv("INDEX_ADVISOR_ENABLED", "false").lower() == "true"
+    
+    # 考试记录归档：超过保留天数的整月记录写入压缩归档文件
+    archive_dir: str = os.getenv("ARCHIVE_DIR", "./archive")
+    archive_after_days: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+    # auto: 安装了 zstandard 时使用 zstd，否则使用 gzip
+    archive_compression: str = os.getenv("ARCHIVE_COMPRESSION", "auto")
+    
+    # 考试会话：自动保存的作答在内存中合并，每隔该秒数批量写入数据库
+    exam_autosave_flush_seconds: float = float(os.getenv("EXAM_AUTOSAVE_FLUSH_SECONDS", "5"))
+    # 截止时间之后仍接受作答和交卷的宽限（秒），用于抵消网络延迟
+    exam_session_grace_seconds: float = float(os.getenv("EXAM_SESSION_GRACE_SECONDS", "30"))
+    
+    # 每日测验报告：测验结束时间之后等待的分钟数（等待自动交卷写入），后台检查间隔（秒，0 为不自动生成）
+    daily_report_delay_minutes: float = float(os.getenv("DAILY_REPORT_DELAY_MINUTES", "5"))
+    daily_report_check_seconds: float = float(os.getenv("DAILY_REPORT_CHECK_SECONDS", "300"))
+    
+    # 管理后台实时推送：心跳间隔（秒）、从数据库重新汇总今日统计的间隔（秒）
+    live_feed_heartbeat_seconds: float = float(os.getenv("LIVE_FEED_HEARTBEAT_SECONDS", "15"))
+    live_feed_resync_seconds: float = float(os.getenv("LIVE_FEED_RESYNC_SECONDS", "60"))
+    
+    # 生产部署
+    # 导入应用时自动建表；多进程启动器在主进程建表后对工作进程关闭
+    auto_create_tables: bool = os.getenv("AUTO_CREATE_TABLES", "true").lower() == "true"
+    # 工作进程数，0 表示按CPU核数
+    web_workers: int = int(os.getenv("WEB_WORKERS", "0"))
+    # 停止服务时等待进行中的请求和后台任务（AI报告）完成的最长时间（秒）
+    shutdown_drain_seconds: float = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+    
     class Config:
         env_file = ".env"
 
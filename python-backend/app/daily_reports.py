@@ -0,0 +1,233 @@
+"""
+每日测验报告 - 每天测验结束（每日考试配置的结束时间之后 DAILY_REPORT_DELAY_MINUTES 分钟）后，
+把当天的统计和成绩生成一次保存到 daily_reports，之后查询直接返回保存的结果；测验尚未结束的当天实时统计。
+
+后台任务每 DAILY_REPORT_CHECK_SECONDS 秒检查一次：进程启动后第一次检查所有有每日测验记录的日期，
+之后只检查上次检查之后的日期，跳过已保存报告的日期。多进程部署时同一天的报告只保存一份。
+
+报告按 (日期, 团队, 题库) 保存，0 表示全部；后台任务只生成全部团队的报告，指定团队或题库的报告在首次查询时生成。
+"""
+
+import asyncio
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import background
+from .config import settings
+from .fast_json import dumps
+from .models import DailyReport, ExamRecord as ExamRecordModel, SystemConfig as SystemConfigModel
+
+logger = logging.getLogger("exam_system.daily_reports")
+
+# 未保存每日考试配置时使用的默认值
+DEFAULT_DAILY_EXAM_CONFIG = {
+    "daily_exam_start_time": "08:00",
+    "daily_exam_end_time": "20:00",
+    "daily_exam_question_count": 3,
+    "daily_exam_duration_minutes": 10
+}
+
+_RECORD_FIELDS = ("user_name", "score", "correct_count", "total_questions", "duration", "created_at")
+
+# 已检查到的日期（不含），为空时检查所有日期
+_checked_until: Optional[date] = None
+
+
+def load_daily_exam_config(db: Session) -> Dict[str, Any]:
+    """读取每日考试配置，缺少的字段使用默认值"""
+    config = dict(DEFAULT_DAILY_EXAM_CONFIG)
+    record = db.query(SystemConfigModel.value).filter(
+        SystemConfigModel.key == "daily_exam_config"
+    ).scalar()
+    if record:
+        try:
+            config.update(json.loads(record))
+        except ValueError:
+            pass
+    return config
+
+
+def ready_at(config: Dict[str, Any], day: date) -> datetime:
+    """该日报告可以生成的时间：测验结束时间所在的整分钟之后，再等待自动交卷和延迟写入的作答"""
+    end_time = datetime.strptime(config["daily_exam_end_time"], "%H:%M").time()
+    return datetime.combine(day, end_time) + timedelta(minutes=1 + settings.daily_report_delay_minutes)
+
+
+def build(db: Session, day: date, team_id: int = 0, bank_id: int = 0) -> dict:
+    """统计某日的每日测验记录（team_id、bank_id 为 0 时不限）"""
+    start = datetime.combine(day, datetime.min.time())
+    query = db.query(*[getattr(ExamRecordModel, name) for name in _RECORD_FIELDS]).filter(
+        ExamRecordModel.exam_type == "daily_exam",
+        ExamRecordModel.created_at >= start,
+        ExamRecordModel.created_at < start + timedelta(days=1)
+    )
+    if team_id:
+        query = query.filter(ExamRecordModel.team_id == team_id)
+    if bank_id:
+        query = query.filter(ExamRecordModel.bank_id == bank_id)
+    rows = query.all()
+
+    date_str = day.strftime("%Y-%m-%d")
+    if not rows:
+        return {
+            "date": date_str,
+            "has_data": False,
+            "message": "当日无考试记录"
+        }
+
+    total_participants = len(rows)
+    average_score = round(sum(row.score for row in rows) / total_participants, 2)
+
+    # 分数段统计
+    excellent_count = len([row for row in rows if row.score >= 90])
+    good_count = len([row for row in rows if 70 <= row.score < 90])
+    average_count = len([row for row in rows if 60 <= row.score < 70])
+    poor_count = len([row for row in rows if row.score < 60])
+
+    total_duration = sum(row.duration for row in rows if row.duration)
+    avg_duration = round(total_duration / total_participants) if total_duration > 0 else 0
+
+    return {
+        "date": date_str,
+        "has_data": True,
+        "statistics": {
+            "total_participants": total_participants,
+            "average_score": average_score,
+            "average_duration_seconds": avg_duration,
+            "score_distribution": {
+                "excellent": {"count": excellent_count, "percentage": round(excellent_count/total_participants*100, 1)},
+                "good": {"count": good_count, "percentage": round(good_count/total_participants*100, 1)},
+                "average": {"count": average_count, "percentage": round(average_count/total_participants*100, 1)},
+                "poor": {"count": poor_count, "percentage": round(poor_count/total_participants*100, 1)}
+            }
+        },
+        "records": [
+            {
+                "user_name": row.user_name,
+                "score": row.score,
+                "correct_count": row.correct_count,
+                "total_questions": row.total_questions,
+                "duration": row.duration,
+                "created_at": row.created_at.isoformat()
+            }
+            for row in rows
+        ]
+    }
+
+
+def stored(db: Session, day: date, team_id: int = 0, bank_id: int = 0) -> Optional[str]:
+    """已保存的报告JSON"""
+    return db.query(DailyReport.content).filter(
+        DailyReport.report_date == day, DailyReport.team_id == team_id, DailyReport.bank_id == bank_id
+    ).scalar()
+
+
+def save(db: Session, day: date, report: dict, team_id: int = 0, bank_id: int = 0) -> bool:
+    """保存报告，已有报告（其他进程已生成）时返回 False"""
+    try:
+        with db.begin_nested():
+            db.add(DailyReport(
+                report_date=day,
+                team_id=team_id,
+                bank_id=bank_id,
+                participants=report["statistics"]["total_participants"],
+                content=dumps(report).decode("utf-8"),
+                generated_at=datetime.now()
+            ))
+    except IntegrityError:
+        return False
+    db.commit()
+    return True
+
+
+def report_for(db: Session, day: date, team_id: int = 0, bank_id: int = 0, now: Optional[datetime] = None):
+    """返回 (报告, 是否为保存的JSON文本)：已保存时直接返回；测验已结束的日期生成后保存；否则实时统计"""
+    content = stored(db, day, team_id, bank_id)
+    if content is not None:
+        return content, True
+    report = build(db, day, team_id, bank_id)
+    if report["has_data"] and (now or datetime.now()) >= ready_at(load_daily_exam_config(db), day):
+        save(db, day, report, team_id, bank_id)
+    return report, False
+
+
+def _record_days(db: Session, since: Optional[date]) -> List[date]:
+    query = db.query(func.date(ExamRecordModel.created_at)).filter(ExamRecordModel.exam_type == "daily_exam")
+    if since is not None:
+        query = query.filter(ExamRecordModel.created_at >= datetime.combine(since, datetime.min.time()))
+    days = set()
+    for (value,) in query.distinct():
+        # SQLite 的 date() 返回字符串
+        days.add(value if isinstance(value, date) else date.fromisoformat(str(value)[:10]))
+    return sorted(days)
+
+
+def generate_due(db: Session, now: Optional[datetime] = None, since: Optional[date] = None) -> List[str]:
+    """生成测验已结束、尚未保存的每日报告，返回生成的日期；since 为空时检查所有日期"""
+    now = now or datetime.now()
+    config = load_daily_exam_config(db)
+    days = _record_days(db, since)
+    existing = {day for (day,) in db.query(DailyReport.report_date).filter(
+        DailyReport.report_date >= days[0], DailyReport.team_id == 0, DailyReport.bank_id == 0
+    )} if days else set()
+
+    generated = []
+    for day in days:
+        if day in existing or now < ready_at(config, day):
+            continue
+        report = build(db, day)
+        if report["has_data"] and save(db, day, report):
+            generated.append(day.isoformat())
+    return generated
+
+
+def run_scheduled(now: Optional[datetime] = None) -> List[str]:
+    """后台检查一次，记录已检查到的日期"""
+    global _checked_until
+    from .database import SessionLocal
+
+    now = now or datetime.now()
+    db = SessionLocal()
+    try:
+        generated = generate_due(db, now, _checked_until)
+        # 今天的报告还未生成时，下次仍从今天开始检查
+        today = now.date()
+        _checked_until = today + timedelta(days=1) if now >= ready_at(load_daily_exam_config(db), today) else today
+        return generated
+    finally:
+        db.close()
+
+
+async def _schedule_loop():
+    while True:
+        try:
+            generated = await asyncio.to_thread(run_scheduled)
+            if generated:
+                logger.info("已生成每日测验报告: %s", ", ".join(generated))
+        except Exception as e:
+            logger.error("生成每日测验报告失败: %s", e)
+        await asyncio.sleep(settings.daily_report_check_seconds)
+
+
+_loop_task: Optional[asyncio.Task] = None
+
+
+def start():
+    """启动后台生成任务（在服务启动时调用）"""
+    global _loop_task
+    if _loop_task is None and settings.daily_report_check_seconds > 0:
+        _loop_task = background.create_task(_schedule_loop(), name="daily_reports")
+
+
+async def stop():
+    global _loop_task
+    task, _loop_task = _loop_task, None
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
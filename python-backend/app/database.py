@@ -1,14 +1,33 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from .config import settings
+from .slow_query import install_slow_query_log
+from .index_advisor import install_index_advisor
 
 # 数据库引擎
-engine = create_engine(
-    settings.database_url,
-    # SQLite特定配置
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+if "sqlite" in settings.database_url:
+    # SQLite 打开连接的开销很小：不使用连接池，避免异步接口在事件循环中
+    # 等待连接归还（归还本身又依赖事件循环）导致的死锁
+    # timeout: 写锁被占用（如在线迁移建索引）时等待的秒数
+    engine = create_engine(
+        settings.database_url,
+        connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout},
+        poolclass=NullPool
+    )
+else:
+    engine = create_engine(
+        settings.database_url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=True
+    )
+
+# 慢查询日志
+install_slow_query_log(engine)
+# 索引建议（开启记录前只有一次开关判断）
+install_index_advisor(engine)
 
 # 会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -16,6 +35,13 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # 基础模型类
 Base = declarative_base()
 
+# 创建数据库表并执行未完成的版本迁移（多进程部署时由启动器在主进程中执行一次）
+def init_db():
+    from . import models  # noqa: F401  注册所有模型
+    from .migrations import upgrade
+    Base.metadata.create_all(bind=engine)
+    upgrade(engine, busy_timeout_ms=int(settings.sqlite_busy_timeout * 1000))
+
 # 依赖项：获取数据库会话
 def get_db():
     db = SessionLocal()
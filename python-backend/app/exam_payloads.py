@@ -0,0 +1,198 @@
+"""
+正式考试题目负载缓存 - 在创建/更新考试时预先生成销售模式的题目数据，
+并同时保存 gzip / brotli 压缩后的字节，考试期间直接返回内存中的结果。
+
+每种编码的响应体使用不同的 ETag（内容摘要加编码后缀），按 ETag 缓存的代理不会把 gzip 的响应体
+当作未压缩的返回；If-None-Match 按弱比较匹配（支持多个ETag、W/ 前缀和 *）。
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，缺失时只提供 gzip
+    brotli = None
+
+from sqlalchemy.orm import Session, joinedload
+
+from .config import settings
+from .models import Exam as ExamModel, ExamQuestion as ExamQuestionModel
+
+
+class ExamPayload:
+    """单场考试的预生成负载（原始JSON及各压缩版本）"""
+
+    __slots__ = (
+        "exam_id", "updated_at", "start_time", "end_time", "is_active",
+        "etag", "bodies", "etags", "checked_at"
+    )
+
+    def __init__(self, exam: ExamModel, body: bytes):
+        self.exam_id = exam.id
+        self.updated_at = exam.updated_at
+        self.start_time = exam.start_time
+        self.end_time = exam.end_time
+        self.is_active = exam.is_active
+        self.etag = etag_for(body)
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=11)
+        self.etags = {encoding: _with_suffix(self.etag, encoding) for encoding in self.bodies}
+        self.checked_at = time.monotonic()
+
+
+def etag_for(body: bytes) -> str:
+    return '"%s"' % hashlib.md5(body).hexdigest()
+
+
+def _with_suffix(etag: str, encoding: str) -> str:
+    return etag if encoding == "identity" else '%s-%s"' % (etag[:-1], encoding)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否匹配（弱比较：忽略 W/ 前缀）"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+_payloads: Dict[int, ExamPayload] = {}
+_lock = threading.Lock()
+
+
+def build_sales_payload(exam: ExamModel, db: Session) -> dict:
+    """构建销售模式（不含答案和解析）的考试题目数据"""
+    exam_questions = db.query(ExamQuestionModel).options(
+        joinedload(ExamQuestionModel.question)
+    ).filter(
+        ExamQuestionModel.exam_id == exam.id
+    ).order_by(ExamQuestionModel.order_index).all()
+
+    question_data = []
+    categories = []
+    for eq in exam_questions:
+        q = eq.question
+        question_data.append({
+            "id": q.id,
+            "category": q.category,
+            "type": q.question_type,
+            "question": q.question,
+            "optionA": q.option_a,
+            "optionB": q.option_b,
+            "optionC": q.option_c,
+            "optionD": q.option_d,
+            "questionId": q.question_id or q.id
+        })
+        if q.category not in categories:
+            categories.append(q.category)
+
+    return {
+        "version": 1,
+        "lastUpdate": exam.updated_at.isoformat() if exam.updated_at else None,
+        "totalQuestions": len(question_data),
+        "categories": categories,
+        "maintainer": "管理员",
+        "questions": question_data,
+        "exam_id": exam.id,
+        "exam_name": exam.exam_name,
+        "duration_minutes": exam.duration_minutes
+    }
+
+
+def _render(exam: ExamModel, db: Session) -> bytes:
+    return json.dumps(
+        build_sales_payload(exam, db), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def materialize_exam_payload(exam: ExamModel, db: Session, body: Optional[bytes] = None) -> Optional[ExamPayload]:
+    """为正式考试生成并缓存负载，非正式考试返回 None"""
+    if exam.exam_type != "formal":
+        invalidate_exam_payload(exam.id)
+        return None
+
+    payload = ExamPayload(exam, body if body is not None else _render(exam, db))
+    with _lock:
+        _payloads[exam.id] = payload
+    return payload
+
+
+def get_exam_payload(exam_id: int, db: Session) -> Optional[ExamPayload]:
+    """获取考试负载；每隔 EXAM_PAYLOAD_REVALIDATE_SECONDS 秒重新读取考试和题目内容并与缓存的摘要比较。
+    题目修改时只清空本进程的缓存，其他进程靠这次比较发现变化（不依赖只精确到秒的 updated_at）；
+    内容未变时不重新压缩"""
+    payload = _payloads.get(exam_id)
+    if payload is not None and time.monotonic() - payload.checked_at < settings.exam_payload_revalidate_seconds:
+        return payload
+
+    exam = db.query(ExamModel).filter(ExamModel.id == exam_id).first()
+    if not exam:
+        invalidate_exam_payload(exam_id)
+        return None
+    if payload is None or exam.exam_type != "formal":
+        return materialize_exam_payload(exam, db)
+
+    body = _render(exam, db)
+    if etag_for(body) != payload.etag:
+        return materialize_exam_payload(exam, db, body)
+    # 开放时间和启用状态不在负载内容中，单独更新
+    payload.updated_at = exam.updated_at
+    payload.start_time = exam.start_time
+    payload.end_time = exam.end_time
+    payload.is_active = exam.is_active
+    payload.checked_at = time.monotonic()
+    return payload
+
+
+def invalidate_exam_payload(exam_id: int):
+    """删除单场考试的缓存负载"""
+    with _lock:
+        _payloads.pop(exam_id, None)
+
+
+def invalidate_all_payloads():
+    """题目内容变化时清空本进程的所有缓存负载（下次访问时重新生成；其他进程在下次校验时发现变化）"""
+    with _lock:
+        _payloads.clear()
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """根据 Accept-Encoding 选择返回的编码，优先 br，其次 gzip"""
+    if not accept_encoding:
+        return "identity"
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        parts = item.strip().split(";")
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+
+    def weight(coding):
+        return weights.get(coding, weights.get("*", 0.0))
+
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = max(candidates, key=weight)
+    return best if weight(best) > 0 else "identity"
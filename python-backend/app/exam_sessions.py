@@ -0,0 +1,390 @@
+"""
+考试会话 - 开始考试时由服务端固定题目和截止时间（考试时长 duration_minutes，且不晚于考试结束时间），
+作答自动保存，交卷时由服务端判分并写入考试记录，超过截止时间的作答不再接受。
+
+自动保存（心跳）只写入内存：同一会话在一个刷新周期内的多次保存只保留版本号最大的一份，
+后台任务每 EXAM_AUTOSAVE_FLUSH_SECONDS 秒把所有会话的最新作答在一个事务中批量写入。
+1000人同时考试、每人每隔几秒保存一次时，数据库写入从每秒上百次变为每个周期一次批量更新；
+进程异常退出时最多丢失一个周期内的作答（正常停止时会先写入）。
+
+后台任务同时把超过截止时间（加宽限 EXAM_SESSION_GRACE_SECONDS）仍未交卷的会话按已保存的作答自动交卷。
+
+多进程部署时自动保存和交卷可能落在不同进程，交卷的进程看不到其他进程内存中未写入的作答：
+页面交卷时总是提交完整的作答；按已保存的作答判分（交卷未带作答、超过截止时间，以及自动交卷）
+之前先等待两个写入周期，让其他进程把截止前的保存写入数据库。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.orm import Session
+
+from . import background, live_feed
+from .config import settings
+from .metrics import Counter, Gauge, registry
+from .models import ExamRecord as ExamRecordModel, ExamSession, Question as QuestionModel
+
+logger = logging.getLogger("exam_system.exam_sessions")
+
+AUTOSAVES = registry.register(Counter(
+    "exam_autosave_requests_total", "考试作答自动保存请求数"
+))
+AUTOSAVES_COALESCED = registry.register(Counter(
+    "exam_autosave_coalesced_total", "写入数据库前被更新版本覆盖的自动保存数"
+))
+AUTOSAVE_ROWS = registry.register(Counter(
+    "exam_autosave_rows_written_total", "批量写入数据库的会话作答数"
+))
+AUTOSAVE_FLUSHES = registry.register(Counter(
+    "exam_autosave_flushes_total", "自动保存批量写入次数"
+))
+AUTOSAVE_PENDING = registry.register(Gauge(
+    "exam_autosave_pending", "等待写入数据库的会话数"
+))
+SESSIONS_SUBMITTED = registry.register(Counter(
+    "exam_sessions_submitted_total", "交卷的考试会话数", ("status",)
+))
+
+# 单个答案的最大长度（多选题为排好序的选项字母）
+MAX_ANSWER_LENGTH = 20
+# 每轮自动交卷处理的超时会话数
+_EXPIRE_BATCH = 200
+
+_table = ExamSession.__table__
+_flush_stmt = update(_table).where(
+    _table.c.id == bindparam("session_id"),
+    _table.c.status == "active",
+    # 多进程部署时同一会话的保存可能落在不同进程，只写入更新的版本
+    _table.c.answers_version < bindparam("version"),
+).values(
+    answers=bindparam("new_answers"),
+    answers_version=bindparam("version"),
+    saved_at=bindparam("new_saved_at"),
+)
+
+
+class _SessionInfo:
+    """保存作答时需要的会话信息，缓存在内存中，心跳不查询数据库"""
+
+    __slots__ = ("deadline", "question_count", "closed")
+
+    def __init__(self, deadline: datetime, question_count: int, closed: bool = False):
+        self.deadline = deadline
+        self.question_count = question_count
+        self.closed = closed
+
+
+_sessions: Dict[str, _SessionInfo] = {}
+# 会话ID -> (版本号, 作答, 保存时间)
+_pending: Dict[str, Tuple[int, dict, datetime]] = {}
+_lock = threading.Lock()
+
+
+def grace() -> timedelta:
+    return timedelta(seconds=settings.exam_session_grace_seconds)
+
+
+def settle_time() -> timedelta:
+    """其他进程内存中的自动保存最迟写入数据库的时间（两个写入周期）"""
+    return timedelta(seconds=settings.exam_autosave_flush_seconds * 2)
+
+
+def accepts_answers(session: ExamSession, now: Optional[datetime] = None) -> bool:
+    """交卷时提交的作答是否在截止时间（加宽限）之内"""
+    return (now or datetime.now()) <= session.deadline + grace()
+
+
+def settle_delay(session: ExamSession, answers: Optional[dict], now: Optional[datetime] = None) -> float:
+    """按已保存的作答判分前需要等待的秒数：多进程部署时最新的自动保存可能还在其他进程的内存中，
+    等待其写入数据库（最迟到截止时间加宽限之后的两个写入周期）"""
+    now = now or datetime.now()
+    if answers is not None and accepts_answers(session, now):
+        return 0.0
+    settled = min(session.deadline + grace(), now) + settle_time()
+    return max(0.0, (settled - now).total_seconds())
+
+
+def remember(session: ExamSession):
+    """缓存会话信息（开始或恢复会话时调用）"""
+    with _lock:
+        _sessions[session.id] = _SessionInfo(
+            session.deadline, len(session.question_ids), session.status != "active"
+        )
+
+
+def _session_info(db: Session, session_id: str) -> _SessionInfo:
+    info = _sessions.get(session_id)
+    if info is not None:
+        return info
+    # 其他进程创建的会话，第一次保存时读取一次
+    row = db.execute(select(_table.c.deadline, _table.c.question_ids, _table.c.status).where(
+        _table.c.id == session_id
+    )).first()
+    if row is None:
+        raise LookupError("考试会话不存在")
+    info = _SessionInfo(row.deadline, len(row.question_ids), row.status != "active")
+    with _lock:
+        _sessions[session_id] = info
+    return info
+
+
+def validate_answers(answers: dict, question_count: int) -> dict:
+    """作答格式：{"题目序号": 答案}，序号从0开始"""
+    cleaned = {}
+    for key, value in answers.items():
+        if not str(key).isdigit() or int(key) >= question_count:
+            raise ValueError(f"无效的题目序号: {key}")
+        if value is None or value == "":
+            continue
+        if not isinstance(value, str) or len(value) > MAX_ANSWER_LENGTH:
+            raise ValueError(f"第{int(key) + 1}题答案格式无效")
+        cleaned[str(int(key))] = value
+    return cleaned
+
+
+def save_answers(db: Session, session_id: str, answers: dict, version: Optional[int] = None) -> dict:
+    """自动保存作答（只写入内存，由后台任务批量写入数据库）"""
+    info = _session_info(db, session_id)
+    if info.closed:
+        raise ValueError("考试已提交")
+    now = datetime.now()
+    if now > info.deadline + grace():
+        raise ValueError("考试时间已到，作答不再保存")
+    answers = validate_answers(answers, info.question_count)
+    if version is None:
+        version = int(time.time() * 1000)
+
+    AUTOSAVES.inc()
+    with _lock:
+        current = _pending.get(session_id)
+        if current is None or current[0] < version:
+            if current is not None:
+                AUTOSAVES_COALESCED.inc()
+            _pending[session_id] = (version, answers, now)
+        else:
+            # 乱序到达的旧版本直接丢弃
+            version = current[0]
+        AUTOSAVE_PENDING.set(value=len(_pending))
+    return {
+        "version": version,
+        "deadline": info.deadline.isoformat(),
+        "remaining_seconds": max(0, int((info.deadline - now).total_seconds())),
+    }
+
+
+def current_answers(session: ExamSession) -> Tuple[dict, int]:
+    """会话的最新作答和版本号（内存中未写入的保存优先）"""
+    pending = _pending.get(session.id)
+    if pending is not None and pending[0] > (session.answers_version or 0):
+        return pending[1], pending[0]
+    return session.answers or {}, session.answers_version or 0
+
+
+def flush(engine=None) -> int:
+    """把内存中的作答批量写入数据库，返回写入的会话数"""
+    with _lock:
+        if not _pending:
+            return 0
+        batch = dict(_pending)
+        _pending.clear()
+        AUTOSAVE_PENDING.set(value=0)
+
+    if engine is None:
+        from .database import engine
+    try:
+        with engine.begin() as conn:
+            conn.execute(_flush_stmt, [
+                {"session_id": session_id, "version": version,
+                 "new_answers": answers, "new_saved_at": saved_at}
+                for session_id, (version, answers, saved_at) in batch.items()
+            ])
+    except Exception:
+        # 写入失败时放回，下个周期重试（期间收到的新版本优先）
+        with _lock:
+            for session_id, entry in batch.items():
+                current = _pending.get(session_id)
+                if current is None or current[0] < entry[0]:
+                    _pending[session_id] = entry
+            AUTOSAVE_PENDING.set(value=len(_pending))
+        raise
+    AUTOSAVE_FLUSHES.inc()
+    AUTOSAVE_ROWS.inc(amount=len(batch))
+    return len(batch)
+
+
+def _normalize(answer: Optional[str]) -> str:
+    # 多选题答案按选项字母排序后比较
+    return "".join(sorted((answer or "").strip().upper()))
+
+
+def load_questions(db: Session, question_ids: List[int]) -> List[Optional[QuestionModel]]:
+    """按会话中的顺序读取题目（题目已被删除时为 None）"""
+    rows = db.query(QuestionModel).filter(QuestionModel.id.in_(set(question_ids))).all()
+    by_id = {question.id: question for question in rows}
+    return [by_id.get(question_id) for question_id in question_ids]
+
+
+def grade(questions: List[Optional[QuestionModel]], answers: dict) -> Tuple[List[dict], int]:
+    """判分，返回 (questions_data, 答对题数)"""
+    questions_data = []
+    correct_count = 0
+    for index, question in enumerate(questions):
+        if question is None:
+            continue
+        user_answer = answers.get(str(index), "")
+        is_correct = bool(user_answer) and _normalize(user_answer) == _normalize(question.answer)
+        correct_count += is_correct
+        questions_data.append({
+            "question": question.question,
+            "optionA": question.option_a,
+            "optionB": question.option_b,
+            "optionC": question.option_c,
+            "optionD": question.option_d,
+            "correct_answer": question.answer,
+            "user_answer": user_answer,
+            "question_type": question.question_type,
+            "category": question.category,
+            "explanation": question.explanation or "",
+            "is_correct": is_correct,
+        })
+    return questions_data, correct_count
+
+
+def submit(db: Session, session: ExamSession, answers: Optional[dict] = None,
+           status: str = "submitted") -> Optional[ExamRecordModel]:
+    """交卷：判分并写入考试记录；会话已被其他请求（或自动交卷）提交时返回 None
+
+    截止时间（加宽限）之后提交的作答不予采用，按截止前最后一次保存的作答判分。
+    """
+    now = datetime.now()
+    saved, _ = current_answers(session)
+    if answers is not None and accepts_answers(session, now):
+        final_answers = validate_answers(answers, len(session.question_ids))
+    else:
+        final_answers = saved
+
+    questions = load_questions(db, session.question_ids)
+    questions_data, correct_count = grade(questions, final_answers)
+    total = len(session.question_ids)
+    prefix = "formal" if session.exam_type == "formal_exam" else session.exam_type.replace("_exam", "")
+    record_id = f"{prefix}_{session.id}"
+
+    # 以状态更新作为提交锁，同一会话并发提交时只有一个请求写入记录
+    claimed = db.execute(update(_table).where(
+        _table.c.id == session.id, _table.c.status == "active"
+    ).values(
+        status=status, submitted_at=now, record_id=record_id, answers=final_answers, saved_at=now
+    )).rowcount
+    if not claimed:
+        db.rollback()
+        _forget(session.id)
+        return None
+
+    iso_year, iso_week, _ = now.isocalendar()
+    record = ExamRecordModel(
+        id=record_id,
+        user_name=session.user_name,
+        user_id=session.user_id,
+        department=session.department,
+        region=session.region,
+        team_id=session.team_id,
+        bank_id=session.bank_id,
+        score=round(correct_count / total * 100) if total else 0,
+        correct_count=correct_count,
+        total_questions=total,
+        duration=max(0, int((min(now, session.deadline) - session.started_at).total_seconds())),
+        exam_type=session.exam_type,
+        week_number=iso_week,
+        year=iso_year,
+        detailed_answers=final_answers,
+        questions_data=questions_data,
+    )
+    db.add(record)
+    summary = live_feed.record_summary(record)
+    db.commit()
+    _forget(session.id)
+    SESSIONS_SUBMITTED.inc(status)
+    live_feed.exam_submitted(summary)
+    return record
+
+
+def _forget(session_id: str):
+    with _lock:
+        _pending.pop(session_id, None)
+        _sessions.pop(session_id, None)
+        AUTOSAVE_PENDING.set(value=len(_pending))
+
+
+def expire_overdue(db: Session) -> List[str]:
+    """把超过截止时间仍未交卷的会话自动交卷，返回生成的考试记录ID"""
+    # 多等待两个写入周期，其他进程内存中截止前的自动保存已写入数据库
+    cutoff = datetime.now() - grace() - settle_time()
+    overdue = db.query(ExamSession).filter(
+        ExamSession.status == "active", ExamSession.deadline < cutoff
+    ).order_by(ExamSession.deadline).limit(_EXPIRE_BATCH).all()
+    record_ids = []
+    for session in overdue:
+        record = submit(db, session, status="expired")
+        if record is not None:
+            record_ids.append(record.id)
+
+    # 其他进程交卷的会话不会通知本进程，按截止时间清理缓存
+    with _lock:
+        for session_id in [key for key, info in _sessions.items() if info.deadline < cutoff]:
+            if session_id not in _pending:
+                del _sessions[session_id]
+    return record_ids
+
+
+def run_maintenance() -> List[str]:
+    """写入自动保存的作答，并对超时会话自动交卷"""
+    from .database import SessionLocal
+
+    flush()
+    db = SessionLocal()
+    try:
+        return expire_overdue(db)
+    finally:
+        db.close()
+
+
+async def _maintenance_loop():
+    while True:
+        await asyncio.sleep(settings.exam_autosave_flush_seconds)
+        try:
+            record_ids = await asyncio.to_thread(run_maintenance)
+        except Exception as e:
+            logger.error("考试会话自动保存失败: %s", e)
+            continue
+        if record_ids:
+            from .ai_report import generate_auto_report_async
+            for record_id in record_ids:
+                background.spawn(generate_auto_report_async(record_id), kind="ai_report")
+
+
+_loop_task: Optional[asyncio.Task] = None
+
+
+def start():
+    """启动后台写入任务（在服务启动时调用）"""
+    global _loop_task
+    if _loop_task is None:
+        _loop_task = background.create_task(_maintenance_loop(), name="exam_sessions")
+
+
+async def stop():
+    """停止后台任务并写入剩余的作答"""
+    global _loop_task
+    task, _loop_task = _loop_task, None
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    try:
+        await asyncio.to_thread(flush)
+    except Exception as e:
+        logger.error("停止服务时写入考试作答失败: %s", e)
@@ -0,0 +1,49 @@
+"""
+快速JSON响应 - 直接把查询出的列元组序列化为JSON，
+跳过ORM对象构建和Pydantic模型的重复校验
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, List, Sequence
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，缺失时退回标准库 json
+    orjson = None
+
+from fastapi.responses import Response
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化类型: {type(value).__name__}")
+
+
+def dumps(data: Any) -> bytes:
+    """序列化为UTF-8编码的JSON字节"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        data, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def rows_to_dicts(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    """把列元组按输出字段名组装成字典列表"""
+    return [dict(zip(keys, row)) for row in rows]
+
+
+class FastJSONResponse(Response):
+    """使用 orjson 渲染的JSON响应"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_response(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> FastJSONResponse:
+    """把查询结果的列元组直接作为JSON数组返回"""
+    return FastJSONResponse(rows_to_dicts(keys, rows))
@@ -0,0 +1,409 @@
+"""
+索引建议 - 通过引擎事件记录运行时查询在每张表上使用的 WHERE/JOIN/ORDER BY 列组合，
+对照现有索引给出组合索引和覆盖索引建议，列出观测期间未使用或冗余的索引，
+并生成可放入 app/migrations/versions/ 的迁移脚本。
+
+默认不记录，由管理接口或 INDEX_ADVISOR_ENABLED 开启；关闭时每条语句只有一次全局变量判断。
+同一条SQL文本只解析一次，之后按文本查缓存。
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, inspect
+
+from .config import settings
+from .metrics import current_route
+
+# 解析结果缓存的最大语句数，记录的最大列组合数
+_MAX_PARSED_STATEMENTS = 2000
+_MAX_PATTERNS = 1000
+
+_KEYWORDS = {
+    "where", "join", "left", "right", "inner", "outer", "cross", "on", "group", "order",
+    "limit", "offset", "union", "having", "set", "values", "select", "as"
+}
+_TABLE_REF = re.compile(r'\b(?:FROM|JOIN|UPDATE)\s+"?(\w+)"?(?:\s+(?:AS\s+)?"?(\w+)"?)?', re.I)
+_PREDICATE = re.compile(
+    r'(?<![\w."])"?(\w+)"?\."?(\w+)"?\s*'
+    r'(=|!=|<>|>=|<=|>|<|\bNOT\s+IN\b|\bIN\b|\bNOT\s+LIKE\b|\bLIKE\b|\bBETWEEN\b|\bIS\s+NOT\b|\bIS\b)',
+    re.I
+)
+# 列与列的等值连接
+_JOIN = re.compile(r'(?<![\w."])"?(\w+)"?\."?(\w+)"?\s*=\s*"?(\w+)"?\."?(\w+)"?(?![\w.(])')
+# 被函数包裹的列无法使用索引
+_WRAPPED = re.compile(r'\b(\w+)\(\s*"?(\w+)"?\."?(\w+)"?\s*\)\s*(?:=|>=|<=|>|<|\bIN\b|\bBETWEEN\b)', re.I)
+_ORDER_BY = re.compile(r'\bORDER\s+BY\s+(.+?)(?=\bLIMIT\b|\bOFFSET\b|\)|$)', re.I | re.S)
+_COLUMN = re.compile(r'"?(\w+)"?\."?(\w+)"?')
+_SELECT_LIST = re.compile(r'^\s*SELECT\s+(?:DISTINCT\s+)?(.+?)\s+FROM\b', re.I | re.S)
+
+_EQUALITY_OPS = {"=", "in", "is"}
+_RANGE_OPS = {">", "<", ">=", "<=", "between", "like"}
+
+
+class _Usage:
+    """一张表在一条语句中的列使用情况"""
+
+    __slots__ = ("equality", "range", "join", "order", "selected", "wrapped")
+
+    def __init__(self):
+        self.equality = set()
+        self.join = set()
+        self.range = set()
+        self.order: List[str] = []
+        self.selected = set()
+        self.wrapped = set()
+
+
+def parse_statement(statement: str) -> Dict[str, _Usage]:
+    """解析SQL中每张表用到的过滤、排序和查询列"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(statement):
+        aliases[table] = table
+        if alias and alias.lower() not in _KEYWORDS:
+            aliases[alias] = table
+
+    usages: Dict[str, _Usage] = {}
+
+    def usage(alias: str) -> Optional[_Usage]:
+        table = aliases.get(alias)
+        if table is None:
+            return None
+        return usages.setdefault(table, _Usage())
+
+    joins = set()
+    for left_alias, left_column, right_alias, right_column in _JOIN.findall(statement):
+        for alias, column in ((left_alias, left_column), (right_alias, right_column)):
+            target = usage(alias)
+            if target is not None:
+                target.join.add(column)
+                joins.add((alias, column))
+
+    for alias, column, op in _PREDICATE.findall(statement):
+        op = " ".join(op.lower().split())
+        target = usage(alias)
+        if target is None:
+            continue
+        if op == "=" and (alias, column) in joins:
+            continue
+        if op in _EQUALITY_OPS:
+            target.equality.add(column)
+        elif op in _RANGE_OPS:
+            target.range.add(column)
+    for func, alias, column in _WRAPPED.findall(statement):
+        target = usage(alias)
+        if target is not None and func.lower() not in ("in",):
+            target.wrapped.add(f"{func.lower()}({column})")
+    for clause in _ORDER_BY.findall(statement):
+        for alias, column in _COLUMN.findall(clause):
+            target = usage(alias)
+            if target is not None and column not in target.order:
+                target.order.append(column)
+    select = _SELECT_LIST.match(statement)
+    if select:
+        for alias, column in _COLUMN.findall(select.group(1)):
+            target = usage(alias)
+            if target is not None:
+                target.selected.add(column)
+
+    # 等值条件中的列不再算作范围条件和连接条件
+    for target in usages.values():
+        target.range -= target.equality
+        target.join -= target.equality
+    return usages
+
+
+class _Pattern:
+    __slots__ = ("table", "equality", "range", "join", "order", "count", "total_ms", "selected", "routes", "example")
+
+    def __init__(self, table: str, equality: Tuple[str, ...], range_: Tuple[str, ...],
+                 join: Tuple[str, ...], order: Tuple[str, ...], example: str):
+        self.table = table
+        self.equality = equality
+        self.range = range_
+        self.join = join
+        self.order = order
+        self.count = 0
+        self.total_ms = 0.0
+        self.selected = set()
+        self.routes = set()
+        self.example = example
+
+
+_enabled = settings.index_advisor_enabled
+_started_at: Optional[datetime] = datetime.now() if _enabled else None
+_parsed: Dict[str, Dict[str, _Usage]] = {}
+_patterns: Dict[tuple, _Pattern] = {}
+_wrapped: Dict[Tuple[str, str], int] = {}
+_statements = 0
+_lock = threading.Lock()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _enabled:
+        conn.info.setdefault("index_advisor_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    global _statements
+    starts = conn.info.get("index_advisor_start")
+    if not starts:
+        return  # 执行期间才开启记录
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    if not _enabled or statement.lstrip()[:6].upper() not in ("SELECT", "UPDATE", "DELETE"):
+        return
+    usages = _parsed.get(statement)
+    if usages is None:
+        usages = parse_statement(statement)
+        if len(_parsed) < _MAX_PARSED_STATEMENTS:
+            _parsed[statement] = usages
+
+    route = current_route()
+    with _lock:
+        _statements += 1
+        for table, use in usages.items():
+            for expression in use.wrapped:
+                _wrapped[(table, expression)] = _wrapped.get((table, expression), 0) + 1
+            key = (table, tuple(sorted(use.equality)), tuple(sorted(use.range)),
+                   tuple(sorted(use.join)), tuple(use.order))
+            pattern = _patterns.get(key)
+            if pattern is None:
+                if len(_patterns) >= _MAX_PATTERNS:
+                    continue
+                pattern = _patterns[key] = _Pattern(table, *key[1:], " ".join(statement.split()))
+            pattern.count += 1
+            pattern.total_ms += elapsed_ms
+            pattern.selected |= use.selected
+            if route:
+                pattern.routes.add(route)
+
+
+def install_index_advisor(engine):
+    """在数据库引擎上挂载列使用记录（重复调用无副作用）"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start_recording():
+    global _enabled, _started_at
+    if not _enabled:
+        _started_at = datetime.now()
+    _enabled = True
+
+
+def stop_recording():
+    global _enabled
+    _enabled = False
+
+
+def is_recording() -> bool:
+    return _enabled
+
+
+def reset():
+    """清空已记录的数据"""
+    global _statements, _started_at
+    with _lock:
+        _patterns.clear()
+        _wrapped.clear()
+        _statements = 0
+        _started_at = datetime.now() if _enabled else None
+
+
+def _existing_indexes(engine, tables: Sequence[str]) -> Dict[str, List[dict]]:
+    inspector = inspect(engine)
+    existing = {}
+    for table in tables:
+        if not inspector.has_table(table):
+            continue
+        indexes = [
+            {"name": index["name"], "columns": list(index["column_names"]), "unique": bool(index.get("unique"))}
+            for index in inspector.get_indexes(table)
+        ]
+        for constraint in inspector.get_unique_constraints(table):
+            indexes.append({"name": constraint["name"] or f"{table}_unique", "columns": constraint["column_names"],
+                            "unique": True})
+        pk = inspector.get_pk_constraint(table).get("constrained_columns") or []
+        if pk:
+            indexes.append({"name": "PRIMARY KEY", "columns": list(pk), "unique": True})
+        existing[table] = indexes
+    return existing
+
+
+def _serves(index_columns: List[str], equality: Sequence[str], tail: Sequence[str]) -> bool:
+    """索引能否完整支持该列组合：前缀为全部等值列（顺序不限），其后依次为范围/排序列"""
+    n = len(equality)
+    return (set(index_columns[:n]) == set(equality)
+            and list(index_columns[n:n + len(tail)]) == list(tail))
+
+
+def _index_name(table: str, columns: Sequence[str]) -> str:
+    return f"ix_{table}_{'_'.join(columns)}"
+
+
+def report(engine, min_count: int = 5, limit: int = 50) -> dict:
+    """根据记录的列组合生成索引建议"""
+    with _lock:
+        patterns = list(_patterns.values())
+        wrapped = dict(_wrapped)
+        statements = _statements
+    # 等值列在各组合中出现的次数，用于确定组合索引中等值列的顺序
+    equality_weight: Dict[Tuple[str, str], int] = {}
+    for pattern in patterns:
+        for column in pattern.equality:
+            equality_weight[(pattern.table, column)] = equality_weight.get((pattern.table, column), 0) + pattern.count
+
+    tables = sorted({pattern.table for pattern in patterns})
+    existing = _existing_indexes(engine, tables)
+
+    recommendations: Dict[Tuple[str, Tuple[str, ...]], dict] = {}
+    used_leading: Dict[str, set] = {}
+    for pattern in patterns:
+        used_leading.setdefault(pattern.table, set()).update(
+            pattern.equality, pattern.range, pattern.join, pattern.order
+        )
+        if pattern.count < min_count or pattern.table not in existing:
+            continue
+        equality = sorted(pattern.equality, key=lambda column: (-equality_weight[(pattern.table, column)], column))
+        if pattern.range:
+            tail = [sorted(pattern.range)[0]]
+        else:
+            tail = [column for column in pattern.order if column not in pattern.equality]
+        if not equality and not tail:
+            # 没有过滤和排序条件时，被连接的表按连接列查找
+            equality = sorted(pattern.join)
+        columns = equality + tail
+        if not columns:
+            continue
+        if any(_serves(index["columns"], equality, tail) for index in existing[pattern.table]):
+            continue
+
+        extra = sorted(pattern.selected - set(columns))
+        key = (pattern.table, tuple(columns))
+        item = recommendations.get(key)
+        if item is None:
+            item = recommendations[key] = {
+                "table": pattern.table,
+                "name": _index_name(pattern.table, columns),
+                "columns": columns,
+                "covering_columns": columns + extra if extra and len(extra) <= 3 else None,
+                "count": 0,
+                "total_ms": 0.0,
+                "routes": set(),
+                "example": pattern.example
+            }
+        item["count"] += pattern.count
+        item["total_ms"] += pattern.total_ms
+        item["routes"] |= pattern.routes
+
+    # 某个建议是另一个建议的前缀时，合并到较长的索引中
+    merged = sorted(recommendations.values(), key=lambda item: len(item["columns"]), reverse=True)
+    result = []
+    for item in merged:
+        parent = next((
+            other for other in result
+            if other["table"] == item["table"] and other["columns"][:len(item["columns"])] == item["columns"]
+        ), None)
+        if parent:
+            parent["count"] += item["count"]
+            parent["total_ms"] += item["total_ms"]
+            parent["routes"] |= item["routes"]
+        else:
+            result.append(item)
+    result.sort(key=lambda item: item["total_ms"], reverse=True)
+    for item in result:
+        item["total_ms"] = round(item["total_ms"], 2)
+        item["routes"] = sorted(item["routes"])
+
+    unused, redundant = [], []
+    for table, indexes in existing.items():
+        for index in indexes:
+            if index["unique"]:
+                continue
+            if index["columns"][0] not in used_leading.get(table, set()):
+                unused.append({"table": table, "name": index["name"], "columns": index["columns"]})
+            longer = next((
+                other["name"] for other in indexes
+                if other is not index and other["columns"][:len(index["columns"])] == index["columns"]
+                and (len(other["columns"]) > len(index["columns"]) or other["unique"])
+            ), None)
+            if longer:
+                redundant.append({"table": table, "name": index["name"], "columns": index["columns"],
+                                  "covered_by": longer})
+
+    patterns.sort(key=lambda pattern: pattern.total_ms, reverse=True)
+    return {
+        "recording": _enabled,
+        "started_at": _started_at.isoformat() if _started_at else None,
+        "statements": statements,
+        "min_count": min_count,
+        "recommendations": result[:limit],
+        "unused_indexes": unused,
+        "redundant_indexes": redundant,
+        "non_sargable": [
+            {"table": table, "expression": expression, "count": count}
+            for (table, expression), count in sorted(wrapped.items(), key=lambda item: -item[1])
+        ],
+        "patterns": [
+            {
+                "table": pattern.table,
+                "equality": list(pattern.equality),
+                "range": list(pattern.range),
+                "join": list(pattern.join),
+                "order": list(pattern.order),
+                "count": pattern.count,
+                "total_ms": round(pattern.total_ms, 2),
+                "routes": sorted(pattern.routes)
+            }
+            for pattern in patterns[:limit]
+        ]
+    }
+
+
+def render_migration(engine, min_count: int = 5, covering: bool = False) -> Tuple[str, str]:
+    """生成迁移脚本，返回 (文件名, 内容)"""
+    from .migrations import discover
+
+    data = report(engine, min_count=min_count)
+    versions = [int(migration.version) for migration in discover()]
+    filename = f"{(max(versions) if versions else 0) + 1:04d}_index_advisor.py"
+
+    lines = [
+        f'"""索引建议（{datetime.now():%Y-%m-%d %H:%M}，观测 {data["statements"]} 条语句）',
+        "",
+    ]
+    indexes = []
+    for item in data["recommendations"]:
+        columns = item["covering_columns"] if covering and item["covering_columns"] else item["columns"]
+        name = _index_name(item["table"], columns)
+        indexes.append((name, item["table"], columns))
+        routes = ", ".join(item["routes"]) or "-"
+        lines.append(f"- {name}: {item['count']} 次查询, 累计 {item['total_ms']}ms（{routes}）")
+    if not indexes:
+        lines.append("观测期间没有需要新增的索引")
+    lines += ['"""', "", "from .. import create_index, drop_index", "", "INDEXES = ("]
+    lines += [f"    ({name!r}, {table!r}, {columns!r})," for name, table, columns in indexes]
+    lines.append(")")
+    if data["unused_indexes"] or data["redundant_indexes"]:
+        lines += ["", "# 以下索引在观测期间未使用或被更长的索引覆盖，确认后可在后续版本中删除:"]
+        lines += [f"# - {item['name']} ({item['table']}: {', '.join(item['columns'])}) 未使用"
+                  for item in data["unused_indexes"]]
+        lines += [f"# - {item['name']} ({item['table']}: {', '.join(item['columns'])}) 被 {item['covered_by']} 覆盖"
+                  for item in data["redundant_indexes"]]
+    lines += [
+        "", "",
+        "def upgrade(conn):",
+        "    for name, table, columns in INDEXES:",
+        "        create_index(conn, name, table, columns)",
+        "", "",
+        "def downgrade(conn):",
+        "    for name, _, _ in INDEXES:",
+        "        drop_index(conn, name)",
+        "",
+    ]
+    return filename, "\n".join(lines)
@@ -0,0 +1,224 @@
+"""
+旧记录的题目还原 - 没有 questions_data 的考试记录只保存了 detailed_answers，前端按题目在考试中的
+序号记录作答（{"0": "A", "1": "BC"}，未作答的题目没有键），早期接口也有按题目ID提交的。
+
+作答对应的题目按以下顺序确定，都无法确定时不做分析（不按题库前N道题猜测）：
+- 记录来自考试会话（记录ID为 "<类型>_<会话ID>"）时，按会话固定的题目顺序取题目ID
+- 所有键都是数字且都不小于题目总数（不可能是序号）时，按题目ID解析
+- 其余情况（序号作答、序号和题目ID无法区分、含非数字键、没有会话）无法还原
+
+题目按ID缓存在进程内，缓存中没有的题目用一次 IN 查询读取；题目修改后最多 _CACHE_TTL 秒生效。
+
+命令行: python -m app.legacy_answers repair [--batch-size 500] [--reset-reports] [--dry-run]
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .exam_sessions import grade
+from .models import ExamRecord as ExamRecordModel, ExamSession, Question as QuestionModel
+
+# 每次 IN 查询的题目数（SQLite 默认最多999个参数）
+_LOOKUP_BATCH = 500
+_CACHE_SIZE = 20000
+_CACHE_TTL = 300
+
+
+class CachedQuestion(NamedTuple):
+    """判分和AI分析用到的题目字段（属性名与 Question 模型一致）"""
+    id: int
+    question: str
+    option_a: str
+    option_b: str
+    option_c: Optional[str]
+    option_d: Optional[str]
+    answer: str
+    question_type: str
+    category: str
+    explanation: Optional[str]
+
+
+_FIELDS = [getattr(QuestionModel, name) for name in CachedQuestion._fields]
+_cache: "OrderedDict[int, Tuple[float, CachedQuestion]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def load_questions(db: Session, question_ids: Iterable[int]) -> Dict[int, CachedQuestion]:
+    """按ID读取题目（已删除的题目不在结果中）"""
+    found: Dict[int, CachedQuestion] = {}
+    missing = []
+    now = time.monotonic()
+    with _lock:
+        for question_id in set(question_ids):
+            entry = _cache.get(question_id)
+            if entry is not None and now - entry[0] <= _CACHE_TTL:
+                _cache.move_to_end(question_id)
+                found[question_id] = entry[1]
+            else:
+                missing.append(question_id)
+
+    for i in range(0, len(missing), _LOOKUP_BATCH):
+        rows = db.query(*_FIELDS).filter(QuestionModel.id.in_(missing[i:i + _LOOKUP_BATCH])).all()
+        with _lock:
+            for row in rows:
+                question = CachedQuestion(*row)
+                found[question.id] = question
+                _cache[question.id] = (now, question)
+                _cache.move_to_end(question.id)
+            while len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+    return found
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def _answers(record: ExamRecordModel) -> dict:
+    answers = record.detailed_answers
+    if isinstance(answers, str):
+        try:
+            answers = json.loads(answers)
+        except ValueError:
+            return {}
+    return answers if isinstance(answers, dict) else {}
+
+
+def _session_id(record_id: str) -> Optional[str]:
+    prefix, _, session_id = record_id.partition("_")
+    return session_id if prefix and session_id else None
+
+
+def session_question_ids(db: Session, records: List[ExamRecordModel]) -> Dict[str, list]:
+    """记录ID -> 考试会话中的题目ID（按考试中的顺序），按会话主键一次查询"""
+    candidates = {_session_id(record.id): record.id for record in records if _session_id(record.id)}
+    session_ids = list(candidates)
+    result = {}
+    for i in range(0, len(session_ids), _LOOKUP_BATCH):
+        rows = db.query(ExamSession.id, ExamSession.record_id, ExamSession.question_ids).filter(
+            ExamSession.id.in_(session_ids[i:i + _LOOKUP_BATCH])
+        ).all()
+        for session_id, record_id, question_ids in rows:
+            if record_id and candidates.get(session_id) == record_id:
+                result[record_id] = question_ids or []
+    return result
+
+
+def _is_question_ids(answers: dict, total_questions: int) -> bool:
+    """所有键都不可能是序号时才按题目ID解析，部分键可能是序号时无法区分"""
+    return all(key.isdigit() and int(key) >= (total_questions or 0) for key in answers)
+
+
+def plan(record: ExamRecordModel, session_ids: Optional[list]) -> Optional[Tuple[List[int], dict]]:
+    """记录中作答对应的 (题目ID列表, 按序号的作答)；无法确定时返回 None"""
+    answers = _answers(record)
+    if session_ids:
+        return list(session_ids), answers
+    if not answers or not _is_question_ids(answers, record.total_questions):
+        return None
+    question_ids = [int(key) for key in answers]
+    by_position = {str(i): answer for i, answer in enumerate(answers.values())}
+    return question_ids, by_position
+
+
+def rebuild(db: Session, records: List[ExamRecordModel]) -> Dict[str, list]:
+    """按当前题库还原记录的 questions_data（与交卷时生成的格式相同），无法还原的记录不在结果中"""
+    sessions = session_question_ids(db, records)
+    plans = {}
+    for record in records:
+        resolved = plan(record, sessions.get(record.id))
+        if resolved is not None:
+            plans[record.id] = resolved
+    questions = load_questions(db, (question_id for ids, _ in plans.values() for question_id in ids))
+
+    result = {}
+    for record_id, (question_ids, answers) in plans.items():
+        questions_data, _ = grade([questions.get(question_id) for question_id in question_ids], answers)
+        if questions_data:
+            result[record_id] = questions_data
+    return result
+
+
+def repair(batch_size: int = 500, reset_reports: bool = False, dry_run: bool = False, log=print) -> dict:
+    """为没有 questions_data 的历史记录补写题目数据，可重复执行；
+    reset_reports 时同时清空这些记录按旧方法（题库前N道题）生成的AI报告，以便重新生成"""
+    from .database import SessionLocal
+
+    scanned = repaired = reports_reset = 0
+    last_id = ""
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        while True:
+            records = db.query(ExamRecordModel).filter(
+                ExamRecordModel.id > last_id,
+                ExamRecordModel.stored_questions_data.is_(None),
+                ExamRecordModel.detailed_answers.isnot(None)
+            ).order_by(ExamRecordModel.id).limit(batch_size).all()
+            if not records:
+                break
+            last_id = records[-1].id
+            scanned += len(records)
+
+            rebuilt = rebuild(db, records)
+            for record in records:
+                questions_data = rebuilt.get(record.id)
+                if questions_data is None:
+                    continue
+                repaired += 1
+                if dry_run:
+                    continue
+                record.questions_data = questions_data
+                if reset_reports and record.ai_report:
+                    record.ai_report = None
+                    record.ai_report_prompt_tokens = None
+                    record.ai_report_completion_tokens = None
+                    reports_reset += 1
+            if dry_run:
+                db.rollback()
+            else:
+                db.commit()
+            db.expunge_all()
+            log(f"  已检查 {scanned} 条记录，还原 {repaired} 条")
+    finally:
+        db.close()
+    return {
+        "scanned": scanned,
+        "repaired": repaired,
+        "unresolved": scanned - repaired,
+        "reports_reset": reports_reset,
+        "seconds": round(time.perf_counter() - start, 1)
+    }
+
+
+def main():
+    import argparse
+
+    from .database import init_db
+
+    parser = argparse.ArgumentParser(description="旧考试记录的题目还原")
+    sub = parser.add_subparsers(dest="command", required=True)
+    repair_parser = sub.add_parser("repair", help="为没有题目数据的历史记录按作答还原 questions_data")
+    repair_parser.add_argument("--batch-size", type=int, default=500)
+    repair_parser.add_argument("--reset-reports", action="store_true",
+                               help="同时清空这些记录已生成的AI报告（由积压处理重新生成）")
+    repair_parser.add_argument("--dry-run", action="store_true", help="只统计，不写入")
+    args = parser.parse_args()
+
+    init_db()
+    result = repair(args.batch_size, args.reset_reports, args.dry_run)
+    action = "可还原" if args.dry_run else "还原"
+    print(f"✅ {action} {result['repaired']} 条记录（共检查 {result['scanned']} 条，"
+          f"{result['unresolved']} 条无法确定作答对应的题目，用时 {result['seconds']}秒）")
+    if result["reports_reset"]:
+        print(f"🗑️ 已清空 {result['reports_reset']} 份AI报告，可用 python -m app.report_backlog run 重新生成")
+
+
+if __name__ == "__main__":
+    main()
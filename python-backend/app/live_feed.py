@@ -0,0 +1,288 @@
+"""
+管理后台实时推送 - 进程内发布/订阅，通过 Server-Sent Events 推送新提交的考试记录、
+生成完成的AI报告和今日滚动统计。管理员观看考试时不再反复查询考试记录和统计接口，
+每个事件只在内存中分发给所有连接。
+
+事件：
+- exam_submitted: 新的考试记录（摘要字段）
+- ai_report: AI报告生成完成（只含记录ID，需要时再读取报告内容）
+- aggregates: 今日及最近一小时的统计，连接时推送一次，之后每次提交后推送
+
+发布方可以在事件循环中或工作线程中调用 publish。多进程部署时每个进程只分发本进程内的事件，
+统计每隔 LIVE_FEED_RESYNC_SECONDS 秒从数据库重新汇总一次，其他进程的提交在下次汇总时计入。
+
+事件ID为 "<进程标识>-<序号>"，序号只在本进程内递增。断线重连时 Last-Event-ID 由本进程发出才补发
+之后的事件；重连到其他进程（或进程已重启）时不补发，只推送最新统计。
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from .config import settings
+from .metrics import Counter, Gauge, registry
+
+EVENTS_PUBLISHED = registry.register(Counter(
+    "live_feed_events_total", "实时推送发布的事件数", ("event",)
+))
+EVENTS_DROPPED = registry.register(Counter(
+    "live_feed_events_dropped_total", "订阅者处理过慢而丢弃的事件数"
+))
+SUBSCRIBERS = registry.register(Gauge(
+    "live_feed_subscribers", "实时推送连接数"
+))
+
+# 每个连接最多积压的事件数，超出时丢弃最早的事件
+_QUEUE_SIZE = 200
+# 断线重连（Last-Event-ID）时可补发的最近事件数
+_HISTORY_SIZE = 500
+
+Message = Tuple[int, str, str]  # (事件序号, 事件名, JSON数据)
+
+
+class _Subscriber:
+    __slots__ = ("loop", "queue")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Message]" = asyncio.Queue(maxsize=_QUEUE_SIZE)
+
+    def offer(self, message: Message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            EVENTS_DROPPED.inc()
+        self.queue.put_nowait(message)
+
+
+_subscribers: Set[_Subscriber] = set()
+_history: Deque[Message] = deque(maxlen=_HISTORY_SIZE)
+_ids = itertools.count(1)
+_lock = threading.Lock()
+# 进程标识：预加载应用后派生的工作进程各自重新生成
+_epoch = secrets.token_hex(4)
+
+
+def _after_fork():
+    global _epoch, _ids
+    _epoch = secrets.token_hex(4)
+    _ids = itertools.count(1)
+    _history.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    """Last-Event-ID 中的事件序号；不是本进程发出的ID返回 None"""
+    epoch, _, number = (value or "").rpartition("-")
+    if epoch != _epoch or not number.isdigit():
+        return None
+    return int(number)
+
+
+def _dumps(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"),
+                      default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+
+
+def publish(event: str, data: dict):
+    """发布事件（线程安全）"""
+    payload = _dumps(data)
+    with _lock:
+        message = (next(_ids), event, payload)
+        _history.append(message)
+        subscribers = list(_subscribers)
+    EVENTS_PUBLISHED.inc(event)
+    for subscriber in subscribers:
+        try:
+            subscriber.loop.call_soon_threadsafe(subscriber.offer, message)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+
+def format_event(message: Message) -> str:
+    event_id, event, payload = message
+    return f"id: {_epoch}-{event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class RollingStats:
+    """今日统计（按部门）和最近一小时的提交数、平均分，随提交增量更新"""
+
+    def __init__(self):
+        self.day = None
+        self.departments: Dict[str, List[int]] = {}  # 部门 -> [次数, 总分, 80分及以上, 60分以下]
+        self.recent: Deque[Tuple[datetime, int]] = deque()
+        self.synced_at = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, department: Optional[str], score: int, created_at: datetime):
+        with self.lock:
+            if self.day != created_at.date():
+                # 尚未汇总或已跨天，等待下次汇总
+                self.synced_at = 0.0
+                return
+            item = self.departments.setdefault(department or "未分组", [0, 0, 0, 0])
+            item[0] += 1
+            item[1] += score
+            item[2] += score >= 80
+            item[3] += score < 60
+            self.recent.append((created_at, score))
+
+    def resync(self, db):
+        """从数据库重新汇总今日统计"""
+        from sqlalchemy import case, func
+
+        from .models import ExamRecord as ExamRecordModel
+
+        now = datetime.now()
+        day_start = datetime.combine(now.date(), datetime.min.time())
+        score = ExamRecordModel.score
+        rows = db.query(
+            ExamRecordModel.department, func.count(), func.sum(score),
+            func.sum(case((score >= 80, 1), else_=0)), func.sum(case((score < 60, 1), else_=0))
+        ).filter(ExamRecordModel.created_at >= day_start).group_by(ExamRecordModel.department).all()
+        recent = db.query(ExamRecordModel.created_at, score).filter(
+            ExamRecordModel.created_at >= now - timedelta(hours=1)
+        ).order_by(ExamRecordModel.created_at).all()
+
+        departments: Dict[str, List[int]] = {}
+        for department, count, score_sum, high, low in rows:
+            item = departments.setdefault(department or "未分组", [0, 0, 0, 0])
+            for i, value in enumerate((count, score_sum, high, low)):
+                item[i] += int(value or 0)
+        with self.lock:
+            self.day = now.date()
+            self.departments = departments
+            self.recent = deque((created_at, value) for created_at, value in recent)
+            self.synced_at = time.monotonic()
+
+    def ready(self) -> bool:
+        return self.day == datetime.now().date()
+
+    def due(self) -> bool:
+        return time.monotonic() - self.synced_at >= settings.live_feed_resync_seconds
+
+    def snapshot(self) -> dict:
+        now = datetime.now()
+        with self.lock:
+            cutoff = now - timedelta(hours=1)
+            while self.recent and self.recent[0][0] < cutoff:
+                self.recent.popleft()
+            departments = {name: list(item) for name, item in self.departments.items()}
+            recent_scores = [score for _, score in self.recent]
+
+        count = sum(item[0] for item in departments.values())
+        return {
+            "date": now.strftime("%Y-%m-%d"),
+            "total_exams": count,
+            "avg_score": round(sum(item[1] for item in departments.values()) / count, 1) if count else 0,
+            "high_performers": sum(item[2] for item in departments.values()),
+            "low_performers": sum(item[3] for item in departments.values()),
+            "department_stats": [
+                {"department": name, "exam_count": c, "avg_score": round(s / c, 1),
+                 "high_performers": high, "low_performers": low}
+                for name, (c, s, high, low) in sorted(departments.items())
+            ],
+            "last_hour": {
+                "exam_count": len(recent_scores),
+                "avg_score": round(sum(recent_scores) / len(recent_scores), 1) if recent_scores else 0
+            },
+            "generated_at": now.isoformat()
+        }
+
+
+stats = RollingStats()
+
+
+def _resync():
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        stats.resync(db)
+    finally:
+        db.close()
+
+
+_resync_lock = asyncio.Lock()
+
+
+async def _fresh_snapshot() -> dict:
+    if stats.due():
+        async with _resync_lock:
+            if stats.due():
+                await asyncio.to_thread(_resync)
+    return stats.snapshot()
+
+
+def record_summary(record) -> dict:
+    """考试记录的摘要（与 /api/exam-records 的字段名一致）"""
+    return {
+        "id": record.id,
+        "userName": record.user_name,
+        "department": record.department,
+        "region": record.region,
+        "score": record.score,
+        "correctCount": record.correct_count,
+        "totalQuestions": record.total_questions,
+        "duration": record.duration,
+        "exam_type": record.exam_type,
+        "created_at": record.created_at or datetime.now()
+    }
+
+
+def exam_submitted(summary: dict):
+    """新考试记录：推送记录摘要并更新统计（在事务提交后调用）"""
+    created_at = summary["created_at"]
+    stats.add(summary["department"], summary["score"], created_at)
+    publish("exam_submitted", summary)
+    if _subscribers and stats.ready():
+        publish("aggregates", stats.snapshot())
+
+
+def ai_report_ready(record_id: str):
+    publish("ai_report", {"id": record_id})
+
+
+def subscriber_count() -> int:
+    return len(_subscribers)
+
+
+async def stream(last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+    """单个连接的事件流：先补发断线期间的事件（只补发本进程发出的）和当前统计，之后推送新事件，空闲时发送心跳"""
+    subscriber = _Subscriber(asyncio.get_running_loop())
+    last_id = parse_event_id(last_event_id)
+    with _lock:
+        _subscribers.add(subscriber)
+        backlog = [message for message in _history if last_id is not None and message[0] > last_id]
+    SUBSCRIBERS.set(value=len(_subscribers))
+    try:
+        yield "retry: 3000\n\n"
+        for message in backlog:
+            yield format_event(message)
+        yield f"event: aggregates\ndata: {_dumps(await _fresh_snapshot())}\n\n"
+
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.live_feed_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                # 心跳保持连接；定期重新汇总，计入其他进程的提交
+                if stats.due():
+                    yield f"event: aggregates\ndata: {_dumps(await _fresh_snapshot())}\n\n"
+                else:
+                    yield ": ping\n\n"
+                continue
+            yield format_event(message)
+    finally:
+        with _lock:
+            _subscribers.discard(subscriber)
+        SUBSCRIBERS.set(value=len(_subscribers))
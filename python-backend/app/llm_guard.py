@@ -0,0 +1,209 @@
+"""
+大模型接口保护 - 按接口地址分别限流（令牌桶 + 并发上限）和熔断。
+
+- 令牌桶：每秒补充 LLM_RATE_PER_SECOND 个、最多积累 LLM_RATE_BURST 个；同时进行的调用不超过
+  LLM_MAX_CONCURRENCY。等待超过 LLM_QUEUE_TIMEOUT_SECONDS 秒时直接失败，请求不会无限排队
+- 熔断：连续 LLM_CIRCUIT_FAILURE_THRESHOLD 次超时、连接失败、429 或 5xx 后断开，
+  LLM_CIRCUIT_RESET_SECONDS 秒内的调用立即失败；之后放行一次探测调用，成功则恢复，失败则继续断开
+- 密钥错误等其他 4xx 不计入熔断（接口本身正常）
+
+状态只在本进程内，多进程部署时每个进程分别限流和熔断。
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from . import llm_usage
+from .config import settings
+from .metrics import Counter, Gauge, registry
+
+logger = logging.getLogger("exam_system.llm_guard")
+
+LLM_CALLS = registry.register(Counter(
+    "llm_calls_total",
+    "大模型接口调用次数（ok 成功，error 失败，failure 计入熔断的失败，rejected 熔断中拒绝，throttled 排队超时）",
+    ("provider", "result")
+))
+CIRCUIT_STATE = registry.register(Gauge(
+    "llm_circuit_state", "大模型接口熔断状态（0 正常，1 探测中，2 断开）", ("provider",)
+))
+CIRCUIT_OPENED = registry.register(Counter(
+    "llm_circuit_opened_total", "大模型接口熔断断开次数", ("provider",)
+))
+LLM_IN_FLIGHT = registry.register(Gauge(
+    "llm_calls_in_flight", "进行中的大模型接口调用数", ("provider",)
+))
+LLM_WAIT_SECONDS = registry.register(Counter(
+    "llm_rate_limit_wait_seconds_total", "等待限流的总时间（秒）", ("provider",)
+))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class ProviderUnavailable(Exception):
+    """熔断中或排队超时，未发出请求"""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def wait_time(self) -> float:
+        """取走一个令牌，返回需要等待的秒数（令牌不足时预支，等待后再调用）"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class ProviderGuard:
+    """单个接口的限流和熔断状态"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.bucket = TokenBucket(settings.llm_rate_per_second, settings.llm_rate_burst)
+        self.slots = asyncio.Semaphore(max(1, settings.llm_max_concurrency))
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.last_error: Optional[str] = None
+        CIRCUIT_STATE.set(name, value=0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("大模型接口 %s 熔断状态: %s -> %s", self.name, self.state, state)
+        self.state = state
+        CIRCUIT_STATE.set(self.name, value=_STATE_VALUES[state])
+
+    def _admit(self):
+        """熔断检查：断开期间拒绝，冷却后只放行一次探测"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < settings.llm_circuit_reset_seconds:
+                raise ProviderUnavailable("大模型接口暂时不可用，请稍后重试")
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self.probing:
+                raise ProviderUnavailable("大模型接口暂时不可用，请稍后重试")
+            self.probing = True
+            return True
+        return False
+
+    def success(self):
+        self.failures = 0
+        self.probing = False
+        self._set_state(CLOSED)
+
+    def failure(self, error: str):
+        self.failures += 1
+        self.probing = False
+        self.last_error = error
+        if self.state == HALF_OPEN or self.failures >= settings.llm_circuit_failure_threshold:
+            if self.state != OPEN:
+                CIRCUIT_OPENED.inc(self.name)
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def status(self) -> dict:
+        return {
+            "provider": self.name,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "last_error": self.last_error,
+            "retry_in_seconds": max(0.0, round(
+                self.opened_at + settings.llm_circuit_reset_seconds - time.monotonic(), 1
+            )) if self.state == OPEN else 0.0
+        }
+
+
+_guards: Dict[str, ProviderGuard] = {}
+
+
+def guard_for(api_config: dict) -> ProviderGuard:
+    name = llm_usage.provider_name(api_config)
+    guard = _guards.get(name)
+    if guard is None:
+        guard = _guards[name] = ProviderGuard(name)
+    return guard
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """是否为接口不可用导致的失败（超时、连接失败、429、5xx），由调用方在异常上标记"""
+    return bool(getattr(error, "provider_failure", False))
+
+
+@asynccontextmanager
+async def call(api_config: dict, purpose: str = "report"):
+    """包裹一次大模型接口调用：限流、占用并发名额、按结果更新熔断状态，并记录用量；
+    返回 llm_usage.CallRecord，调用方填写HTTP状态和token数。熔断中或排队超时抛出 ProviderUnavailable"""
+    guard = guard_for(api_config)
+    try:
+        probe = guard._admit()
+    except ProviderUnavailable:
+        LLM_CALLS.inc(guard.name, "rejected")
+        llm_usage.record_rejected(api_config, purpose, "rejected")
+        raise
+
+    started = time.monotonic()
+    deadline = started + settings.llm_queue_timeout_seconds
+    delay = guard.bucket.wait_time()
+    try:
+        if started + delay > deadline:
+            guard.bucket.refund()
+            raise ProviderUnavailable("大模型接口调用过于频繁，请稍后重试")
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            await asyncio.wait_for(guard.slots.acquire(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            raise ProviderUnavailable("大模型接口调用过于频繁，请稍后重试")
+    except BaseException as e:
+        if probe:
+            guard.probing = False
+        if isinstance(e, ProviderUnavailable):
+            LLM_CALLS.inc(guard.name, "throttled")
+            llm_usage.record_rejected(api_config, purpose, "throttled")
+        raise
+    LLM_WAIT_SECONDS.inc(guard.name, amount=time.monotonic() - started)
+
+    LLM_IN_FLIGHT.inc(guard.name)
+    try:
+        with llm_usage.track(api_config, purpose) as record:
+            yield record
+    except Exception as e:
+        if is_provider_failure(e):
+            guard.failure(str(e))
+            LLM_CALLS.inc(guard.name, "failure")
+        else:
+            # 接口有响应（如密钥错误、响应格式异常），不计入熔断
+            guard.success()
+            LLM_CALLS.inc(guard.name, "error")
+        raise
+    except BaseException:
+        # 调用方取消（如客户端断开），结果未知，不改变熔断状态
+        if probe:
+            guard.probing = False
+        raise
+    else:
+        guard.success()
+        LLM_CALLS.inc(guard.name, "ok")
+    finally:
+        guard.slots.release()
+        LLM_IN_FLIGHT.dec(guard.name)
+
+
+def status() -> list:
+    return [guard.status() for guard in _guards.values()]
@@ -0,0 +1,294 @@
+"""
+大模型调用用量统计 - 记录每次调用的接口、模型、用途、HTTP状态、耗时和token数，以及报告正文缓存的命中情况。
+
+调用结果先在内存中按 (日期, 接口, 模型, 用途, 结果) 累加，后台任务每 LLM_USAGE_FLUSH_SECONDS 秒
+把增量合并到 llm_usage_rollups（每天每个组合一行），服务停止时写入剩余的增量。
+耗时按固定分桶计数，汇总时由分桶估算 P50/P95。同时在 /metrics 中导出耗时直方图和token计数。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from sqlalchemy import case, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import background
+from .config import settings
+from .metrics import Counter, Histogram, registry
+from .models import LlmUsageRollup
+
+logger = logging.getLogger("exam_system.llm_usage")
+
+LLM_CALL_SECONDS = registry.register(Histogram(
+    "llm_call_duration_seconds", "大模型接口调用耗时（不含排队）", ("provider", "purpose"),
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0)
+))
+LLM_TOKENS = registry.register(Counter(
+    "llm_tokens_total", "大模型接口消耗的token数", ("provider", "kind")
+))
+
+# 耗时分桶上限（秒）与汇总表的列，最后一列为超过最大分桶
+LATENCY_BUCKETS: Tuple[Tuple[float, str], ...] = (
+    (1, "latency_le_1s"), (2, "latency_le_2s"), (5, "latency_le_5s"), (10, "latency_le_10s"),
+    (20, "latency_le_20s"), (30, "latency_le_30s"), (float("inf"), "latency_gt_30s"),
+)
+_COUNT_COLUMNS = ("calls", "cache_hits", "cache_misses", "prompt_tokens", "completion_tokens", "latency_ms_sum") + tuple(
+    column for _, column in LATENCY_BUCKETS
+)
+
+Key = Tuple[date, str, str, str, str]  # (日期, 接口, 模型, 用途, 结果)
+
+_pending: Dict[Key, Dict[str, int]] = {}
+_lock = threading.Lock()
+_table = LlmUsageRollup.__table__
+
+
+class CallRecord:
+    """一次调用的结果，由调用方在调用过程中填写状态和token数"""
+
+    __slots__ = ("provider", "model", "purpose", "status", "prompt_tokens", "completion_tokens")
+
+    def __init__(self, provider: str, model: str, purpose: str):
+        self.provider = provider
+        self.model = model
+        self.purpose = purpose
+        self.status: Optional[str] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+
+def provider_name(api_config: dict) -> str:
+    """接口名称：接口地址的主机名"""
+    return urlparse(api_config.get("url") or "").netloc or api_config.get("provider") or "default"
+
+
+def _add(key: Key, latency_ms: Optional[int] = None, **counts: int):
+    with _lock:
+        item = _pending.get(key)
+        if item is None:
+            item = _pending[key] = dict.fromkeys(_COUNT_COLUMNS, 0)
+            item["latency_ms_max"] = 0
+        for name, value in counts.items():
+            item[name] += value
+        if latency_ms is not None:
+            item["latency_ms_sum"] += latency_ms
+            item["latency_ms_max"] = max(item["latency_ms_max"], latency_ms)
+            for bound, column in LATENCY_BUCKETS:
+                if latency_ms <= bound * 1000:
+                    item[column] += 1
+                    break
+
+
+def record_call(record: CallRecord, seconds: float):
+    latency_ms = int(seconds * 1000)
+    _add((date.today(), record.provider, record.model, record.purpose, record.status or "error"),
+         latency_ms=latency_ms, calls=1,
+         prompt_tokens=record.prompt_tokens, completion_tokens=record.completion_tokens)
+    LLM_CALL_SECONDS.observe(seconds, record.provider, record.purpose)
+    if record.prompt_tokens:
+        LLM_TOKENS.inc(record.provider, "prompt", amount=record.prompt_tokens)
+    if record.completion_tokens:
+        LLM_TOKENS.inc(record.provider, "completion", amount=record.completion_tokens)
+
+
+def record_rejected(api_config: dict, purpose: str, status: str):
+    """熔断或排队超时，未发出请求"""
+    _add((date.today(), provider_name(api_config), api_config.get("model") or "", purpose, status), calls=1)
+
+
+def record_cache(api_config: dict, purpose: str, hits: int = 0, misses: int = 0):
+    """报告正文缓存的命中和未命中次数（未命中时另有一次调用记录）"""
+    _add((date.today(), provider_name(api_config), api_config.get("model") or "", purpose, "cache"),
+         cache_hits=hits, cache_misses=misses)
+
+
+@contextmanager
+def track(api_config: dict, purpose: str) -> Iterator[CallRecord]:
+    """记录一次调用的耗时和结果；调用方设置 record.status（HTTP状态码等）和token数，
+    异常退出且未设置状态时记为 error，被取消时记为 cancelled"""
+    record = CallRecord(provider_name(api_config), api_config.get("model") or "", purpose)
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        record.status = record.status or "error"
+        raise
+    except BaseException:
+        record.status = record.status or "cancelled"
+        raise
+    finally:
+        record_call(record, time.perf_counter() - started)
+
+
+def _merge(conn, key: Key, item: Dict[str, int]):
+    day, provider, model, purpose, status = key
+    match = (
+        (_table.c.day == day) & (_table.c.provider == provider) & (_table.c.model == model)
+        & (_table.c.purpose == purpose) & (_table.c.status == status)
+    )
+    latency_max = item["latency_ms_max"]
+    increments = {name: _table.c[name] + item[name] for name in _COUNT_COLUMNS if item[name]}
+    increments["latency_ms_max"] = case((_table.c.latency_ms_max < latency_max, latency_max),
+                                        else_=_table.c.latency_ms_max)
+    if conn.execute(update(_table).where(match).values(**increments)).rowcount:
+        return
+    values = {"day": day, "provider": provider, "model": model, "purpose": purpose, "status": status, **item}
+    try:
+        with conn.begin_nested():
+            conn.execute(insert(_table).values(**values))
+    except IntegrityError:
+        # 其他进程同时插入了同一行
+        conn.execute(update(_table).where(match).values(**increments))
+
+
+def flush(engine=None) -> int:
+    """把内存中的增量合并到汇总表，返回写入的行数；写入失败时增量放回内存"""
+    with _lock:
+        if not _pending:
+            return 0
+        batch = dict(_pending)
+        _pending.clear()
+
+    if engine is None:
+        from .database import engine
+    try:
+        with engine.begin() as conn:
+            for key, item in batch.items():
+                _merge(conn, key, item)
+    except Exception:
+        with _lock:
+            for key, item in batch.items():
+                current = _pending.get(key)
+                if current is None:
+                    _pending[key] = item
+                    continue
+                for name in _COUNT_COLUMNS:
+                    current[name] += item[name]
+                current["latency_ms_max"] = max(current["latency_ms_max"], item["latency_ms_max"])
+        raise
+    return len(batch)
+
+
+def _percentile(buckets: List[int], fraction: float) -> Optional[float]:
+    """由分桶计数估算分位数（返回所在分桶的上限，秒）"""
+    total = sum(buckets)
+    if not total:
+        return None
+    target = total * fraction
+    cumulative = 0
+    for (bound, _), count in zip(LATENCY_BUCKETS, buckets):
+        cumulative += count
+        if cumulative >= target:
+            return bound if bound != float("inf") else None
+    return None
+
+
+def _summarize(rows: List[LlmUsageRollup]) -> dict:
+    buckets = [sum(getattr(row, column) for row in rows) for _, column in LATENCY_BUCKETS]
+    calls = sum(row.calls for row in rows)
+    ok = sum(row.calls for row in rows if row.status == "200")
+    timed = sum(buckets)
+    hits = sum(row.cache_hits for row in rows)
+    lookups = hits + sum(row.cache_misses for row in rows)
+    return {
+        "calls": calls,
+        "errors": calls - ok,
+        "error_rate": round((calls - ok) / calls, 4) if calls else 0,
+        "status": {
+            status: count for status, count in sorted(
+                _group_sum(rows, lambda row: row.status, "calls").items()
+            ) if count
+        },
+        "prompt_tokens": sum(row.prompt_tokens for row in rows),
+        "completion_tokens": sum(row.completion_tokens for row in rows),
+        "avg_latency_ms": round(sum(row.latency_ms_sum for row in rows) / timed) if timed else None,
+        "max_latency_ms": max((row.latency_ms_max for row in rows), default=0),
+        "p50_latency_s": _percentile(buckets, 0.5),
+        "p95_latency_s": _percentile(buckets, 0.95),
+        "latency_buckets": {
+            ("le_%gs" % bound if bound != float("inf") else "gt_30s"): count
+            for (bound, _), count in zip(LATENCY_BUCKETS, buckets)
+        },
+        "cache_hits": hits,
+        "cache_misses": lookups - hits,
+        "cache_hit_ratio": round(hits / lookups, 4) if lookups else None
+    }
+
+
+def _group_sum(rows: List[LlmUsageRollup], key, column: str) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for row in rows:
+        totals[key(row)] = totals.get(key(row), 0) + getattr(row, column)
+    return totals
+
+
+def _group(rows: List[LlmUsageRollup], key) -> Dict[tuple, List[LlmUsageRollup]]:
+    groups: Dict[tuple, List[LlmUsageRollup]] = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return groups
+
+
+def report(db: Session, days: int = 7) -> dict:
+    """最近 days 天（含今天）的用量：合计、按日、按接口/模型/用途"""
+    try:
+        flush()
+    except Exception as e:
+        logger.error("写入大模型用量失败: %s", e)
+    start = date.today() - timedelta(days=days - 1)
+    rows = db.query(LlmUsageRollup).filter(LlmUsageRollup.day >= start).all()
+    return {
+        "start": start.isoformat(),
+        "end": date.today().isoformat(),
+        "total": _summarize(rows),
+        "daily": [
+            {"day": day.isoformat(), **_summarize(items)}
+            for (day,), items in sorted(_group(rows, lambda row: (row.day,)).items())
+        ],
+        "by_model": [
+            {"provider": provider, "model": model, "purpose": purpose, **_summarize(items)}
+            for (provider, model, purpose), items in sorted(
+                _group(rows, lambda row: (row.provider, row.model, row.purpose)).items()
+            )
+        ],
+        "generated_at": datetime.now().isoformat()
+    }
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(settings.llm_usage_flush_seconds)
+        try:
+            await asyncio.to_thread(flush)
+        except Exception as e:
+            logger.error("写入大模型用量失败: %s", e)
+
+
+_loop_task: Optional[asyncio.Task] = None
+
+
+def start():
+    """启动后台写入任务（在服务启动时调用）"""
+    global _loop_task
+    if _loop_task is None:
+        _loop_task = background.create_task(_flush_loop(), name="llm_usage")
+
+
+async def stop():
+    """停止后台任务并写入剩余的用量"""
+    global _loop_task
+    task, _loop_task = _loop_task, None
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    try:
+        await asyncio.to_thread(flush)
+    except Exception as e:
+        logger.error("停止服务时写入大模型用量失败: %s", e)
@@ -1,20 +1,48 @@
+from . import startup  # 须最先导入，用于统计启动耗时
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
 import os
-from .database import engine, get_db
-from .models import Base
-from .routers import questions, exams, admin, exam_management, teams, question_banks
+from . import background, daily_reports, exam_sessions, llm_usage
+from .database import engine, get_db, init_db
+from .metrics import MetricsMiddleware, instrument_engine, registry
+from .profiler import ProfilingMiddleware
+from .routers import questions, exams, admin, exam_management, teams, question_banks, exam_sessions as exam_sessions_router
 from .config import settings
+startup.mark("imports")
 
 # 创建数据库表
-Base.metadata.create_all(bind=engine)
+if settings.auto_create_tables:
+    init_db()
+    startup.mark("create_tables")
+
+# 服务状态：启动完成后就绪，开始停止时不再就绪
+_lifecycle = {"ready": False}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup.mark_ready()
+    exam_sessions.start()
+    llm_usage.start()
+    daily_reports.start()
+    _lifecycle["ready"] = True
+    yield
+    # 进行中的请求已由服务器处理完毕，停止每日报告检查，先写入内存中的考试作答，再等待后台AI报告任务完成，最后写入大模型用量
+    _lifecycle["ready"] = False
+    await daily_reports.stop()
+    await exam_sessions.stop()
+    await background.drain(settings.shutdown_drain_seconds)
+    await llm_usage.stop()
 
 app = FastAPI(
     title="穆桥销售测验系统 - Python后端",
     description="医药代表考试系统API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS中间件
@@ -26,18 +54,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 按需性能剖析中间件（未启用时不产生开销）
+app.add_middleware(ProfilingMiddleware)
+
+# 请求耗时与SQL统计中间件
+instrument_engine(engine)
+app.add_middleware(MetricsMiddleware)
+
 # 包含路由
 app.include_router(questions.router, prefix="/api", tags=["题库管理"])
 app.include_router(exams.router, prefix="/api", tags=["考试系统"])
 app.include_router(admin.router, prefix="/api", tags=["后台管理"])
 app.include_router(exam_management.router, prefix="/api", tags=["考试管理"])
+app.include_router(exam_sessions_router.router, prefix="/api", tags=["考试系统"])
 app.include_router(teams.router, tags=["团队管理"])
 app.include_router(question_banks.router, tags=["题库管理"])
+startup.mark("routes")
 
 # 静态文件服务
 static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
 if os.path.exists(static_dir):
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
+startup.mark("static")
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -85,6 +123,26 @@ async def health_check():
     """健康检查"""
     return {"status": "healthy", "message": "穆桥销售测验系统运行正常"}
 
+@app.get("/ready")
+async def readiness_check(db: Session = Depends(get_db)):
+    """就绪检查（负载均衡摘除/加入实例用）"""
+    if not _lifecycle["ready"]:
+        raise HTTPException(status_code=503, detail="服务未就绪或正在停止")
+    try:
+        db.execute(text("SELECT 1"))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"数据库不可用: {str(e)}")
+    return {
+        "status": "ready",
+        "pid": os.getpid(),
+        "background_tasks": background.pending_count()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 格式的运行指标"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
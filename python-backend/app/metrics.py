@@ -0,0 +1,272 @@
+"""
+请求耗时与SQL统计 - 记录每个路由的延迟分布、SQL条数与耗时、响应大小、
+并发请求数，以 Prometheus 文本格式导出，并通过 Server-Timing 响应头返回
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestStats:
+    """单个请求内累计的SQL统计"""
+
+    __slots__ = ("scope", "sql_count", "sql_time")
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.sql_count = 0
+        self.sql_time = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """获取当前请求的统计对象（不在请求中时为 None）"""
+    return _current.get()
+
+
+def current_route() -> str:
+    """当前请求的 "方法 路由模板"，不在请求中时返回空字符串"""
+    stats = _current.get()
+    if stats is None or stats.scope is None:
+        return ""
+    route, _ = route_labels(stats.scope)
+    return f"{stats.scope.get('method', '')} {route}"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge(Counter):
+    """可增可减的瞬时值"""
+
+    kind = "gauge"
+
+    def dec(self, *label_values, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    """固定分桶的直方图"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # [各桶计数..., +Inf计数, 总和]
+                state = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        for label_values, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = _format_labels(self.labels, label_values, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            cumulative += state[len(self.buckets)]
+            le = _format_labels(self.labels, label_values, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {state[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}"
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+_ROUTE_LABELS = ("method", "route", "router")
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "请求处理耗时（秒）", _ROUTE_LABELS
+))
+REQUEST_COUNT = registry.register(Counter(
+    "http_requests_total", "请求总数", _ROUTE_LABELS + ("status",)
+))
+REQUEST_SQL_COUNT = registry.register(Histogram(
+    "http_request_sql_statements", "单个请求执行的SQL语句数", _ROUTE_LABELS, SQL_COUNT_BUCKETS
+))
+REQUEST_SQL_TIME = registry.register(Histogram(
+    "http_request_sql_seconds", "单个请求累计的SQL耗时（秒）", _ROUTE_LABELS
+))
+RESPONSE_SIZE = registry.register(Histogram(
+    "http_response_size_bytes", "响应体大小（字节）", _ROUTE_LABELS, SIZE_BUCKETS
+))
+IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_flight", "正在处理的请求数"
+))
+SQL_STATEMENTS = registry.register(Counter(
+    "db_statements_total", "执行的SQL语句总数（含后台任务）"
+))
+SQL_TIME = registry.register(Counter(
+    "db_statement_seconds_total", "SQL累计耗时（秒，含后台任务）"
+))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    SQL_STATEMENTS.inc()
+    SQL_TIME.inc(amount=elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_time += elapsed
+
+
+def instrument_engine(engine):
+    """在数据库引擎上挂载SQL计时事件（重复调用无副作用）"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def route_labels(scope) -> Tuple[str, str]:
+    """返回 (路由模板, 路由模块)，避免使用原始路径导致标签数量失控"""
+    route = scope.get("route")
+    if route is None:
+        app = scope.get("app")
+        for candidate in getattr(app, "routes", ()):
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    if route is None:
+        return "unmatched", ""
+
+    endpoint = getattr(route, "endpoint", None)
+    router = endpoint.__module__.rsplit(".", 1)[-1] if endpoint is not None else ""
+    return getattr(route, "path", "unmatched"), router
+
+
+class MetricsMiddleware:
+    """记录请求指标并添加 Server-Timing 响应头的ASGI中间件"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                timing = (
+                    f'app;dur={elapsed_ms:.1f}, '
+                    f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries"'
+                )
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"server-timing", timing.encode("latin-1"))
+                ]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            _current.reset(token)
+            route, router = route_labels(scope)
+            labels = (scope.get("method", ""), route, router)
+            REQUEST_LATENCY.observe(time.perf_counter() - start, *labels)
+            REQUEST_COUNT.inc(*labels, str(status_code))
+            REQUEST_SQL_COUNT.observe(stats.sql_count, *labels)
+            REQUEST_SQL_TIME.observe(stats.sql_time, *labels)
+            RESPONSE_SIZE.observe(response_size, *labels)
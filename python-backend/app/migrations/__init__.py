@@ -0,0 +1,190 @@
+"""
+数据库版本迁移 - versions/ 下每个 NNNN_说明.py 为一个版本，提供 upgrade(conn) 和 downgrade(conn)，
+已执行的版本记录在 schema_migrations 表中。
+
+SQLite 下可对运行中的数据库在线执行：
+- 切换为 WAL 日志模式，建索引期间读请求不受影响
+- 每个版本在 BEGIN IMMEDIATE 事务中执行，多个进程同时迁移时依次进行，不会重复执行
+- 设置 busy_timeout，等待正在进行的写事务完成而不是直接报错
+
+命令行: python -m app.migrations status|upgrade|downgrade
+"""
+
+import importlib
+import logging
+import pkgutil
+import re
+import time
+from datetime import datetime
+from types import ModuleType
+from typing import List, Optional
+
+from sqlalchemy import Column, DateTime, Float, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger("exam_system.migrations")
+
+_VERSION_MODULE = re.compile(r"^(\d{4})_\w+$")
+
+# 迁移记录表不属于业务模型，单独定义
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", String(20), primary_key=True),
+    Column("description", String(200)),
+    Column("applied_at", DateTime),
+    Column("duration_ms", Float),
+)
+
+
+class IrreversibleMigration(Exception):
+    """该版本不支持回滚"""
+
+
+class Migration:
+    def __init__(self, version: str, name: str, module: ModuleType):
+        self.version = version
+        self.name = name
+        self.module = module
+        self.description = (module.__doc__ or name).strip().splitlines()[0]
+
+    def upgrade(self, conn: Connection):
+        self.module.upgrade(conn)
+
+    def downgrade(self, conn: Connection):
+        self.module.downgrade(conn)
+
+
+def discover() -> List[Migration]:
+    """按版本号顺序列出所有迁移"""
+    from . import versions
+
+    migrations = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        match = _VERSION_MODULE.match(info.name)
+        if match:
+            module = importlib.import_module(f"{versions.__name__}.{info.name}")
+            migrations.append(Migration(match.group(1), info.name, module))
+    migrations.sort(key=lambda migration: migration.version)
+    return migrations
+
+
+def _prepare(engine: Engine):
+    """SQLite 在线迁移设置，并确保迁移记录表存在"""
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            mode = conn.exec_driver_sql("PRAGMA journal_mode=WAL").scalar()
+            if str(mode).lower() != "wal":
+                logger.warning("无法切换为 WAL 模式（当前 %s），迁移期间读请求可能被阻塞", mode)
+    _metadata.create_all(bind=engine)
+
+
+def applied_versions(conn: Connection) -> List[str]:
+    if not inspect(conn).has_table("schema_migrations"):
+        return []
+    return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+
+def _run(engine: Engine, migration: Migration, direction: str, busy_timeout_ms: int) -> bool:
+    """在独占写事务中执行一个版本，返回是否实际执行（已被其他进程执行时跳过）"""
+    with engine.connect() as conn:
+        sqlite = engine.dialect.name == "sqlite"
+        if sqlite:
+            # 由这里显式控制事务，获取写锁后再检查版本状态
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            conn.exec_driver_sql(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            transaction = None
+        else:
+            transaction = conn.begin()
+
+        try:
+            applied = migration.version in applied_versions(conn)
+            if (direction == "upgrade") == applied:
+                skipped = True
+            else:
+                skipped = False
+                start = time.perf_counter()
+                if direction == "upgrade":
+                    migration.upgrade(conn)
+                    conn.execute(schema_migrations.insert().values(
+                        version=migration.version,
+                        description=migration.description,
+                        applied_at=datetime.now(),
+                        duration_ms=round((time.perf_counter() - start) * 1000, 1)
+                    ))
+                else:
+                    migration.downgrade(conn)
+                    conn.execute(schema_migrations.delete().where(
+                        schema_migrations.c.version == migration.version
+                    ))
+                logger.info("%s %s %s（%.0fms）", direction, migration.version, migration.description,
+                            (time.perf_counter() - start) * 1000)
+        except Exception:
+            if sqlite:
+                conn.exec_driver_sql("ROLLBACK")
+            else:
+                transaction.rollback()
+            raise
+
+        if sqlite:
+            conn.exec_driver_sql("COMMIT")
+        else:
+            transaction.commit()
+        return not skipped
+
+
+def upgrade(engine: Engine, target: Optional[str] = None, busy_timeout_ms: int = 30000) -> List[str]:
+    """升级到指定版本（默认最新），返回本次执行的版本"""
+    _prepare(engine)
+    executed = []
+    for migration in discover():
+        if target is not None and migration.version > target:
+            break
+        if _run(engine, migration, "upgrade", busy_timeout_ms):
+            executed.append(migration.version)
+    return executed
+
+
+def downgrade(engine: Engine, target: str, busy_timeout_ms: int = 30000) -> List[str]:
+    """回滚到指定版本（保留该版本，回滚其后的所有版本），返回本次回滚的版本"""
+    _prepare(engine)
+    executed = []
+    for migration in reversed(discover()):
+        if migration.version <= target:
+            break
+        if _run(engine, migration, "downgrade", busy_timeout_ms):
+            executed.append(migration.version)
+    return executed
+
+
+def status(engine: Engine) -> List[dict]:
+    """各版本的执行状态"""
+    with engine.connect() as conn:
+        applied = {}
+        if inspect(conn).has_table("schema_migrations"):
+            for row in conn.execute(schema_migrations.select()):
+                applied[row.version] = row
+    return [
+        {
+            "version": migration.version,
+            "description": migration.description,
+            "applied": migration.version in applied,
+            "applied_at": applied[migration.version].applied_at.isoformat() if migration.version in applied else None,
+            "duration_ms": applied[migration.version].duration_ms if migration.version in applied else None,
+        }
+        for migration in discover()
+    ]
+
+
+def create_index(conn: Connection, name: str, table: str, columns: List[str]):
+    """创建索引（已存在时跳过）"""
+    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+
+def drop_index(conn: Connection, name: str):
+    conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return column in {info["name"] for info in inspect(conn).get_columns(table)}
@@ -0,0 +1,52 @@
+"""
+数据库迁移命令行
+
+用法:
+    python -m app.migrations status
+    python -m app.migrations upgrade [--to 0002]
+    python -m app.migrations downgrade --to 0001
+"""
+
+import argparse
+import logging
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from ..config import settings
+from . import IrreversibleMigration, downgrade, status, upgrade
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库版本迁移")
+    parser.add_argument("command", choices=["status", "upgrade", "downgrade"])
+    parser.add_argument("--to", help="目标版本（upgrade 默认最新；downgrade 必填，保留该版本）")
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--busy-timeout", type=int, default=30000, help="SQLite 等待写锁的最长时间（毫秒）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine = create_engine(args.database_url, poolclass=NullPool)
+    print(f"🗄️  数据库: {args.database_url}")
+
+    if args.command == "upgrade":
+        executed = upgrade(engine, args.to, args.busy_timeout)
+        print(f"✅ 已升级: {', '.join(executed)}" if executed else "✅ 已是最新版本")
+    elif args.command == "downgrade":
+        if not args.to:
+            parser.error("downgrade 需要指定 --to")
+        try:
+            executed = downgrade(engine, args.to, args.busy_timeout)
+        except IrreversibleMigration as e:
+            print(f"❌ {e}")
+            raise SystemExit(1)
+        print(f"✅ 已回滚: {', '.join(executed)}" if executed else "✅ 无需回滚")
+
+    for item in status(engine):
+        mark = "✅" if item["applied"] else "⏳"
+        applied = f"  {item['applied_at']} ({item['duration_ms']}ms)" if item["applied"] else ""
+        print(f"{mark} {item['version']} {item['description']}{applied}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""团队题库体系基线（原 init_team_system.py）
+
+旧数据库补齐产品团队/题库表和关联字段，创建默认团队与题库，并把未关联的题目和考试记录归入默认题库。
+"""
+
+import sqlalchemy as sa
+from sqlalchemy import select, text
+
+from .. import IrreversibleMigration, has_column
+
+# 本版本的表结构在这里定义，不引用 models，之后修改模型不会改变本迁移创建的表
+metadata = sa.MetaData()
+
+product_teams = sa.Table(
+    "product_teams", metadata,
+    sa.Column("id", sa.Integer, primary_key=True, index=True),
+    sa.Column("name", sa.String(100), nullable=False, index=True),
+    sa.Column("code", sa.String(50), unique=True, nullable=False, index=True),
+    sa.Column("description", sa.Text),
+    sa.Column("is_active", sa.Boolean, index=True),
+    sa.Column("wechat_dept_id", sa.String(100)),
+    sa.Column("wechat_mapping", sa.JSON),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    sa.Column("updated_at", sa.DateTime, server_default=sa.func.now()),
+)
+
+question_banks = sa.Table(
+    "question_banks", metadata,
+    sa.Column("id", sa.Integer, primary_key=True, index=True),
+    sa.Column("team_id", sa.Integer, sa.ForeignKey("product_teams.id"), nullable=False, index=True),
+    sa.Column("name", sa.String(100), nullable=False, index=True),
+    sa.Column("description", sa.Text),
+    sa.Column("is_active", sa.Boolean, index=True),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    sa.Column("updated_at", sa.DateTime, server_default=sa.func.now()),
+)
+
+system_config = sa.table(
+    "system_config",
+    sa.column("key"), sa.column("value"), sa.column("description"), sa.column("config_type"),
+)
+
+
+def upgrade(conn):
+    product_teams.create(bind=conn, checkfirst=True)
+    question_banks.create(bind=conn, checkfirst=True)
+
+    if not has_column(conn, "questions", "bank_id"):
+        conn.exec_driver_sql("ALTER TABLE questions ADD COLUMN bank_id INTEGER DEFAULT 1")
+    for column in ("team_id", "bank_id"):
+        if not has_column(conn, "exam_records", column):
+            conn.exec_driver_sql(f"ALTER TABLE exam_records ADD COLUMN {column} INTEGER DEFAULT 1")
+
+    if not conn.execute(text("SELECT 1 FROM product_teams WHERE id = 1")).first():
+        conn.execute(text(
+            "INSERT INTO product_teams (id, name, code, description, is_active) "
+            "VALUES (1, '默认团队', 'default', '系统默认团队，包含所有现有题目', :active)"
+        ), {"active": True})
+    if not conn.execute(text("SELECT 1 FROM question_banks WHERE id = 1")).first():
+        conn.execute(text(
+            "INSERT INTO question_banks (id, team_id, name, description, is_active) "
+            "VALUES (1, 1, '默认题库', '系统默认题库，包含所有现有题目', :active)"
+        ), {"active": True})
+
+    conn.execute(text("UPDATE questions SET bank_id = 1 WHERE bank_id IS NULL OR bank_id = 0"))
+    conn.execute(text("UPDATE exam_records SET team_id = 1 WHERE team_id IS NULL OR team_id = 0"))
+    conn.execute(text("UPDATE exam_records SET bank_id = 1 WHERE bank_id IS NULL OR bank_id = 0"))
+
+    # 只补充缺失的配置，不覆盖管理员已选择的团队和题库
+    config = system_config
+    for key, description in (("current_team_id", "当前活动的团队ID"), ("current_bank_id", "当前活动的题库ID")):
+        if not conn.execute(select(config.c.key).where(config.c.key == key)).first():
+            conn.execute(config.insert().values(key=key, value="1", description=description, config_type="number"))
+
+
+def downgrade(conn):
+    raise IrreversibleMigration("基线版本不可回滚（会丢失团队和题库数据）")
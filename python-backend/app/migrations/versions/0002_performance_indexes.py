@@ -0,0 +1,35 @@
+"""考试记录和题目的组合索引
+
+- exam_records (exam_type, created_at): 按考试类型和时间范围统计（每日考试报告、分析）
+- exam_records (team_id, created_at): 按团队和时间范围统计
+- questions (bank_id, category): 按题库和分类筛选题目
+- 旧数据库通过 ALTER TABLE 补充的 team_id/bank_id 字段缺少模型中声明的单列索引
+"""
+
+from .. import create_index, drop_index
+
+INDEXES = (
+    ("ix_exam_records_exam_type_created_at", "exam_records", ["exam_type", "created_at"]),
+    ("ix_exam_records_team_id_created_at", "exam_records", ["team_id", "created_at"]),
+    ("ix_questions_bank_id_category", "questions", ["bank_id", "category"]),
+    ("ix_exam_records_team_id", "exam_records", ["team_id"]),
+    ("ix_exam_records_bank_id", "exam_records", ["bank_id"]),
+    ("ix_questions_bank_id", "questions", ["bank_id"]),
+)
+
+# 模型中以 index=True 声明的单列索引，回滚时保留
+_MODEL_INDEXES = {"ix_exam_records_team_id", "ix_exam_records_bank_id", "ix_questions_bank_id"}
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
+    if conn.dialect.name == "sqlite":
+        # 更新查询规划器统计信息，让新索引立即生效
+        conn.exec_driver_sql("PRAGMA optimize")
+
+
+def downgrade(conn):
+    for name, _, _ in INDEXES:
+        if name not in _MODEL_INDEXES:
+            drop_index(conn, name)
@@ -0,0 +1,64 @@
+"""考试记录归档表
+
+- exam_record_archives: 归档文件清单
+- archived_exam_records: 已归档记录ID到归档文件的映射
+- exam_record_rollups: 已归档记录的按日汇总统计
+"""
+
+import sqlalchemy as sa
+from sqlalchemy import text
+
+from .. import IrreversibleMigration
+
+# 按本版本的结构定义
+metadata = sa.MetaData()
+
+TABLES = (
+    sa.Table(
+        "exam_record_archives", metadata,
+        sa.Column("file_name", sa.String(200), primary_key=True),
+        sa.Column("month", sa.String(7), nullable=False, index=True),
+        sa.Column("record_count", sa.Integer, nullable=False),
+        sa.Column("size_bytes", sa.BigInteger, nullable=False),
+        sa.Column("compression", sa.String(10), nullable=False),
+        sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    ),
+    sa.Table(
+        "archived_exam_records", metadata,
+        sa.Column("id", sa.String(100), primary_key=True),
+        sa.Column("file_name", sa.String(200), nullable=False),
+        sa.Column("created_at", sa.DateTime),
+    ),
+    sa.Table(
+        "exam_record_rollups", metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("day", sa.Date, nullable=False),
+        sa.Column("team_id", sa.Integer),
+        sa.Column("bank_id", sa.Integer),
+        sa.Column("exam_type", sa.String(50)),
+        sa.Column("department", sa.String(100)),
+        sa.Column("exam_count", sa.Integer, nullable=False),
+        sa.Column("score_sum", sa.Integer, nullable=False),
+        sa.Column("score_min", sa.Integer),
+        sa.Column("score_max", sa.Integer),
+        sa.Column("high_count", sa.Integer, nullable=False),
+        sa.Column("low_count", sa.Integer, nullable=False),
+        sa.Column("correct_sum", sa.Integer, nullable=False),
+        sa.Column("question_sum", sa.Integer, nullable=False),
+        sa.Column("duration_sum", sa.Integer, nullable=False),
+        sa.Index("ix_exam_record_rollups_key", "day", "team_id", "bank_id", "exam_type", "department", unique=True),
+    ),
+)
+
+
+def upgrade(conn):
+    for table in TABLES:
+        table.create(bind=conn, checkfirst=True)
+
+
+def downgrade(conn):
+    if conn.execute(text("SELECT 1 FROM exam_record_archives LIMIT 1")).first():
+        # 删除映射和汇总后，归档文件中的记录无法再按ID读取，统计也会缺失
+        raise IrreversibleMigration("已有归档数据，请先执行 python -m app.archive restore 恢复全部归档记录")
+    for table in reversed(TABLES):
+        table.drop(bind=conn, checkfirst=True)
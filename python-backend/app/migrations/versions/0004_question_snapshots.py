@@ -0,0 +1,49 @@
+"""考试记录题目快照
+
+- question_snapshots: 按内容哈希去重的题目内容
+- exam_records.questions_data、detailed_answers 改为压缩存储（SQLite 不需要修改表结构，旧的JSON文本可以直接读取）
+- 已有记录由 python -m app.question_snapshots backfill 转换
+"""
+
+import sqlalchemy as sa
+from sqlalchemy import text
+
+from .. import IrreversibleMigration
+
+_COLUMNS = ("questions_data", "detailed_answers")
+
+# 按本版本的结构定义
+metadata = sa.MetaData()
+
+question_snapshots = sa.Table(
+    "question_snapshots", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("content_hash", sa.String(40), nullable=False, unique=True),
+    sa.Column("content", sa.LargeBinary, nullable=False),  # 压缩的JSON
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.now()),
+    # 快照ID不复用：回滚后同一ID不会指向另一份内容
+    sqlite_autoincrement=True,
+)
+
+
+def upgrade(conn):
+    question_snapshots.create(bind=conn, checkfirst=True)
+    if conn.dialect.name == "postgresql":
+        for column in _COLUMNS:
+            conn.exec_driver_sql(
+                f"ALTER TABLE exam_records ALTER COLUMN {column} TYPE bytea "
+                f"USING convert_to({column}::text, 'UTF8')"
+            )
+
+
+def downgrade(conn):
+    if conn.execute(text("SELECT 1 FROM question_snapshots LIMIT 1")).first():
+        raise IrreversibleMigration("已有记录引用题目快照，无法回滚")
+    if conn.dialect.name == "postgresql":
+        # 回滚前需要确认数据均为未压缩的JSON
+        for column in _COLUMNS:
+            conn.exec_driver_sql(
+                f"ALTER TABLE exam_records ALTER COLUMN {column} TYPE json "
+                f"USING convert_from({column}, 'UTF8')::json"
+            )
+    conn.exec_driver_sql("DROP TABLE IF EXISTS question_snapshots")
@@ -0,0 +1,49 @@
+"""考试会话表
+
+- exam_sessions: 服务端考试会话（题目、截止时间、自动保存的作答）
+"""
+
+import sqlalchemy as sa
+from sqlalchemy import text
+
+from .. import IrreversibleMigration
+
+# 按本版本的结构定义
+metadata = sa.MetaData()
+
+# 外键引用的已有表，只用于生成 DDL，不会创建
+sa.Table("exams", metadata, sa.Column("id", sa.Integer, primary_key=True))
+
+exam_sessions = sa.Table(
+    "exam_sessions", metadata,
+    sa.Column("id", sa.String(32), primary_key=True),
+    sa.Column("exam_id", sa.Integer, sa.ForeignKey("exams.id")),
+    sa.Column("exam_type", sa.String(50), nullable=False),
+    sa.Column("user_name", sa.String(100), nullable=False),
+    sa.Column("user_id", sa.String(100)),
+    sa.Column("department", sa.String(100)),
+    sa.Column("region", sa.String(100)),
+    sa.Column("team_id", sa.Integer),
+    sa.Column("bank_id", sa.Integer),
+    sa.Column("question_ids", sa.JSON, nullable=False),
+    sa.Column("answers", sa.LargeBinary),  # 压缩的JSON
+    sa.Column("answers_version", sa.Integer, nullable=False),
+    sa.Column("started_at", sa.DateTime, nullable=False),
+    sa.Column("deadline", sa.DateTime, nullable=False),
+    sa.Column("saved_at", sa.DateTime),
+    sa.Column("status", sa.String(20), nullable=False),
+    sa.Column("submitted_at", sa.DateTime),
+    sa.Column("record_id", sa.String(100)),
+    sa.Index("ix_exam_sessions_status_deadline", "status", "deadline"),
+    sa.Index("ix_exam_sessions_user_status", "user_id", "status"),
+)
+
+
+def upgrade(conn):
+    exam_sessions.create(bind=conn, checkfirst=True)
+
+
+def downgrade(conn):
+    if conn.execute(text("SELECT 1 FROM exam_sessions WHERE status = 'active' LIMIT 1")).first():
+        raise IrreversibleMigration("还有进行中的考试会话，请在考试结束后再回滚")
+    conn.exec_driver_sql("DROP TABLE IF EXISTS exam_sessions")
@@ -0,0 +1,20 @@
+"""AI报告token数
+
+- exam_records.ai_report_prompt_tokens / ai_report_completion_tokens: 生成报告的提示词和输出token数
+"""
+
+from .. import has_column
+
+_COLUMNS = ("ai_report_prompt_tokens", "ai_report_completion_tokens")
+
+
+def upgrade(conn):
+    for column in _COLUMNS:
+        if not has_column(conn, "exam_records", column):
+            conn.exec_driver_sql(f"ALTER TABLE exam_records ADD COLUMN {column} INTEGER")
+
+
+def downgrade(conn):
+    for column in _COLUMNS:
+        if has_column(conn, "exam_records", column):
+            conn.exec_driver_sql(f"ALTER TABLE exam_records DROP COLUMN {column}")
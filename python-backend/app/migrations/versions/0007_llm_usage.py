@@ -0,0 +1,35 @@
+"""大模型调用用量汇总表
+
+- llm_usage_rollups: 按日、接口、模型、用途、结果汇总的调用次数、token数、耗时分桶和报告缓存命中数
+"""
+
+import sqlalchemy as sa
+
+# 按本版本的结构定义
+metadata = sa.MetaData()
+
+llm_usage_rollups = sa.Table(
+    "llm_usage_rollups", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("day", sa.Date, nullable=False),
+    sa.Column("provider", sa.String(200), nullable=False),
+    sa.Column("model", sa.String(100), nullable=False),
+    sa.Column("purpose", sa.String(30), nullable=False),
+    sa.Column("status", sa.String(20), nullable=False),
+    *[sa.Column(name, sa.Integer, nullable=False) for name in ("calls", "cache_hits", "cache_misses")],
+    *[sa.Column(name, sa.BigInteger, nullable=False) for name in ("prompt_tokens", "completion_tokens", "latency_ms_sum")],
+    sa.Column("latency_ms_max", sa.Integer, nullable=False),
+    *[sa.Column(name, sa.Integer, nullable=False) for name in (
+        "latency_le_1s", "latency_le_2s", "latency_le_5s", "latency_le_10s",
+        "latency_le_20s", "latency_le_30s", "latency_gt_30s",
+    )],
+    sa.Index("ix_llm_usage_rollups_key", "day", "provider", "model", "purpose", "status", unique=True),
+)
+
+
+def upgrade(conn):
+    llm_usage_rollups.create(bind=conn, checkfirst=True)
+
+
+def downgrade(conn):
+    conn.exec_driver_sql("DROP TABLE IF EXISTS llm_usage_rollups")
@@ -0,0 +1,27 @@
+"""每日测验报告表
+
+- daily_reports: 测验结束后生成的每日报告，每天一行
+"""
+
+import sqlalchemy as sa
+
+# 按本版本的结构定义（团队、题库字段由 0009 添加）
+metadata = sa.MetaData()
+
+daily_reports = sa.Table(
+    "daily_reports", metadata,
+    sa.Column("id", sa.Integer, primary_key=True),
+    sa.Column("report_date", sa.Date, nullable=False),
+    sa.Column("participants", sa.Integer, nullable=False),
+    sa.Column("content", sa.Text, nullable=False),
+    sa.Column("generated_at", sa.DateTime, nullable=False),
+    sa.Index("ix_daily_reports_report_date", "report_date", unique=True),
+)
+
+
+def upgrade(conn):
+    daily_reports.create(bind=conn, checkfirst=True)
+
+
+def downgrade(conn):
+    conn.exec_driver_sql("DROP TABLE IF EXISTS daily_reports")
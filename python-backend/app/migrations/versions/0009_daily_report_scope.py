@@ -0,0 +1,92 @@
+"""每日测验报告按团队、题库保存，并迁出系统配置表中的旧报告
+
+- daily_reports.team_id / bank_id: 报告范围（0 表示全部），唯一索引改为 (report_date, team_id, bank_id)
+- system_config 中 daily_report_<日期> 的旧报告移到 daily_reports（该日已有报告时直接删除）
+
+回滚时删除按团队、题库保存的报告并恢复按日期的唯一索引；迁出的旧报告留在 daily_reports 中，不再写回系统配置表。
+"""
+
+import json
+import logging
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, bindparam, text
+
+from .. import drop_index, has_column
+
+logger = logging.getLogger("exam_system.migrations")
+
+_PREFIX = "daily_report_"
+
+
+def _participants(value: str) -> int:
+    try:
+        return int(json.loads(value)["statistics"]["total_participants"])
+    except (ValueError, KeyError, TypeError):
+        return 0
+
+
+def _generated_at(updated_at) -> datetime:
+    if isinstance(updated_at, str):
+        # SQLite 以文本返回时间
+        try:
+            return datetime.fromisoformat(updated_at)
+        except ValueError:
+            return datetime.now()
+    return updated_at or datetime.now()
+
+
+def upgrade(conn):
+    for column in ("team_id", "bank_id"):
+        if not has_column(conn, "daily_reports", column):
+            conn.exec_driver_sql(f"ALTER TABLE daily_reports ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+    drop_index(conn, "ix_daily_reports_report_date")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_daily_reports_key ON daily_reports (report_date, team_id, bank_id)"
+    )
+
+    existing = {
+        str(day)[:10] for (day,) in conn.execute(text(
+            "SELECT report_date FROM daily_reports WHERE team_id = 0 AND bank_id = 0"
+        ))
+    }
+    moved, dropped = [], []
+    for key, value, updated_at in conn.execute(text(
+        "SELECT key, value, updated_at FROM system_config WHERE key LIKE :pattern"
+    ), {"pattern": _PREFIX + "%"}).all():
+        try:
+            day = date.fromisoformat(key[len(_PREFIX):])
+        except ValueError:
+            logger.warning("跳过无法识别日期的配置项: %s", key)
+            continue
+        if day.isoformat() in existing or not value:
+            dropped.append(key)
+            continue
+        existing.add(day.isoformat())
+        moved.append({
+            "key": key, "report_date": day, "participants": _participants(value), "content": value,
+            "generated_at": _generated_at(updated_at)
+        })
+
+    if moved:
+        conn.execute(text(
+            "INSERT INTO daily_reports (report_date, team_id, bank_id, participants, content, generated_at) "
+            "VALUES (:report_date, 0, 0, :participants, :content, :generated_at)"
+        ).bindparams(bindparam("report_date", type_=Date), bindparam("generated_at", type_=DateTime)), [
+            {name: value for name, value in item.items() if name != "key"} for item in moved
+        ])
+    keys = [item["key"] for item in moved] + dropped
+    if keys:
+        conn.execute(text("DELETE FROM system_config WHERE key = :key"), [{"key": key} for key in keys])
+    logger.info("迁出 %d 份每日报告，删除 %d 个重复的配置项", len(moved), len(dropped))
+
+
+def downgrade(conn):
+    drop_index(conn, "ix_daily_reports_key")
+    if has_column(conn, "daily_reports", "team_id"):
+        conn.exec_driver_sql("DELETE FROM daily_reports WHERE team_id != 0 OR bank_id != 0")
+        for column in ("team_id", "bank_id"):
+            conn.exec_driver_sql(f"ALTER TABLE daily_reports DROP COLUMN {column}")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_daily_reports_report_date ON daily_reports (report_date)"
+    )
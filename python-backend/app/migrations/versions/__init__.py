@@ -0,0 +1 @@
+# 迁移版本，文件名格式: NNNN_说明.py
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, JSON, Text, Boolean, ForeignKey, Index, BigInteger, event
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, object_session, relationship
 from .database import Base
+from .compressed_json import CompressedJSON
 
 class ProductTeam(Base):
     """产品团队表"""
@@ -40,6 +41,9 @@ class QuestionBank(Base):
 class Question(Base):
     """题库表"""
     __tablename__ = "questions"
+    __table_args__ = (
+        Index("ix_questions_bank_id_category", "bank_id", "category"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     bank_id = Column(Integer, ForeignKey("question_banks.id"), nullable=False, default=1, index=True)
@@ -62,6 +66,10 @@ class Question(Base):
 class ExamRecord(Base):
     """考试记录表"""
     __tablename__ = "exam_records"
+    __table_args__ = (
+        Index("ix_exam_records_exam_type_created_at", "exam_type", "created_at"),
+        Index("ix_exam_records_team_id_created_at", "team_id", "created_at"),
+    )
     
     id = Column(String(100), primary_key=True)
     user_name = Column(String(100), nullable=False, index=True)
@@ -77,10 +85,164 @@ class ExamRecord(Base):
     exam_type = Column(String(50), default="weekly")  # 考试类型
     week_number = Column(Integer, index=True)
     year = Column(Integer, index=True)
-    detailed_answers = Column(JSON)  # 详细答题数据
-    questions_data = Column(JSON)  # 完整题目数据（用于AI分析）
+    detailed_answers = Column(CompressedJSON)  # 详细答题数据
+    # 完整题目数据（用于AI分析）：题目内容存放在 question_snapshots 中，这里只保存
+    # 快照ID和作答，并压缩存储；通过 questions_data 属性读写原格式
+    stored_questions_data = Column("questions_data", CompressedJSON)
     ai_report = Column(Text)  # AI分析报告
+    # 生成AI报告的token数（复用缓存的报告正文时为0，合并生成时按份数分摊）
+    ai_report_prompt_tokens = Column(Integer)
+    ai_report_completion_tokens = Column(Integer)
     created_at = Column(DateTime, server_default=func.now(), index=True)
+    
+    @property
+    def questions_data(self):
+        pending = getattr(self, "_pending_questions_data", None)
+        if pending is not None:
+            return pending
+        from .question_snapshots import expand
+        return expand(object_session(self), self.stored_questions_data)
+    
+    @questions_data.setter
+    def questions_data(self, value):
+        # 提交时（before_flush）再换成快照引用；未经过 flush 的写入按原格式压缩存储
+        self._pending_questions_data = value
+        self.stored_questions_data = value
+
+class QuestionSnapshot(Base):
+    """考试记录中的题目内容快照（按内容哈希去重，题目修改后历史记录仍保留作答时的内容）"""
+    __tablename__ = "question_snapshots"
+    # 快照ID不复用：回滚后同一ID不会指向另一份内容
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(40), nullable=False, unique=True)
+    content = Column(CompressedJSON, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+@event.listens_for(Session, "before_flush")
+def _compact_questions_data(session, flush_context, instances):
+    """把待写入的 questions_data 换成题目快照引用"""
+    records = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, ExamRecord) and getattr(obj, "_pending_questions_data", None) is not None
+    ]
+    if records:
+        from .question_snapshots import compact_records
+        compact_records(session, records)
+
+class ExamRecordArchive(Base):
+    """考试记录归档文件（每个文件为一个月份的压缩 NDJSON）"""
+    __tablename__ = "exam_record_archives"
+    
+    file_name = Column(String(200), primary_key=True)
+    month = Column(String(7), nullable=False, index=True)  # YYYY-MM
+    record_count = Column(Integer, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    compression = Column(String(10), nullable=False)  # zstd, gzip
+    created_at = Column(DateTime, server_default=func.now())
+
+class ArchivedExamRecord(Base):
+    """已归档考试记录ID到归档文件的映射，用于按ID读取归档记录"""
+    __tablename__ = "archived_exam_records"
+    
+    id = Column(String(100), primary_key=True)
+    file_name = Column(String(200), nullable=False)
+    created_at = Column(DateTime)  # 原记录的提交时间
+
+class ExamRecordRollup(Base):
+    """已归档考试记录的按日汇总统计"""
+    __tablename__ = "exam_record_rollups"
+    __table_args__ = (
+        Index("ix_exam_record_rollups_key", "day", "team_id", "bank_id", "exam_type", "department", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    team_id = Column(Integer)
+    bank_id = Column(Integer)
+    exam_type = Column(String(50))
+    department = Column(String(100))
+    exam_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+    score_min = Column(Integer)
+    score_max = Column(Integer)
+    high_count = Column(Integer, nullable=False, default=0)  # 80分及以上
+    low_count = Column(Integer, nullable=False, default=0)  # 60分以下
+    correct_sum = Column(Integer, nullable=False, default=0)
+    question_sum = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(Integer, nullable=False, default=0)
+
+class LlmUsageRollup(Base):
+    """大模型调用按日汇总（按接口、模型、用途、结果），耗时按固定分桶计数"""
+    __tablename__ = "llm_usage_rollups"
+    __table_args__ = (
+        Index("ix_llm_usage_rollups_key", "day", "provider", "model", "purpose", "status", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    provider = Column(String(200), nullable=False, default="")  # 接口地址的主机名
+    model = Column(String(100), nullable=False, default="")
+    purpose = Column(String(30), nullable=False, default="")  # report, backlog, legacy, test
+    status = Column(String(20), nullable=False, default="")  # HTTP状态码、timeout、connect_error、rejected、cache 等
+    calls = Column(Integer, nullable=False, default=0)
+    cache_hits = Column(Integer, nullable=False, default=0)
+    cache_misses = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(BigInteger, nullable=False, default=0)
+    completion_tokens = Column(BigInteger, nullable=False, default=0)
+    latency_ms_sum = Column(BigInteger, nullable=False, default=0)
+    latency_ms_max = Column(Integer, nullable=False, default=0)
+    # 耗时分桶计数（秒）：≤1、≤2、≤5、≤10、≤20、≤30、>30
+    latency_le_1s = Column(Integer, nullable=False, default=0)
+    latency_le_2s = Column(Integer, nullable=False, default=0)
+    latency_le_5s = Column(Integer, nullable=False, default=0)
+    latency_le_10s = Column(Integer, nullable=False, default=0)
+    latency_le_20s = Column(Integer, nullable=False, default=0)
+    latency_le_30s = Column(Integer, nullable=False, default=0)
+    latency_gt_30s = Column(Integer, nullable=False, default=0)
+
+class DailyReport(Base):
+    """每日测验报告：测验结束后生成一次，之后直接读取（按团队、题库分别保存）"""
+    __tablename__ = "daily_reports"
+    __table_args__ = (
+        Index("ix_daily_reports_key", "report_date", "team_id", "bank_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    report_date = Column(Date, nullable=False)
+    team_id = Column(Integer, nullable=False, default=0)  # 0 表示全部团队
+    bank_id = Column(Integer, nullable=False, default=0)  # 0 表示全部题库
+    participants = Column(Integer, nullable=False, default=0)
+    content = Column(Text, nullable=False)  # 报告JSON，与 /daily-exam-report 的返回相同
+    generated_at = Column(DateTime, nullable=False)
+
+class ExamSession(Base):
+    """进行中的考试会话：服务端固定题目和截止时间，作答自动保存，交卷时由服务端判分"""
+    __tablename__ = "exam_sessions"
+    __table_args__ = (
+        Index("ix_exam_sessions_status_deadline", "status", "deadline"),
+        Index("ix_exam_sessions_user_status", "user_id", "status"),
+    )
+
+    id = Column(String(32), primary_key=True)
+    exam_id = Column(Integer, ForeignKey("exams.id"))  # 每日测验为空
+    exam_type = Column(String(50), nullable=False)  # formal_exam, daily_exam
+    user_name = Column(String(100), nullable=False)
+    user_id = Column(String(100))
+    department = Column(String(100))
+    region = Column(String(100))
+    team_id = Column(Integer)
+    bank_id = Column(Integer)
+    question_ids = Column(JSON, nullable=False)  # 题目ID，按考试中的顺序
+    answers = Column(CompressedJSON)  # {"题目序号": 答案}
+    answers_version = Column(Integer, nullable=False, default=0)  # 客户端递增的保存版本号
+    started_at = Column(DateTime, nullable=False)
+    deadline = Column(DateTime, nullable=False)
+    saved_at = Column(DateTime)
+    status = Column(String(20), nullable=False, default="active")  # active, submitted, expired(超时自动交卷)
+    submitted_at = Column(DateTime)
+    record_id = Column(String(100))
 
 class SystemConfig(Base):
     """系统配置表"""
@@ -0,0 +1,273 @@
+"""
+按需性能剖析 - 管理员可在指定时长内按采样率或指定路由对请求启用 cProfile，
+汇总结果以 pstats 文本、pstats 二进制或火焰图折叠栈格式导出。
+未启用时中间件只做一次全局变量判断，没有额外开销。
+
+注意：异步请求在 await 期间会让出事件循环，同一时间只剖析一个请求，
+但结果中可能包含同时运行的其他协程的调用。
+同步（def）路由函数在线程池中执行，cProfile 只对启用它的线程生效：首次剖析时给同步路由函数
+加上包装，被剖析的请求在线程池线程中另开一个剖析器，结果合并到同一会话。
+依赖项（如 get_db）在线程池中的执行不计入。
+cProfile/pstats 只在首次剖析时导入，不计入服务启动耗时。
+"""
+
+import functools
+import inspect
+import io
+import random
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+
+from .metrics import route_labels
+
+if TYPE_CHECKING:
+    import cProfile
+    import pstats
+
+# 折叠栈的最大深度，防止调用图过深
+_MAX_STACK_DEPTH = 64
+# 调用路径数量随调用图呈指数增长：忽略占比过小的分支，并限制总展开节点数
+_MIN_BRANCH_FRACTION = 0.0005
+_MAX_VISITS = 200000
+
+
+class ProfilingSession:
+    """一次剖析会话"""
+
+    def __init__(self, duration_seconds: float, sample_rate: float, route: Optional[str]):
+        self.started_at = datetime.now()
+        self.deadline = time.monotonic() + duration_seconds
+        self.duration_seconds = duration_seconds
+        self.sample_rate = sample_rate
+        self.route = route
+        self.profiled_requests = 0
+        self.skipped_requests = 0
+        self.stats: Optional["pstats.Stats"] = None
+        self.busy = False
+        self.lock = threading.Lock()
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def should_profile(self, scope) -> bool:
+        if self.route:
+            route, _ = route_labels(scope)
+            if route != self.route:
+                return False
+        return random.random() < self.sample_rate
+
+    def add(self, profile: "cProfile.Profile", request: bool = True):
+        """合并剖析结果；线程池中同步路由函数的结果属于已计数的请求，request 为 False"""
+        import pstats
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+            self.profiled_requests += request
+
+    def summary(self) -> dict:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": self.duration_seconds,
+            "remaining_seconds": max(0.0, round(self.deadline - time.monotonic(), 1)),
+            "sample_rate": self.sample_rate,
+            "route": self.route,
+            "profiled_requests": self.profiled_requests,
+            "skipped_requests": self.skipped_requests
+        }
+
+
+# 当前进行中的会话，以及最近一次会话（用于结束后导出结果）
+_active: Optional[ProfilingSession] = None
+_last: Optional[ProfilingSession] = None
+# 正在剖析的请求所属的会话（线程池执行同步函数时复制当前上下文，包装函数据此判断是否剖析）
+_profiling: ContextVar[Optional[ProfilingSession]] = ContextVar("profiling_session", default=None)
+_instrumented = False
+
+
+def start_profiling(duration_seconds: float, sample_rate: float = 1.0,
+                    route: Optional[str] = None) -> ProfilingSession:
+    """开始一次剖析会话（会替换正在进行的会话）"""
+    global _active, _last
+    session = ProfilingSession(duration_seconds, sample_rate, route)
+    _active = _last = session
+    return session
+
+
+def stop_profiling() -> Optional[ProfilingSession]:
+    """提前结束当前会话"""
+    global _active
+    session, _active = _active, None
+    return session
+
+
+def current_session() -> Optional[ProfilingSession]:
+    """返回最近一次会话（进行中或已结束）"""
+    return _last
+
+
+def is_active() -> bool:
+    return _active is not None and not _active.expired()
+
+
+def _func_label(func) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    module = filename.rsplit("/", 1)[-1]
+    return f"{name} ({module}:{line})"
+
+
+def render_text(session: ProfilingSession, sort: str = "cumulative", limit: int = 50) -> str:
+    """pstats 文本报告"""
+    if session.stats is None:
+        return "没有采集到剖析数据\n"
+    import pstats
+    output = io.StringIO()
+    stats = pstats.Stats(stream=output)
+    with session.lock:
+        stats.add(session.stats)
+    stats.sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def render_prof(session: ProfilingSession) -> bytes:
+    """pstats 二进制格式（与 Stats.dump_stats 相同，可用 snakeviz 等工具打开）"""
+    import marshal
+    return marshal.dumps(session.stats.stats if session.stats else {})
+
+
+def render_collapsed(session: ProfilingSession) -> str:
+    """火焰图折叠栈格式（flamegraph.pl / speedscope），数值单位为微秒。
+
+    cProfile 只记录调用者-被调用者关系，这里按每条调用边的累计时间比例
+    把函数自身耗时分摊到各条调用路径上。
+    """
+    if session.stats is None:
+        return ""
+
+    raw = session.stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [
+        func for func, (_, _, _, _, callers) in raw.items()
+        if not any(caller in raw for caller in callers)
+    ]
+    min_time = sum(raw[root][3] for root in roots) * _MIN_BRANCH_FRACTION
+    lines = {}
+    visits = 0
+
+    def visit(func, stack, scale):
+        nonlocal visits
+        visits += 1
+        _, _, tottime, cumtime, _ = raw[func]
+        stack = stack + (_func_label(func),)
+        self_us = int(tottime * scale * 1_000_000)
+        if self_us > 0:
+            key = ";".join(stack)
+            lines[key] = lines.get(key, 0) + self_us
+        if len(stack) >= _MAX_STACK_DEPTH:
+            return
+        for callee, edge_cumtime in callees.get(func, ()):
+            if visits >= _MAX_VISITS:
+                return
+            if callee not in raw or _func_label(callee) in stack:
+                continue
+            callee_cumtime = raw[callee][3]
+            if callee_cumtime <= 0:
+                continue
+            callee_scale = scale * min(1.0, edge_cumtime / callee_cumtime)
+            if callee_cumtime * callee_scale < min_time:
+                continue
+            visit(callee, stack, callee_scale)
+
+    for root in roots:
+        visit(root, (), 1.0)
+
+    return "".join(f"{stack} {value}\n" for stack, value in sorted(lines.items()))
+
+
+def _profiled_call(call):
+    """同步路由函数的包装：所在请求正在剖析时在当前（线程池）线程启用剖析器"""
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        session = _profiling.get()
+        if session is None:
+            return call(*args, **kwargs)
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            profile.disable()
+            session.add(profile, request=False)
+
+    return wrapper
+
+
+def _instrument_sync_endpoints(app):
+    """给同步路由函数加上剖析包装（只执行一次，按请求时的 dependant.call 调用）"""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    for route in getattr(app, "routes", ()):
+        dependant = getattr(route, "dependant", None)
+        call = getattr(dependant, "call", None)
+        if call is not None and not inspect.iscoroutinefunction(call) and not inspect.isclass(call):
+            dependant.call = _profiled_call(call)
+
+
+class ProfilingMiddleware:
+    """按剖析会话配置对请求启用 cProfile 的ASGI中间件"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _active
+        session = _active
+        if session is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if session.expired():
+            _active = None
+            await self.app(scope, receive, send)
+            return
+
+        if not session.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # cProfile 同一线程内只能有一个剖析器处于启用状态
+        with session.lock:
+            if session.busy:
+                session.skipped_requests += 1
+                acquired = False
+            else:
+                session.busy = acquired = True
+        if not acquired:
+            await self.app(scope, receive, send)
+            return
+
+        _instrument_sync_endpoints(scope.get("app"))
+        import cProfile
+        profile = cProfile.Profile()
+        token = _profiling.set(session)
+        profile.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profile.disable()
+            _profiling.reset(token)
+            session.busy = False
+            session.add(profile)
@@ -0,0 +1,275 @@
+"""
+题目快照 - 考试记录 questions_data 中每道题的内容（题干、选项、答案、解析等）按内容哈希去重存入
+question_snapshots，记录中只保存快照ID和作答，整体再压缩存储。同一道题被作答上百万次也只存一份内容。
+
+存储格式: {"v": 1, "q": [[快照ID, 用户答案, 是否正确], ...]}，题目带有其他字段时追加第四项
+旧数据（完整题目列表）读取时原样返回，可用以下命令转换（同时压缩 detailed_answers）:
+
+命令行: python -m app.question_snapshots backfill [--batch-size 1000] [--vacuum]
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlalchemy import LargeBinary, bindparam, insert, select, type_coerce, update
+
+from .compressed_json import CompressedJSON, decode
+from .models import ExamRecord as ExamRecordModel, QuestionSnapshot
+
+# 快照内容字段和每次作答的字段，按前端提交的字段顺序排列
+CONTENT_FIELDS = ("question", "optionA", "optionB", "optionC", "optionD", "correct_answer",
+                  "question_type", "category", "explanation")
+_FIELD_ORDER = ("question", "optionA", "optionB", "optionC", "optionD", "correct_answer", "user_answer",
+                "question_type", "category", "explanation", "is_correct")
+_FORMAT_VERSION = 1
+# 按哈希查询快照ID时每批的数量
+_LOOKUP_BATCH = 500
+
+_snapshots = QuestionSnapshot.__table__
+_records = ExamRecordModel.__table__
+
+# 快照内容不会修改，按ID缓存
+_CACHE_SIZE = 50000
+_cache: "OrderedDict[int, dict]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cache_get(snapshot_id: int) -> Optional[dict]:
+    with _lock:
+        content = _cache.get(snapshot_id)
+        if content is not None:
+            _cache.move_to_end(snapshot_id)
+        return content
+
+
+def _cache_put(snapshot_id: int, content: dict):
+    with _lock:
+        _cache[snapshot_id] = content
+        _cache.move_to_end(snapshot_id)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def content_hash(content: dict) -> str:
+    data = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def is_compact(value) -> bool:
+    return isinstance(value, dict) and value.get("v") == _FORMAT_VERSION and "q" in value
+
+
+def _insert_ignore(dialect_name: str):
+    """插入快照，已存在（并发写入同一内容）时忽略"""
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(_snapshots)
+    return dialect_insert(_snapshots).on_conflict_do_nothing(index_elements=["content_hash"])
+
+
+def _lookup(conn, hashes: List[str]) -> Dict[str, int]:
+    ids = {}
+    for i in range(0, len(hashes), _LOOKUP_BATCH):
+        rows = conn.execute(select(_snapshots.c.content_hash, _snapshots.c.id).where(
+            _snapshots.c.content_hash.in_(hashes[i:i + _LOOKUP_BATCH])
+        ))
+        ids.update({content_hash_: snapshot_id for content_hash_, snapshot_id in rows})
+    return ids
+
+
+def resolve_ids(conn, contents: Dict[str, dict]) -> Dict[str, int]:
+    """返回 {内容哈希: 快照ID}，不存在的快照先写入；conn 可以是 Session 或 Connection"""
+    ids = _lookup(conn, list(contents))
+    missing = [content_hash_ for content_hash_ in contents if content_hash_ not in ids]
+    if missing:
+        dialect = conn.get_bind().dialect if hasattr(conn, "get_bind") else conn.dialect
+        conn.execute(_insert_ignore(dialect.name), [
+            {"content_hash": content_hash_, "content": contents[content_hash_]} for content_hash_ in missing
+        ])
+        ids.update(_lookup(conn, missing))
+    # 这里写入的快照可能随事务回滚，不放入缓存
+    return ids
+
+
+def compact(conn, values: List[Optional[list]]) -> List[Optional[dict]]:
+    """把多条记录的完整题目列表转换为存储格式（不是题目列表的值原样返回）"""
+    split = []
+    contents: Dict[str, dict] = {}
+    for value in values:
+        if not isinstance(value, list):
+            split.append(None)
+            continue
+        items = []
+        for item in value:
+            item = dict(item)
+            content = {field: item.pop(field) for field in CONTENT_FIELDS if field in item}
+            key = content_hash(content)
+            contents[key] = content
+            items.append((key, item))
+        split.append(items)
+
+    ids = resolve_ids(conn, contents) if contents else {}
+    result = []
+    for value, items in zip(values, split):
+        if items is None:
+            result.append(value)
+            continue
+        entries = []
+        for key, item in items:
+            is_correct = item.pop("is_correct", None)
+            entry = [ids[key], item.pop("user_answer", None), None if is_correct is None else int(bool(is_correct))]
+            if item:
+                entry.append(item)
+            entries.append(entry)
+        result.append({"v": _FORMAT_VERSION, "q": entries})
+    return result
+
+
+def compact_records(session, records: List[ExamRecordModel]):
+    """把待写入记录的 questions_data 换成快照引用（在 before_flush 中调用）"""
+    values = compact(session, [record._pending_questions_data for record in records])
+    for record, value in zip(records, values):
+        record.stored_questions_data = value
+        record._pending_questions_data = None
+
+
+def expand(session, stored) -> Optional[list]:
+    """把存储格式还原为完整题目列表（旧数据原样返回）"""
+    if not is_compact(stored):
+        return stored
+
+    contents = {}
+    missing = []
+    for entry in stored["q"]:
+        content = _cache_get(entry[0])
+        if content is None:
+            missing.append(entry[0])
+        else:
+            contents[entry[0]] = content
+    if missing:
+        contents.update(_load(session, missing))
+
+    questions = []
+    for entry in stored["q"]:
+        content = contents.get(entry[0], {})
+        answer = {}
+        if entry[1] is not None:
+            answer["user_answer"] = entry[1]
+        if entry[2] is not None:
+            answer["is_correct"] = bool(entry[2])
+        item = {}
+        for field in _FIELD_ORDER:
+            if field in content:
+                item[field] = content[field]
+            elif field in answer:
+                item[field] = answer[field]
+        if len(entry) > 3:
+            item.update(entry[3])
+        questions.append(item)
+    return questions
+
+
+def _load(session, snapshot_ids: List[int]) -> Dict[int, dict]:
+    close = False
+    if session is None:
+        # 对象已脱离会话时临时打开一个
+        from .database import SessionLocal
+        session = SessionLocal()
+        close = True
+    try:
+        contents = {}
+        unique_ids = list(set(snapshot_ids))
+        for i in range(0, len(unique_ids), _LOOKUP_BATCH):
+            rows = session.execute(select(_snapshots.c.id, _snapshots.c.content).where(
+                _snapshots.c.id.in_(unique_ids[i:i + _LOOKUP_BATCH])
+            ))
+            for snapshot_id, content in rows:
+                contents[snapshot_id] = content
+                _cache_put(snapshot_id, content)
+        return contents
+    finally:
+        if close:
+            session.close()
+
+
+def backfill(engine, batch_size: int = 1000, log=print) -> dict:
+    """把旧格式的记录转换为当前存储格式，可重复执行：
+    questions_data 中的完整题目列表换成快照引用，detailed_answers 的JSON文本改为压缩存储"""
+    raw_questions = type_coerce(_records.c.questions_data, LargeBinary)
+    raw_answers = type_coerce(_records.c.detailed_answers, LargeBinary)
+    converted = scanned = 0
+    last_id = ""
+    start = time.perf_counter()
+    update_stmt = update(_records).where(_records.c.id == bindparam("record_id")).values(
+        questions_data=bindparam("questions_data"), detailed_answers=bindparam("detailed_answers")
+    )
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(_records.c.id, raw_questions, raw_answers).where(_records.c.id > last_id)
+                .order_by(_records.c.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            scanned += len(rows)
+
+            changed = []
+            for record_id, questions, answers in rows:
+                questions_value, answers_value = decode(questions), decode(answers)
+                repack = answers is not None and _encoded(answers_value) != answers
+                if isinstance(questions_value, list) or repack:
+                    changed.append((record_id, questions_value, answers_value))
+            if changed:
+                values = compact(conn, [questions for _, questions, _ in changed])
+                conn.execute(update_stmt, [
+                    {"record_id": record_id, "questions_data": questions, "detailed_answers": answers}
+                    for (record_id, _, answers), questions in zip(changed, values)
+                ])
+                converted += len(changed)
+        if scanned % (batch_size * 10) == 0:
+            log(f"  已检查 {scanned} 条记录，转换 {converted} 条")
+    return {"scanned": scanned, "converted": converted, "seconds": round(time.perf_counter() - start, 1)}
+
+
+def _encoded(value) -> bytes:
+    return CompressedJSON().process_bind_param(value, None)
+
+
+def main():
+    import argparse
+    import os
+
+    from .database import engine, init_db
+
+    parser = argparse.ArgumentParser(description="考试记录题目快照")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = sub.add_parser("backfill", help="把旧格式的记录转换为快照引用和压缩存储")
+    backfill_parser.add_argument("--batch-size", type=int, default=1000)
+    backfill_parser.add_argument("--vacuum", action="store_true", help="完成后执行 VACUUM 回收空间（仅SQLite，期间数据库被锁定）")
+    args = parser.parse_args()
+
+    init_db()
+    db_path = engine.url.database if engine.dialect.name == "sqlite" else None
+    size_before = os.path.getsize(db_path) if db_path and os.path.exists(db_path) else None
+
+    result = backfill(engine, args.batch_size)
+    print(f"✅ 转换 {result['converted']} 条记录（共检查 {result['scanned']} 条，用时 {result['seconds']}秒）")
+
+    if args.vacuum and db_path:
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").exec_driver_sql("VACUUM")
+        size_after = os.path.getsize(db_path)
+        print(f"📦 数据库文件: {size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB"
+              f"（{size_before / max(size_after, 1):.1f}×）")
+
+
+if __name__ == "__main__":
+    main()
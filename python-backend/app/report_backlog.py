@@ -0,0 +1,399 @@
+"""
+AI报告积压处理 - 大型考试结束后大量记录没有AI报告时，把多条记录的报告正文合并到一次大模型调用中生成，
+按编号标记拆分回每条记录；拆分失败或缺少某份报告时对缺少的记录逐条调用。
+
+- 报告正文与自动生成的报告相同（只根据得分区间和错题生成，见 app/report_cache.py），
+  错题指纹相同的记录只生成一次，缓存中已有的正文不调用大模型
+- 同时进行的调用数不超过 AI_REPORT_BACKLOG_CONCURRENCY，按提示词和输出上限估算的token数
+  每分钟不超过 AI_REPORT_BACKLOG_TPM
+- 只写入仍没有报告的记录；正在生成报告的记录跳过，处理中的记录也可以通过流式接口读取结果
+
+命令行: python -m app.report_backlog status|run [--limit N] [--dry-run]
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, or_, update
+from sqlalchemy.orm import Session
+
+from . import live_feed, llm_usage
+from .config import settings
+from .metrics import Counter, registry
+from .models import ExamRecord as ExamRecordModel
+
+logger = logging.getLogger("exam_system.report_backlog")
+
+BACKLOG_CALLS = registry.register(Counter(
+    "ai_report_backlog_calls_total", "积压处理调用大模型的次数（batch 多条合并，single 逐条）", ("mode",)
+))
+BACKLOG_REPORTS = registry.register(Counter(
+    "ai_report_backlog_reports_total", "积压处理生成的报告数（按正文来源）", ("source",)
+))
+
+_records = ExamRecordModel.__table__
+# 每次从数据库读取的记录数
+_PAGE_SIZE = 200
+_SECTION_MARK = re.compile(r"^\s*=+\s*报告\s*(\d+)\s*=+\s*$", re.MULTILINE)
+
+# 只写入仍没有报告的记录（处理期间可能已由流式接口生成）
+_save_report = update(_records).where(
+    _records.c.id == bindparam("record_id"),
+    or_(_records.c.ai_report.is_(None), _records.c.ai_report == "")
+).values(
+    ai_report=bindparam("report"),
+    ai_report_prompt_tokens=bindparam("prompt_tokens"),
+    ai_report_completion_tokens=bindparam("completion_tokens")
+)
+
+# (进行中的生成, 报告全文, 提示词token数, 输出token数)
+Report = Tuple[object, str, int, int]
+
+
+class TokenBudget:
+    """每分钟token预算：调用前按估算的token数预留，最近一分钟内的预留超出预算时等待"""
+
+    def __init__(self, tokens_per_minute: int, window: float = 60.0):
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self._spent: Deque[Tuple[float, int]] = deque()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        if self.tokens_per_minute <= 0:
+            return
+        # 单次调用超过预算时按整份预算计，避免永远等待
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._spent and now - self._spent[0][0] >= self.window:
+                    self._spent.popleft()
+                if sum(spent for _, spent in self._spent) + tokens <= self.tokens_per_minute:
+                    self._spent.append((now, tokens))
+                    return
+                await asyncio.sleep(self._spent[0][0] + self.window - now)
+
+
+class _Item:
+    """一个待生成的报告正文及使用它的记录"""
+
+    __slots__ = ("key", "case", "prompt", "records")
+
+    def __init__(self, key: str, case: str, prompt: str):
+        self.key = key
+        self.case = case
+        self.prompt = prompt
+        self.records: List[Tuple[object, str]] = []  # (ReportStream, 个人信息开头)
+
+
+def pending_query(db: Session):
+    return db.query(ExamRecordModel.id).filter(
+        or_(ExamRecordModel.ai_report.is_(None), ExamRecordModel.ai_report == "")
+    )
+
+
+def pending_count(db: Session) -> int:
+    return pending_query(db).with_entities(func.count()).scalar()
+
+
+def build_batch_prompt(items: List[_Item]) -> str:
+    """多份测验结果合并的提示词，要求按编号输出每份报告"""
+    from .ai_report import SHARED_REPORT_REQUIREMENTS
+
+    cases = "\n\n".join(f"### 测验 {i}\n{item.case}" for i, item in enumerate(items, 1))
+    return f"""
+以下是 {len(items)} 份测验结果，请分别为每份结果生成一份简洁的医药代表专业评价报告。
+
+输出格式：按编号顺序输出 {len(items)} 份报告，每份报告以单独一行的 "===报告 编号===" 开头（例如 "===报告 1==="），
+不要输出其他内容。
+
+{cases}
+
+每份报告的内容：
+{SHARED_REPORT_REQUIREMENTS}
+        """
+
+
+def split_sections(text: str, count: int) -> Dict[int, str]:
+    """按 ===报告 N=== 标记拆分合并输出，返回 {编号: 正文}，缺少或为空的编号不返回"""
+    parts = _SECTION_MARK.split(text)
+    sections = {}
+    # parts: [标记前的内容, 编号, 正文, 编号, 正文, ...]
+    for number, body in zip(parts[1::2], parts[2::2]):
+        index = int(number)
+        body = body.strip()
+        if 1 <= index <= count and body and index not in sections:
+            sections[index] = body
+    return sections
+
+
+class BacklogRun:
+    """一次积压处理：读取没有报告的记录，合并调用大模型并写回"""
+
+    def __init__(self, limit: Optional[int] = None, batch_size: Optional[int] = None,
+                 concurrency: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.limit = limit
+        self.batch_size = max(1, batch_size or settings.ai_report_backlog_batch_size)
+        self.concurrency = max(1, concurrency or settings.ai_report_backlog_concurrency)
+        self.budget = TokenBudget(
+            settings.ai_report_backlog_tpm if tokens_per_minute is None else tokens_per_minute
+        )
+        self.progress = {
+            "started_at": datetime.now().isoformat(), "finished_at": None,
+            "records": 0, "saved": 0, "failed": 0, "skipped": 0, "llm_calls": 0, "cached": 0
+        }
+
+    def _load_page(self, db: Session, api_config: dict, after: Optional[str]) -> Tuple[List[_Item], Optional[str]]:
+        """读取一页没有报告的记录，按报告正文的缓存键分组；返回 (待生成的正文, 本页最后的记录ID)"""
+        from . import ai_report
+        from .report_cache import cache
+
+        query = pending_query(db).with_entities(ExamRecordModel)
+        if after is not None:
+            query = query.filter(ExamRecordModel.id > after)
+        size = _PAGE_SIZE
+        if self.limit is not None:
+            size = min(size, self.limit - self.progress["records"])
+        records = query.order_by(ExamRecordModel.id).limit(size).all() if size > 0 else []
+
+        items: Dict[str, _Item] = {}
+        cached = []
+        claimed = []
+        try:
+            for exam_record in records:
+                self.progress["records"] += 1
+                stream = ai_report.claim_report(exam_record.id)
+                if stream is None:
+                    self.progress["skipped"] += 1
+                    continue
+                claimed.append(stream)
+                analysis = ai_report.question_analysis(exam_record, db)
+                header = ai_report.report_header(exam_record)
+                key = ai_report.report_key(exam_record, analysis, api_config,
+                                           ai_report.AUTO_REPORT_MAX_TOKENS, ai_report.AUTO_REPORT_TEMPERATURE)
+                body = cache.get(key)
+                if body is not None:
+                    cached.append((stream, header, body))
+                    continue
+                item = items.get(key)
+                if item is None:
+                    item = items[key] = _Item(key, ai_report.shared_case(exam_record, analysis),
+                                              ai_report.build_shared_prompt(exam_record, analysis))
+                item.records.append((stream, header))
+        except Exception as e:
+            for stream in claimed:
+                ai_report.release_report(stream, f"生成报告失败: {e}")
+            raise
+
+        if items or cached:
+            # 同一页内错题指纹相同的记录共用一份正文，除第一条外都算命中
+            shared = sum(len(item.records) - 1 for item in items.values())
+            llm_usage.record_cache(api_config, "backlog", hits=len(cached) + shared, misses=len(items))
+        if cached:
+            self._save(db, [(stream, header + body, 0, 0) for stream, header, body in cached])
+            self.progress["cached"] += len(cached)
+            BACKLOG_REPORTS.inc("cache", amount=len(cached))
+        return list(items.values()), records[-1].id if records else None
+
+    def _save(self, db: Session, reports: List[Report]):
+        from .ai_report import release_report
+
+        try:
+            db.execute(_save_report, [
+                {"record_id": stream.record_id, "report": text,
+                 "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+                for stream, text, prompt_tokens, completion_tokens in reports
+            ])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for stream, *_ in reports:
+                release_report(stream, f"保存报告失败: {e}")
+            self.progress["failed"] += len(reports)
+            raise
+        for stream, text, *_ in reports:
+            stream.append(text)
+            release_report(stream)
+            live_feed.ai_report_ready(stream.record_id)
+        self.progress["saved"] += len(reports)
+
+    def _fail(self, item: _Item, error: str):
+        from .ai_report import release_report
+
+        for stream, _ in item.records:
+            release_report(stream, error)
+        self.progress["failed"] += len(item.records)
+        BACKLOG_REPORTS.inc("failed", amount=len(item.records))
+
+    async def _call(self, api_config: dict, prompt: str, max_tokens: int, mode: str, usage) -> str:
+        from .ai_report import AUTO_REPORT_TEMPERATURE, request_report
+        from .report_prompt import estimate_tokens
+
+        await self.budget.acquire(estimate_tokens(prompt) + max_tokens)
+        self.progress["llm_calls"] += 1
+        BACKLOG_CALLS.inc(mode)
+        return await request_report(api_config, prompt, max_tokens, AUTO_REPORT_TEMPERATURE,
+                                    usage=usage, purpose="backlog")
+
+    async def _generate_batch(self, api_config: dict, batch: List[_Item]):
+        """生成一组正文，返回 [(正文项, 正文或None, 来源, 提示词token数, 输出token数)]；
+        合并调用缺少的正文逐条补调用，合并调用的token数按份数分摊"""
+        from .ai_report import AUTO_REPORT_MAX_TOKENS, TokenUsage
+
+        bodies: Dict[int, str] = {}
+        shared = TokenUsage()
+        if len(batch) > 1:
+            try:
+                text = await self._call(api_config, build_batch_prompt(batch),
+                                        AUTO_REPORT_MAX_TOKENS * len(batch), "batch", shared)
+                bodies = split_sections(text, len(batch))
+            except Exception as e:
+                logger.warning("合并生成 %d 份报告失败，改为逐条生成: %s", len(batch), e)
+            if len(bodies) < len(batch):
+                logger.info("合并输出缺少 %d 份报告，逐条补充生成", len(batch) - len(bodies))
+
+        results = []
+        for i, item in enumerate(batch, 1):
+            usage = TokenUsage()
+            usage.prompt_tokens = shared.prompt_tokens // len(batch)
+            usage.completion_tokens = shared.completion_tokens // len(batch)
+            if i in bodies:
+                results.append((item, bodies[i], "batch", usage.prompt_tokens, usage.completion_tokens))
+                continue
+            try:
+                body = (await self._call(api_config, item.prompt, AUTO_REPORT_MAX_TOKENS, "single", usage)).strip()
+            except Exception as e:
+                logger.warning("生成报告失败: %s", e)
+                self._fail(item, f"生成报告失败: {e}")
+                results.append((item, None, "failed", 0, 0))
+                continue
+            results.append((item, body or None, "single", usage.prompt_tokens, usage.completion_tokens))
+            if not body:
+                self._fail(item, "API未返回报告内容")
+        return results
+
+    async def _process(self, api_config: dict, batch: List[_Item], semaphore: asyncio.Semaphore):
+        from .database import SessionLocal
+        from .report_cache import cache
+
+        async with semaphore:
+            results = await self._generate_batch(api_config, batch)
+
+        reports: List[Report] = []
+        for item, body, source, prompt_tokens, completion_tokens in results:
+            if body is None:
+                continue
+            cache.put(item.key, body)
+            BACKLOG_REPORTS.inc(source, amount=len(item.records))
+            # 正文相同的记录只有第一条计入token数，合计即为实际用量
+            for i, (stream, header) in enumerate(item.records):
+                reports.append((stream, header + body, prompt_tokens if i == 0 else 0,
+                                completion_tokens if i == 0 else 0))
+        if reports:
+            db = SessionLocal()
+            try:
+                self._save(db, reports)
+            finally:
+                db.close()
+
+    async def run(self) -> dict:
+        from .ai_report import AIReportError, load_api_config
+        from .database import SessionLocal
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        db = SessionLocal()
+        try:
+            api_config = load_api_config(db)
+            if not api_config:
+                raise AIReportError("未配置API密钥，请先在系统配置中设置")
+            after = None
+            while self.limit is None or self.progress["records"] < self.limit:
+                items, after = self._load_page(db, api_config, after)
+                # 读取完一页后释放数据库连接，调用大模型期间不占用
+                db.close()
+                if after is None:
+                    break
+                batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+                results = await asyncio.gather(
+                    *(self._process(api_config, batch, semaphore) for batch in batches), return_exceptions=True
+                )
+                for result in results:
+                    if isinstance(result, BaseException):
+                        logger.error("保存积压报告失败: %s", result)
+        finally:
+            db.close()
+            self.progress["finished_at"] = datetime.now().isoformat()
+        return self.progress
+
+
+_current: Optional[BacklogRun] = None
+_last: Optional[dict] = None
+
+
+def status(db: Session) -> dict:
+    return {
+        "pending_records": pending_count(db),
+        "running": _current.progress if _current else None,
+        "last_run": _last,
+        "batch_size": settings.ai_report_backlog_batch_size,
+        "concurrency": settings.ai_report_backlog_concurrency,
+        "tokens_per_minute": settings.ai_report_backlog_tpm
+    }
+
+
+def is_running() -> bool:
+    return _current is not None
+
+
+async def run_backlog(limit: Optional[int] = None) -> dict:
+    """处理积压的报告（同一进程内同时只有一次）"""
+    global _current, _last
+    if _current is not None:
+        raise RuntimeError("报告积压处理正在进行中")
+    _current = BacklogRun(limit=limit)
+    try:
+        _last = await _current.run()
+    except Exception as e:
+        _last = {**_current.progress, "error": str(e)}
+        raise
+    finally:
+        _current = None
+    return _last
+
+
+def main():
+    import argparse
+    import json
+
+    from .database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="AI报告积压处理")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="查看没有报告的记录数")
+    run_parser = sub.add_parser("run", help="为没有报告的记录合并生成报告")
+    run_parser.add_argument("--limit", type=int, help="最多处理的记录数")
+    run_parser.add_argument("--dry-run", action="store_true", help="只查看待处理的记录数")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "status" or args.dry_run:
+        db = SessionLocal()
+        try:
+            print(json.dumps(status(db), ensure_ascii=False, indent=2))
+        finally:
+            db.close()
+        return
+
+    result = asyncio.run(run_backlog(limit=args.limit))
+    print(f"✅ {result['records']} 条记录：保存 {result['saved']}，失败 {result['failed']}，"
+          f"跳过 {result['skipped']}，缓存复用 {result['cached']}，调用大模型 {result['llm_calls']} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+AI报告缓存 - 同一批考试中很多人答错的题目和选项完全相同，报告正文按错题指纹缓存复用，
+只有报告开头的个人信息（姓名、得分、用时）按记录单独生成。
+
+指纹包含：每道错题（题目内容哈希 + 选择的答案）、得分区间、题目总数、模型及生成参数、提示词版本。
+缓存在进程内存中按 TTL 过期、超出容量时淘汰最久未使用的条目；同一指纹同时只调用一次大模型，
+其余请求等待其结果。
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+from .metrics import Counter, Gauge, registry
+
+CACHE_REQUESTS = registry.register(Counter(
+    "ai_report_cache_requests_total", "AI报告正文缓存查询次数（hit 命中，coalesced 等待同一指纹的生成，miss 调用大模型）",
+    ("result",)
+))
+CACHE_HIT_RATIO = registry.register(Gauge(
+    "ai_report_cache_hit_ratio", "AI报告正文缓存命中率（含等待同一指纹生成的请求）"
+))
+CACHE_ENTRIES = registry.register(Gauge(
+    "ai_report_cache_entries", "AI报告正文缓存条目数"
+))
+
+# 得分区间（下限, 名称），从高到低
+SCORE_BANDS = ((90, "90-100分"), (80, "80-89分"), (60, "60-79分"), (0, "60分以下"))
+
+
+def score_band(score: int) -> str:
+    for lower, name in SCORE_BANDS:
+        if score >= lower:
+            return name
+    return SCORE_BANDS[-1][1]
+
+
+def _normalize_answer(answer) -> str:
+    return "".join(sorted(str(answer or "").strip().upper()))
+
+
+def question_key(item: dict) -> str:
+    """题目的内容哈希（与题目是否来自快照、题库ID无关，题目修改后视为另一道题）"""
+    content = [item.get("question", ""), item.get("category", ""), _normalize_answer(item.get("correct_answer"))]
+    return hashlib.sha1(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def fingerprint(analysis: List[dict], score: int, total_questions: int, params: dict) -> str:
+    """错题集合的规范指纹：错题按题目哈希排序，与作答顺序无关"""
+    wrong = sorted(
+        (question_key(item), _normalize_answer(item.get("user_answer")))
+        for item in analysis if not item.get("is_correct")
+    )
+    data = {"wrong": wrong, "band": score_band(score), "total": total_questions, "params": params}
+    return hashlib.sha1(
+        json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()
+
+
+class ReportCache:
+    """按 TTL 过期、容量满时淘汰最久未使用条目的报告正文缓存"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._hits = 0
+        self._lookups = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                CACHE_ENTRIES.set(value=len(self._entries))
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, body: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            CACHE_ENTRIES.set(value=len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            CACHE_ENTRIES.set(value=0)
+
+    def _count(self, result: str):
+        CACHE_REQUESTS.inc(result)
+        with self._lock:
+            self._lookups += 1
+            self._hits += result != "miss"
+            CACHE_HIT_RATIO.set(value=round(self._hits / self._lookups, 4))
+
+    async def get_or_generate(self, key: str, generate: Callable[[], Awaitable[str]],
+                              use_cache: bool = True) -> Tuple[str, str]:
+        """返回 (报告正文, 来源)，来源为 hit、coalesced 或 miss；
+        use_cache 为 False 时（重新生成）不读取缓存，但用新结果更新缓存"""
+        if use_cache:
+            body = self.get(key)
+            if body is not None:
+                self._count("hit")
+                return body, "hit"
+            pending = self._inflight.get(key)
+            if pending is not None:
+                body = await asyncio.shield(pending)
+                self._count("coalesced")
+                return body, "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有其他请求等待时也要取走异常，避免 "exception was never retrieved" 警告
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = future
+        self._count("miss")
+        try:
+            body = await generate()
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("报告生成被取消"))
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        self.put(key, body)
+        future.set_result(body)
+        return body, "miss"
+
+
+cache = ReportCache(settings.ai_report_cache_size, settings.ai_report_cache_ttl_seconds)
@@ -0,0 +1,110 @@
+"""
+AI报告提示词压缩 - 只发送错题，以紧凑表格代替缩进的 JSON，解析按分类去重，并按token预算截断。
+
+token数优先用 tiktoken（cl100k_base）估算；未安装或无法加载编码时按字符估算：
+中文字符每字约一个token，其他字符约四个一个token。
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken 为可选依赖，缺失时按字符估算
+    tiktoken = None
+
+from .config import settings
+
+logger = logging.getLogger("exam_system.report_prompt")
+
+_TYPE_NAMES = {"single": "单选", "multiple": "多选"}
+# 超出预算时依次尝试的截断长度：(每条解析字数, 每道题干字数)，解析为 0 时不发送解析
+_TRIM_STEPS = ((None, None), (200, 120), (120, 80), (60, 50), (0, 50))
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # 首次使用需要下载编码文件，离线环境下按字符估算
+        logger.warning("无法加载 tiktoken 编码，按字符估算token数: %s", e)
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数"""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    cjk = sum(1 for char in text if "\u3400" <= char <= "\u9fff" or "\uf900" <= char <= "\ufaff")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _clip(text: str, limit: Optional[int]) -> str:
+    text = " ".join(str(text or "").split())
+    if limit is None or len(text) <= limit:
+        return text
+    return text[:limit] + "…"
+
+
+def _cell(text: str) -> str:
+    return text.replace("|", "｜")
+
+
+def _render(wrong: List[dict], explanation_limit: Optional[int], question_limit: Optional[int],
+            omitted: int = 0) -> str:
+    lines = ["序号|分类|题型|题目|正确答案|所选答案"]
+    explanations: Dict[str, List[str]] = {}
+    for i, item in enumerate(wrong, 1):
+        category = item.get("category") or "未分类"
+        lines.append("|".join((
+            str(i), _cell(category), _TYPE_NAMES.get(item.get("type"), item.get("type") or ""),
+            _cell(_clip(item.get("question"), question_limit)),
+            str(item.get("correct_answer") or ""), str(item.get("user_answer") or "未作答")
+        )))
+        explanation = _clip(item.get("explanation"), explanation_limit)
+        if explanation:
+            # 同一分类下相同的解析只发送一次
+            seen = explanations.setdefault(category, [])
+            if explanation not in seen:
+                seen.append(explanation)
+    if omitted:
+        lines.append(f"（另有 {omitted} 道错题未列出）")
+    if explanations:
+        lines.append("")
+        lines.append("参考解析（按分类）：")
+        lines.extend(f"- {category}：{'；'.join(items)}" for category, items in explanations.items())
+    return "\n".join(lines)
+
+
+def compact_wrong_answers(analysis: List[dict], budget: Optional[int] = None) -> Tuple[str, int]:
+    """错题表格和按分类去重的解析，返回 (文本, 估算token数)；超出预算时依次截断解析、题干，最后减少题目"""
+    budget = settings.ai_report_prompt_token_budget if budget is None else budget
+    if not analysis:
+        # 旧记录无法确定作答对应的题目
+        return "（未保存答题明细，无法列出错题）", estimate_tokens("（未保存答题明细，无法列出错题）")
+    wrong = [item for item in analysis if not item.get("is_correct")]
+    if not wrong:
+        return "全部答对", estimate_tokens("全部答对")
+
+    text = ""
+    for explanation_limit, question_limit in _TRIM_STEPS:
+        text = _render(wrong, explanation_limit, question_limit)
+        tokens = estimate_tokens(text)
+        if budget <= 0 or tokens <= budget:
+            return text, tokens
+
+    # 仍超出预算时从后往前减少题目
+    explanation_limit, question_limit = _TRIM_STEPS[-1]
+    count = len(wrong)
+    while count > 1:
+        count -= 1
+        text = _render(wrong[:count], explanation_limit, question_limit, omitted=len(wrong) - count)
+        tokens = estimate_tokens(text)
+        if tokens <= budget:
+            break
+    return text, tokens
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Header
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
 from datetime import datetime, timedelta
 
-from ..database import get_db
+from ..database import get_db, engine
 from ..models import SystemConfig as SystemConfigModel
-from ..schemas import SystemConfigResponse, APIConfig
+from ..schemas import SystemConfigResponse, APIConfig, ProfilerStartRequest
 from ..config import settings
+from ..auth import require_admin, require_admin_stream
+from ..slow_query import get_slow_queries, clear_slow_queries
+from .. import background, daily_reports, index_advisor, live_feed, llm_usage, profiler, startup
+from ..daily_reports import DEFAULT_DAILY_EXAM_CONFIG, load_daily_exam_config
 
 router = APIRouter()
 
@@ -182,23 +187,25 @@ async def test_api_connection():
     try:
         import httpx
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                settings.qwen_api_url,
-                headers={
-                    "Authorization": f"Bearer {settings.qwen_api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": settings.qwen_model,
-                    "messages": [
-                        {"role": "user", "content": "你好，这是一个API连接测试"}
-                    ],
-                    "max_tokens": 50,
-                    "temperature": 0.7
-                },
-                timeout=10.0
-            )
+        with llm_usage.track({"url": settings.qwen_api_url, "model": settings.qwen_model}, "test") as record:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(
+                    settings.qwen_api_url,
+                    headers={
+                        "Authorization": f"Bearer {settings.qwen_api_key}",
+                        "Content-Type": "application/json"
+                    },
+                    json={
+                        "model": settings.qwen_model,
+                        "messages": [
+                            {"role": "user", "content": "你好，这是一个API连接测试"}
+                        ],
+                        "max_tokens": 50,
+                        "temperature": 0.7
+                    },
+                    timeout=10.0
+                )
+            record.status = str(response.status_code)
         
         if response.status_code == 200:
             result = response.json()
@@ -318,13 +325,26 @@ async def test_api_connection(
                 }
             }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=payload,
-                timeout=15.0
-            )
+        with llm_usage.track({"provider": provider, "url": url, "model": model}, "test") as record:
+            try:
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(
+                        url,
+                        headers=headers,
+                        json=payload,
+                        timeout=15.0
+                    )
+            except httpx.TimeoutException:
+                record.status = "timeout"
+                raise
+            except httpx.TransportError:
+                record.status = "connect_error"
+                raise
+            record.status = str(response.status_code)
+            if response.status_code == 200:
+                usage = response.json().get('usage') or {}
+                record.prompt_tokens = usage.get('prompt_tokens', usage.get('input_tokens')) or 0
+                record.completion_tokens = usage.get('completion_tokens', usage.get('output_tokens')) or 0
         
         if response.status_code == 200:
             result = response.json()
@@ -554,138 +574,40 @@ async def get_daily_exam_config(db: Session = Depends(get_db)):
     # 返回默认配置
     return {
         "success": True,
-        "config": {
-            "daily_exam_start_time": "08:00",
-            "daily_exam_end_time": "20:00", 
-            "daily_exam_question_count": 3,
-            "daily_exam_duration_minutes": 10
-        },
+        "config": dict(DEFAULT_DAILY_EXAM_CONFIG),
         "updated_at": None
     }
 
 @router.get("/daily-exam-report")
 async def get_daily_exam_report(
     date: str = None,
+    team_id: Optional[int] = None,
+    bank_id: Optional[int] = None,
     db: Session = Depends(get_db)
 ):
-    """获取每日考试报告"""
-    from ..models import ExamRecord as ExamRecordModel
-    from sqlalchemy import func, and_
-    
+    """获取每日考试报告（测验结束后的日期读取已生成的报告，当天实时统计；可按团队、题库筛选）"""
     # 如果没有指定日期，使用今天
     if not date:
         date = datetime.now().strftime('%Y-%m-%d')
     
     try:
-        # 解析日期
-        target_date = datetime.strptime(date, '%Y-%m-%d')
-        next_date = target_date + timedelta(days=1)
-        
-        # 查询当日每日测验记录
-        daily_records = db.query(ExamRecordModel).filter(
-            and_(
-                ExamRecordModel.exam_type == 'daily_exam',
-                ExamRecordModel.created_at >= target_date,
-                ExamRecordModel.created_at < next_date
-            )
-        ).all()
-        
-        if not daily_records:
-            return {
-                "date": date,
-                "has_data": False,
-                "message": "当日无考试记录"
-            }
-        
-        # 统计数据
-        total_participants = len(daily_records)
-        total_score = sum(record.score for record in daily_records)
-        average_score = round(total_score / total_participants, 2)
-        
-        # 分数段统计
-        excellent_count = len([r for r in daily_records if r.score >= 90])
-        good_count = len([r for r in daily_records if 70 <= r.score < 90])
-        average_count = len([r for r in daily_records if 60 <= r.score < 70])
-        poor_count = len([r for r in daily_records if r.score < 60])
-        
-        # 计算平均用时
-        total_duration = sum(record.duration for record in daily_records if record.duration)
-        avg_duration = round(total_duration / total_participants) if total_duration > 0 else 0
-        
-        return {
-            "date": date,
-            "has_data": True,
-            "statistics": {
-                "total_participants": total_participants,
-                "average_score": average_score,
-                "average_duration_seconds": avg_duration,
-                "score_distribution": {
-                    "excellent": {"count": excellent_count, "percentage": round(excellent_count/total_participants*100, 1)},
-                    "good": {"count": good_count, "percentage": round(good_count/total_participants*100, 1)},
-                    "average": {"count": average_count, "percentage": round(average_count/total_participants*100, 1)},
-                    "poor": {"count": poor_count, "percentage": round(poor_count/total_participants*100, 1)}
-                }
-            },
-            "records": [
-                {
-                    "user_name": record.user_name,
-                    "score": record.score,
-                    "correct_count": record.correct_count,
-                    "total_questions": record.total_questions,
-                    "duration": record.duration,
-                    "created_at": record.created_at.isoformat()
-                }
-                for record in daily_records
-            ]
-        }
-        
+        target_date = datetime.strptime(date, '%Y-%m-%d').date()
     except ValueError:
         raise HTTPException(status_code=400, detail="日期格式错误，请使用YYYY-MM-DD格式")
+    
+    try:
+        report, is_stored = daily_reports.report_for(db, target_date, team_id or 0, bank_id or 0)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"生成每日报告失败: {str(e)}")
+    if is_stored:
+        return Response(content=report, media_type="application/json")
+    return report
 
 @router.post("/generate-daily-reports")
 async def generate_daily_reports(db: Session = Depends(get_db)):
-    """生成所有缺失的每日报告"""
-    from ..models import ExamRecord as ExamRecordModel
-    from sqlalchemy import func, distinct
-    
+    """生成所有缺失的每日报告（后台任务会在每天测验结束后自动生成）"""
     try:
-        # 获取所有有每日测验记录的日期
-        exam_dates = db.query(
-            func.date(ExamRecordModel.created_at).label('exam_date')
-        ).filter(
-            ExamRecordModel.exam_type == 'daily_exam'
-        ).distinct().all()
-        
-        generated_reports = []
-        
-        for date_tuple in exam_dates:
-            exam_date = date_tuple[0]
-            date_str = exam_date.strftime('%Y-%m-%d')
-            
-            # 检查是否已有报告记录
-            existing_report = db.query(SystemConfigModel).filter(
-                SystemConfigModel.key == f"daily_report_{date_str}"
-            ).first()
-            
-            if not existing_report:
-                # 生成该日期的报告
-                report_data = await get_daily_exam_report(date_str, db)
-                
-                if report_data["has_data"]:
-                    # 保存报告到数据库
-                    report_record = SystemConfigModel(
-                        key=f"daily_report_{date_str}",
-                        value=json.dumps(report_data),
-                        description=f"{date_str}每日考试报告",
-                        config_type="json"
-                    )
-                    db.add(report_record)
-                    generated_reports.append(date_str)
-        
-        db.commit()
-        
+        generated_reports = daily_reports.generate_due(db)
         return {
             "success": True,
             "message": f"成功生成 {len(generated_reports)} 个每日报告",
@@ -694,4 +616,169 @@ async def generate_daily_reports(db: Session = Depends(get_db)):
         
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"生成每日报告失败: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"生成每日报告失败: {str(e)}")
+
+@router.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def list_slow_queries(limit: int = 50):
+    """查看慢查询日志（最近记录及按语句汇总）"""
+    return get_slow_queries(limit)
+
+@router.delete("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def reset_slow_queries():
+    """清空慢查询日志"""
+    clear_slow_queries()
+    return {"success": True, "message": "慢查询日志已清空"}
+
+@router.post("/admin/profiler/start", dependencies=[Depends(require_admin)])
+async def start_profiler(request: ProfilerStartRequest):
+    """开始按需性能剖析（持续指定秒数后自动停止）"""
+    session = profiler.start_profiling(
+        request.duration_seconds, request.sample_rate, request.route
+    )
+    return {"success": True, "message": "性能剖析已开始", "session": session.summary()}
+
+@router.post("/admin/profiler/stop", dependencies=[Depends(require_admin)])
+async def stop_profiler():
+    """提前停止性能剖析"""
+    session = profiler.stop_profiling()
+    if not session:
+        return {"success": False, "message": "当前没有进行中的性能剖析"}
+    return {"success": True, "message": "性能剖析已停止", "session": session.summary()}
+
+@router.get("/admin/profiler", dependencies=[Depends(require_admin)])
+async def get_profiler_status():
+    """查看性能剖析状态"""
+    session = profiler.current_session()
+    return {
+        "active": profiler.is_active(),
+        "session": session.summary() if session else None
+    }
+
+@router.get("/admin/profiler/stats", dependencies=[Depends(require_admin)])
+async def get_profiler_stats(
+    format: str = Query("text", description="输出格式：text(pstats文本), prof(pstats二进制), collapsed(火焰图折叠栈)"),
+    sort: str = Query("cumulative", description="text格式的排序字段"),
+    limit: int = Query(50, description="text格式输出的函数数量")
+):
+    """导出性能剖析结果"""
+    session = profiler.current_session()
+    if not session:
+        raise HTTPException(status_code=404, detail="还没有性能剖析数据")
+    
+    if format == "prof":
+        return Response(
+            content=profiler.render_prof(session),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": "attachment; filename=profile.prof"}
+        )
+    if format == "collapsed":
+        return PlainTextResponse(profiler.render_collapsed(session))
+    if format == "text":
+        try:
+            return PlainTextResponse(profiler.render_text(session, sort, limit))
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"不支持的排序字段: {sort}")
+    raise HTTPException(status_code=400, detail=f"不支持的输出格式: {format}")
+
+
+@router.get("/admin/startup", dependencies=[Depends(require_admin)])
+async def get_startup_timing():
+    """本进程的启动耗时分解"""
+    return startup.summary()
+
+
+@router.post("/admin/index-advisor/start", dependencies=[Depends(require_admin)])
+async def start_index_advisor():
+    """开始记录查询使用的列组合"""
+    index_advisor.start_recording()
+    return {"success": True, "message": "已开始记录查询列"}
+
+@router.post("/admin/index-advisor/stop", dependencies=[Depends(require_admin)])
+async def stop_index_advisor():
+    """停止记录（已记录的数据保留）"""
+    index_advisor.stop_recording()
+    return {"success": True, "message": "已停止记录查询列"}
+
+@router.delete("/admin/index-advisor", dependencies=[Depends(require_admin)])
+async def reset_index_advisor():
+    """清空已记录的查询列"""
+    index_advisor.reset()
+    return {"success": True, "message": "索引建议记录已清空"}
+
+@router.get("/admin/index-advisor", dependencies=[Depends(require_admin)])
+def get_index_advice(
+    min_count: int = Query(5, ge=1, description="列组合至少出现的次数"),
+    limit: int = Query(50, ge=1, le=500, description="返回的建议和列组合数量")
+):
+    """组合/覆盖索引建议、未使用及冗余的索引、无法使用索引的条件"""
+    return index_advisor.report(engine, min_count=min_count, limit=limit)
+
+@router.get("/admin/index-advisor/migration", dependencies=[Depends(require_admin)])
+def get_index_advice_migration(
+    min_count: int = Query(5, ge=1, description="列组合至少出现的次数"),
+    covering: bool = Query(False, description="生成包含查询列的覆盖索引")
+):
+    """按当前建议生成迁移脚本，保存到 app/migrations/versions/ 后执行 upgrade"""
+    filename, content = index_advisor.render_migration(engine, min_count=min_count, covering=covering)
+    return PlainTextResponse(content, headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+@router.get("/admin/archive", dependencies=[Depends(require_admin)])
+def get_archive_status(db: Session = Depends(get_db)):
+    """考试记录归档状态：归档文件、待归档月份、热表记录数"""
+    from .. import archive
+    return archive.status(db)
+
+@router.post("/admin/archive/run", dependencies=[Depends(require_admin)])
+def run_archive(db: Session = Depends(get_db)):
+    """把超过保留期的整月考试记录移入归档文件"""
+    from .. import archive
+    archived = archive.run_archive(db)
+    return {
+        "success": True,
+        "message": f"已归档 {sum(item['record_count'] for item in archived)} 条记录",
+        "archives": archived
+    }
+
+@router.post("/admin/archive/restore", dependencies=[Depends(require_admin)])
+def restore_archive(month: str = Query(..., pattern=r"^\d{4}-\d{2}$", description="YYYY-MM"), db: Session = Depends(get_db)):
+    """把某月的归档记录恢复到数据库"""
+    from .. import archive
+    restored = archive.restore_month(db, month)
+    return {"success": True, "message": f"已恢复 {restored} 条记录"}
+
+@router.get("/admin/llm-providers", dependencies=[Depends(require_admin)])
+async def get_llm_providers():
+    """各大模型接口的熔断状态和连续失败次数"""
+    from .. import llm_guard
+    return {"providers": llm_guard.status()}
+
+@router.get("/admin/llm-usage", dependencies=[Depends(require_admin)])
+def get_llm_usage(days: int = Query(7, ge=1, le=366, description="统计最近几天（含今天）"), db: Session = Depends(get_db)):
+    """大模型调用用量：次数、错误率、耗时分位数、token数、报告缓存命中率，按日和按接口/模型/用途汇总"""
+    return llm_usage.report(db, days=days)
+
+@router.get("/admin/ai-reports/backlog", dependencies=[Depends(require_admin)])
+def get_report_backlog(db: Session = Depends(get_db)):
+    """没有AI报告的记录数和积压处理进度"""
+    from .. import report_backlog
+    return report_backlog.status(db)
+
+@router.post("/admin/ai-reports/backlog", dependencies=[Depends(require_admin)])
+async def run_report_backlog(limit: Optional[int] = Query(None, ge=1, description="最多处理的记录数")):
+    """在后台为没有AI报告的记录合并生成报告，进度通过 GET 查看"""
+    from .. import report_backlog
+    if report_backlog.is_running():
+        raise HTTPException(status_code=409, detail="报告积压处理正在进行中")
+    background.spawn(report_backlog.run_backlog(limit=limit), kind="ai_report_backlog")
+    return {"success": True, "message": "已开始处理积压的AI报告"}
+
+@router.get("/admin/live-feed", dependencies=[Depends(require_admin_stream)])
+async def get_live_feed(last_event_id: Optional[str] = Header(None)):
+    """实时推送（Server-Sent Events）：新提交的考试记录、AI报告完成、今日滚动统计"""
+    return StreamingResponse(
+        live_feed.stream(last_event_id),
+        media_type="text/event-stream",
+        # 关闭代理缓冲，事件立即送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
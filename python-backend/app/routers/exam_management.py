@@ -2,14 +2,20 @@
 考试管理路由 - 创建、管理正式考试
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, JSONResponse
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func
 from typing import List, Optional
 from datetime import datetime, timedelta
 
 from ..database import get_db
 from ..models import Exam as ExamModel, ExamQuestion as ExamQuestionModel, Question as QuestionModel
+from ..exam_payloads import (
+    build_sales_payload, get_exam_payload, materialize_exam_payload,
+    invalidate_exam_payload, choose_encoding, etag_matches
+)
+from ..fast_json import FastJSONResponse
 from ..schemas import (
     ExamCreate, ExamUpdate, Exam, ExamWithQuestions, ExamList,
     Question, QuestionBank
@@ -21,9 +27,13 @@ router = APIRouter()
 async def get_exams(
     exam_type: Optional[str] = Query(None, description="考试类型：formal或practice"),
     status: Optional[str] = Query(None, description="考试状态：upcoming, active, expired"),
+    fast: bool = Query(False, description="快速模式，跳过模型校验直接序列化"),
     db: Session = Depends(get_db)
 ):
     """获取考试列表"""
+    if fast:
+        return _get_exams_fast(exam_type, status, db)
+    
     query = db.query(ExamModel)
     
     # 过滤考试类型
@@ -43,12 +53,7 @@ async def get_exams(
         ).count()
         
         # 判断考试状态
-        if now < exam.start_time:
-            exam_status = "upcoming"
-        elif now > exam.end_time:
-            exam_status = "expired"
-        else:
-            exam_status = "active"
+        exam_status = _exam_status(now, exam.start_time, exam.end_time)
         
         # 如果指定了状态过滤
         if status and exam_status != status:
@@ -70,6 +75,57 @@ async def get_exams(
     
     return result
 
+def _exam_status(now: datetime, start_time: datetime, end_time: datetime) -> str:
+    """判断考试状态"""
+    if now < start_time:
+        return "upcoming"
+    if now > end_time:
+        return "expired"
+    return "active"
+
+def _get_exams_fast(exam_type: Optional[str], status: Optional[str], db: Session):
+    """快速模式的考试列表：一次聚合查询统计题目数量并直接序列化"""
+    question_counts = db.query(
+        ExamQuestionModel.exam_id,
+        func.count(ExamQuestionModel.id).label("total_questions")
+    ).group_by(ExamQuestionModel.exam_id).subquery()
+    
+    query = db.query(
+        ExamModel.id,
+        ExamModel.exam_name,
+        ExamModel.description,
+        ExamModel.exam_type,
+        ExamModel.duration_minutes,
+        ExamModel.start_time,
+        ExamModel.end_time,
+        ExamModel.is_active,
+        func.coalesce(question_counts.c.total_questions, 0)
+    ).outerjoin(question_counts, question_counts.c.exam_id == ExamModel.id)
+    
+    if exam_type:
+        query = query.filter(ExamModel.exam_type == exam_type)
+    
+    now = datetime.now()
+    result = []
+    for row in query.order_by(ExamModel.created_at.desc()).all():
+        exam_status = _exam_status(now, row[5], row[6])
+        if status and exam_status != status:
+            continue
+        result.append({
+            "id": row[0],
+            "exam_name": row[1],
+            "description": row[2],
+            "exam_type": row[3],
+            "duration_minutes": row[4],
+            "start_time": row[5],
+            "end_time": row[6],
+            "is_active": row[7],
+            "total_questions": row[8],
+            "status": exam_status
+        })
+    
+    return FastJSONResponse(result)
+
 @router.get("/exams/{exam_id}", response_model=ExamWithQuestions)
 async def get_exam_detail(exam_id: int, db: Session = Depends(get_db)):
     """获取考试详情（包含题目）"""
@@ -120,25 +176,53 @@ async def get_exam_detail(exam_id: int, db: Session = Depends(get_db)):
         total_questions=len(questions)
     )
 
+def check_exam_window(start_time: datetime, end_time: datetime, is_active: bool):
+    """检查考试是否在可参加的时间范围内"""
+    now = datetime.now()
+    if now < start_time:
+        raise HTTPException(status_code=400, detail="考试尚未开始")
+    if now > end_time:
+        raise HTTPException(status_code=400, detail="考试已结束")
+    if not is_active:
+        raise HTTPException(status_code=400, detail="考试已关闭")
+
 @router.get("/exams/{exam_id}/questions", response_model=QuestionBank)
 async def get_exam_questions(
     exam_id: int, 
+    request: Request,
     sales: Optional[bool] = Query(False, description="销售模式，移除答案"),
     db: Session = Depends(get_db)
 ):
     """获取考试题目（适配前端考试页面格式）"""
+    # 销售模式下正式考试直接返回预生成的压缩数据
+    if sales:
+        payload = get_exam_payload(exam_id, db)
+        if payload is not None:
+            check_exam_window(payload.start_time, payload.end_time, payload.is_active)
+            
+            encoding = choose_encoding(request.headers.get("accept-encoding"))
+            headers = {"ETag": payload.etags[encoding], "Vary": "Accept-Encoding"}
+            if etag_matches(request.headers.get("if-none-match"), payload.etags[encoding]):
+                return Response(status_code=304, headers=headers)
+            
+            if encoding != "identity":
+                headers["Content-Encoding"] = encoding
+            return Response(
+                content=payload.bodies[encoding],
+                media_type="application/json",
+                headers=headers
+            )
+    
     exam = db.query(ExamModel).filter(ExamModel.id == exam_id).first()
     if not exam:
         raise HTTPException(status_code=404, detail="考试不存在")
     
     # 检查考试时间
-    now = datetime.now()
-    if now < exam.start_time:
-        raise HTTPException(status_code=400, detail="考试尚未开始")
-    if now > exam.end_time:
-        raise HTTPException(status_code=400, detail="考试已结束")
-    if not exam.is_active:
-        raise HTTPException(status_code=400, detail="考试已关闭")
+    check_exam_window(exam.start_time, exam.end_time, exam.is_active)
+    
+    # 非正式考试的销售模式按需生成（不缓存）
+    if sales:
+        return JSONResponse(build_sales_payload(exam, db))
     
     # 获取考试题目
     exam_questions = db.query(ExamQuestionModel).options(
@@ -219,6 +303,9 @@ async def create_exam(exam_data: ExamCreate, db: Session = Depends(get_db)):
     
     db.commit()
     
+    # 预生成销售模式题目数据
+    materialize_exam_payload(exam, db)
+    
     return exam
 
 @router.put("/exams/{exam_id}", response_model=Exam)
@@ -264,6 +351,9 @@ async def update_exam(
     db.commit()
     db.refresh(exam)
     
+    # 重新生成销售模式题目数据
+    materialize_exam_payload(exam, db)
+    
     return exam
 
 @router.delete("/exams/{exam_id}")
@@ -281,6 +371,7 @@ async def delete_exam(exam_id: int, db: Session = Depends(get_db)):
     # 删除考试
     db.delete(exam)
     db.commit()
+    invalidate_exam_payload(exam_id)
     
     return {"message": "考试删除成功"}
 
@@ -293,5 +384,7 @@ async def toggle_exam_status(exam_id: int, db: Session = Depends(get_db)):
     
     exam.is_active = not exam.is_active
     db.commit()
+    db.refresh(exam)
+    materialize_exam_payload(exam, db)
     
     return {"message": f"考试已{'启用' if exam.is_active else '禁用'}", "is_active": exam.is_active}
\ No newline at end of file
@@ -0,0 +1,234 @@
+"""
+考试会话路由 - 开始考试、自动保存作答（心跳）、交卷，截止时间和判分由服务端负责
+"""
+
+import asyncio
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..database import get_db
+from ..models import (
+    Exam as ExamModel, ExamQuestion as ExamQuestionModel, ExamRecord as ExamRecordModel,
+    ExamSession, Question as QuestionModel, SystemConfig
+)
+from ..schemas import ExamSessionStart, ExamSessionAnswers, ExamSessionSubmit
+from ..daily_reports import load_daily_exam_config
+from .. import background, exam_sessions
+from .exam_management import check_exam_window
+
+router = APIRouter()
+
+
+def _current_team_and_bank(db: Session):
+    rows = dict(db.query(SystemConfig.key, SystemConfig.value).filter(
+        SystemConfig.key.in_(["current_team_id", "current_bank_id"])
+    ).all())
+    return int(rows.get("current_team_id") or 1), int(rows.get("current_bank_id") or 1)
+
+
+def _question_dict(question: Optional[QuestionModel], question_id: int, with_answer: bool) -> dict:
+    if question is None:
+        # 考试期间题目被删除，保留位置使题目序号与作答对应
+        return {"id": question_id, "category": "", "type": "single", "question": "（题目已删除）",
+                "optionA": "", "optionB": "", "optionC": None, "optionD": None, "questionId": question_id}
+    data = {
+        "id": question.id,
+        "category": question.category,
+        "type": question.question_type,
+        "question": question.question,
+        "optionA": question.option_a,
+        "optionB": question.option_b,
+        "optionC": question.option_c,
+        "optionD": question.option_d,
+        "questionId": question.question_id or question.id
+    }
+    # 交卷前不返回答案和解析
+    if with_answer:
+        data["answer"] = question.answer
+        data["explanation"] = question.explanation or ""
+    return data
+
+
+def _questions(db: Session, session: ExamSession, with_answer: bool) -> List[dict]:
+    questions = exam_sessions.load_questions(db, session.question_ids)
+    return [
+        _question_dict(question, question_id, with_answer)
+        for question, question_id in zip(questions, session.question_ids)
+    ]
+
+
+def _session_response(db: Session, session: ExamSession, resumed: bool = False) -> dict:
+    answers, version = exam_sessions.current_answers(session)
+    active = session.status == "active"
+    now = datetime.now()
+    return {
+        "session_id": session.id,
+        "exam_id": session.exam_id,
+        "exam_type": session.exam_type,
+        "status": session.status,
+        "resumed": resumed,
+        "started_at": session.started_at.isoformat(),
+        "deadline": session.deadline.isoformat(),
+        "server_time": now.isoformat(),
+        "remaining_seconds": max(0, int((session.deadline - now).total_seconds())) if active else 0,
+        "questions": _questions(db, session, with_answer=not active),
+        "answers": answers,
+        "version": version,
+        "record_id": session.record_id
+    }
+
+
+def _get_session(db: Session, session_id: str) -> ExamSession:
+    session = db.query(ExamSession).filter(ExamSession.id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="考试会话不存在")
+    return session
+
+
+@router.post("/exam-sessions")
+async def start_exam_session(request: ExamSessionStart, db: Session = Depends(get_db)):
+    """开始考试：指定 exam_id 为正式考试，否则为每日测验；提供 user_id 时恢复未交卷的会话"""
+    now = datetime.now()
+    exam = None
+    if request.exam_id is not None:
+        exam = db.query(ExamModel).filter(ExamModel.id == request.exam_id).first()
+        if not exam:
+            raise HTTPException(status_code=404, detail="考试不存在")
+        check_exam_window(exam.start_time, exam.end_time, exam.is_active)
+        exam_type = "formal_exam" if exam.exam_type == "formal" else "practice"
+    else:
+        exam_type = "daily_exam"
+
+    if request.user_id:
+        existing = db.query(ExamSession).filter(
+            ExamSession.user_id == request.user_id,
+            ExamSession.status == "active",
+            ExamSession.exam_type == exam_type,
+            ExamSession.exam_id.is_(None) if exam is None else ExamSession.exam_id == exam.id,
+            ExamSession.deadline > now - exam_sessions.grace()
+        ).first()
+        if existing:
+            exam_sessions.remember(existing)
+            return _session_response(db, existing, resumed=True)
+
+    team_id, bank_id = _current_team_and_bank(db)
+    if exam is not None:
+        question_ids = [question_id for (question_id,) in db.query(ExamQuestionModel.question_id).filter(
+            ExamQuestionModel.exam_id == exam.id
+        ).order_by(ExamQuestionModel.order_index).all()]
+        # 考试时长与考试结束时间取较早者
+        deadline = min(now + timedelta(minutes=exam.duration_minutes or 20), exam.end_time)
+    else:
+        config = load_daily_exam_config(db)
+        start_time, end_time = config["daily_exam_start_time"], config["daily_exam_end_time"]
+        if not start_time <= now.strftime("%H:%M") <= end_time:
+            raise HTTPException(
+                status_code=400,
+                detail=f"每日测验时间为 {start_time} - {end_time}，请在开放时间内参加测验"
+            )
+        bank_question_ids = [question_id for (question_id,) in db.query(QuestionModel.id).filter(
+            QuestionModel.bank_id == bank_id
+        ).all()]
+        count = int(config["daily_exam_question_count"] or 3)
+        question_ids = random.sample(bank_question_ids, min(count, len(bank_question_ids)))
+        # 结束时间所在的整分钟内仍可作答（与页面的时间判断一致）
+        closes_at = datetime.combine(now.date(), datetime.strptime(end_time, "%H:%M").time()) + timedelta(minutes=1)
+        deadline = min(now + timedelta(minutes=int(config["daily_exam_duration_minutes"] or 10)), closes_at)
+    if not question_ids:
+        raise HTTPException(status_code=400, detail="没有可用的考试题目")
+
+    session = ExamSession(
+        id=uuid.uuid4().hex,
+        exam_id=exam.id if exam is not None else None,
+        exam_type=exam_type,
+        user_name=request.user_name,
+        user_id=request.user_id,
+        department=request.department,
+        region=request.region,
+        team_id=team_id,
+        bank_id=bank_id,
+        question_ids=question_ids,
+        answers={},
+        answers_version=0,
+        started_at=now,
+        deadline=deadline,
+        status="active"
+    )
+    db.add(session)
+    db.commit()
+    exam_sessions.remember(session)
+    return _session_response(db, session)
+
+
+@router.get("/exam-sessions/{session_id}")
+async def get_exam_session(session_id: str, db: Session = Depends(get_db)):
+    """获取考试会话（刷新页面后恢复作答和剩余时间）"""
+    session = _get_session(db, session_id)
+    if session.status == "active":
+        exam_sessions.remember(session)
+    return _session_response(db, session)
+
+
+@router.put("/exam-sessions/{session_id}/answers")
+async def save_exam_session_answers(
+    session_id: str,
+    request: ExamSessionAnswers,
+    db: Session = Depends(get_db)
+):
+    """自动保存作答（心跳）：先合并在内存中，由后台任务批量写入数据库"""
+    try:
+        result = exam_sessions.save_answers(db, session_id, request.answers, request.version)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **result}
+
+
+@router.post("/exam-sessions/{session_id}/submit")
+async def submit_exam_session(
+    session_id: str,
+    request: Optional[ExamSessionSubmit] = None,
+    db: Session = Depends(get_db)
+):
+    """交卷：服务端判分并保存考试记录，重复提交返回同一结果"""
+    session = _get_session(db, session_id)
+    answers = request.answers if request else None
+    if session.status == "active":
+        delay = exam_sessions.settle_delay(session, answers)
+        if delay:
+            # 按已保存的作答判分：先写入本进程的保存，再等待其他进程写入
+            await asyncio.to_thread(exam_sessions.flush)
+            await asyncio.sleep(delay)
+            db.refresh(session)
+    if session.status == "active":
+        try:
+            record = exam_sessions.submit(db, session, answers)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if record is not None:
+            # 异步生成AI报告（不阻塞响应）
+            from ..ai_report import generate_auto_report_async
+            background.spawn(generate_auto_report_async(record.id), kind="ai_report")
+        session = _get_session(db, session_id)
+
+    record = db.query(ExamRecordModel).filter(ExamRecordModel.id == session.record_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="考试记录不存在")
+    return {
+        "success": True,
+        "session_id": session.id,
+        "record_id": record.id,
+        "status": session.status,
+        "score": record.score,
+        "correct_count": record.correct_count,
+        "total_questions": record.total_questions,
+        "duration": record.duration,
+        "answers": record.detailed_answers or {},
+        "questions": _questions(db, session, with_answer=True)
+    }
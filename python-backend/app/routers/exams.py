@@ -1,226 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import json
-import httpx
 from datetime import datetime, timedelta
 
 from ..database import get_db
-from ..models import ExamRecord as ExamRecordModel, SystemConfig as SystemConfigModel
-from ..schemas import ExamRecord, ExamRecordCreate, AIReportRequest, AIReportResponse
 from ..config import settings
+from ..models import ExamRecord as ExamRecordModel
+from ..schemas import ExamRecord, ExamRecordCreate, AIReportRequest, AIReportResponse
+from ..fast_json import rows_response
+from .. import background, live_feed
 
 router = APIRouter()
 
-async def _generate_auto_report(exam_record: ExamRecordModel, db: Session):
-    """自动生成AI报告的内部函数"""
-    try:
-        # 获取API配置
-        api_config_record = db.query(SystemConfigModel).filter(
-            SystemConfigModel.key == "api_config"
-        ).first()
-        
-        api_config = None
-        if api_config_record and api_config_record.value:
-            try:
-                api_config = json.loads(api_config_record.value)
-            except:
-                pass
-        
-        # 如果数据库没有配置，使用环境变量
-        if not api_config or not api_config.get('key'):
-            env_api_key = getattr(settings, 'qwen_api_key', '')
-            if not env_api_key:
-                return  # 没有API密钥就跳过
-                
-            api_config = {
-                "provider": "qwen",
-                "url": getattr(settings, 'qwen_api_url', 'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation'),
-                "model": getattr(settings, 'qwen_model', 'qwen-turbo'),
-                "key": env_api_key
-            }
-        
-        # 获取题目信息进行专业解析
-        # 优先使用传递的题目数据，如果没有则使用旧方法
-        question_analysis = []
-        
-        # 检查是否有完整的题目数据
-        if hasattr(exam_record, 'questions_data') and exam_record.questions_data:
-            # 使用前端传递的完整题目数据
-            try:
-                questions_data = exam_record.questions_data
-                if isinstance(questions_data, str):
-                    questions_data = json.loads(questions_data)
-                
-                for i, q_data in enumerate(questions_data):
-                    question_analysis.append({
-                        "question": q_data.get("question", ""),
-                        "category": q_data.get("category", ""),
-                        "type": q_data.get("question_type", "single"),
-                        "correct_answer": q_data.get("correct_answer", ""),
-                        "user_answer": q_data.get("user_answer", ""),
-                        "is_correct": q_data.get("is_correct", False),
-                        "explanation": q_data.get("explanation", "")
-                    })
-            except Exception as e:
-                print(f"解析题目数据失败: {e}")
-                # 如果解析失败，使用旧方法
-                question_analysis = []
-        
-        # 如果没有题目数据，使用旧方法（保持兼容性）
-        if not question_analysis:
-            from ..models import Question as QuestionModel
-            detailed_answers = json.loads(exam_record.detailed_answers) if isinstance(exam_record.detailed_answers, str) else exam_record.detailed_answers
-            
-            if detailed_answers:
-                question_ids = list(detailed_answers.keys())
-                questions = db.query(QuestionModel).limit(len(question_ids)).all()
-                
-                for i, (q_key, user_answer) in enumerate(detailed_answers.items()):
-                    if i < len(questions):
-                        q = questions[i]
-                        is_correct = user_answer.upper().strip() == q.answer.upper().strip()
-                        question_analysis.append({
-                            "question": q.question,
-                            "category": q.category,
-                            "type": q.question_type,
-                            "correct_answer": q.answer,
-                            "user_answer": user_answer,
-                            "is_correct": is_correct,
-                            "explanation": q.explanation or ""
-                        })
-        
-        # 准备AI分析数据
-        prompt = f"""
-基于以下测验结果，请为医药代表生成一份简洁的专业评价报告：
-
-**测验信息：**
-- 姓名：{exam_record.user_name}
-- 得分：{exam_record.score}分（满分100分）
-- 正确率：{exam_record.correct_count}/{exam_record.total_questions} = {round(exam_record.correct_count/exam_record.total_questions*100, 1)}%
-- 用时：{exam_record.duration // 60}分{exam_record.duration % 60}秒
-
-**题目解析：**
-{json.dumps(question_analysis, ensure_ascii=False, indent=2)}
-
-请提供：
-1. **简要表现评价**（2-3句话）
-2. **错题专业解析**（针对每道错题，简述知识点和正确理解）
-3. **改进建议**（2-3条具体建议）
-4. **学习重点**（推荐重点学习的知识模块）
-
-要求：
-- 内容简洁实用，总字数控制在500字以内
-- 专业术语准确，重点突出实用性
-- 针对医药代表工作需要提供指导
-        """
-        
-        # 调用AI API
-        provider = api_config.get('provider', 'qwen')
-        url = api_config['url']
-        
-        # 判断是否使用OpenAI兼容格式
-        is_openai_compatible = 'compatible-mode' in url or 'chat/completions' in url or provider != 'qwen'
-        
-        headers = {
-            "Authorization": f"Bearer {api_config['key']}",
-            "Content-Type": "application/json"
-        }
-        
-        if is_openai_compatible:
-            # OpenAI兼容格式
-            payload = {
-                "model": api_config['model'],
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 1000,  # 减少token限制以保持简洁
-                "temperature": 0.3   # 降低温度以提高准确性
-            }
-        else:
-            # 原生Qwen格式
-            payload = {
-                "model": api_config['model'],
-                "input": {
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ]
-                },
-                "parameters": {
-                    "max_tokens": 1000,
-                    "temperature": 0.3
-                }
-            }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=payload,
-                timeout=30.0
-            )
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            # 根据不同格式解析响应
-            if is_openai_compatible:
-                # OpenAI兼容格式
-                if 'choices' in result and len(result['choices']) > 0:
-                    ai_report = result['choices'][0]['message']['content']
-                else:
-                    return  # 解析失败就跳过
-            else:
-                # 原生Qwen格式
-                if 'output' in result and 'text' in result['output']:
-                    ai_report = result['output']['text']
-                else:
-                    return  # 解析失败就跳过
-            
-            # 保存AI报告到数据库
-            exam_record.ai_report = ai_report
-            db.commit()
-            
-    except Exception as e:
-        # 自动生成失败不影响主流程，只记录错误但不抛出异常
-        print(f"自动生成AI报告失败: {str(e)}")
-        pass
-
-async def _generate_auto_report_async(record_id: str, old_db: Session):
-    """异步生成AI报告，不阻塞主请求"""
-    try:
-        # 创建新的数据库会话
-        from ..database import SessionLocal
-        db = SessionLocal()
-        
-        try:
-            # 重新获取记录
-            exam_record = db.query(ExamRecordModel).filter(
-                ExamRecordModel.id == record_id
-            ).first()
-            
-            if not exam_record or exam_record.ai_report:
-                return  # 记录不存在或已有报告就跳过
-                
-            # 调用原有的生成逻辑
-            await _generate_auto_report(exam_record, db)
-            
-        finally:
-            db.close()
-        
-    except Exception as e:
-        print(f"异步生成AI报告失败: {str(e)}")
-        pass
+# 快速模式下的输出字段（与 ExamRecord 模式的别名保持一致）
+_FAST_RECORD_COLUMNS = (
+    ("userName", ExamRecordModel.user_name),
+    ("user_id", ExamRecordModel.user_id),
+    ("department", ExamRecordModel.department),
+    ("region", ExamRecordModel.region),
+    ("score", ExamRecordModel.score),
+    ("correctCount", ExamRecordModel.correct_count),
+    ("totalQuestions", ExamRecordModel.total_questions),
+    ("duration", ExamRecordModel.duration),
+    ("exam_type", ExamRecordModel.exam_type),
+    ("week_number", ExamRecordModel.week_number),
+    ("year", ExamRecordModel.year),
+    ("detailed_answers", ExamRecordModel.detailed_answers),
+    ("ai_report", ExamRecordModel.ai_report),
+    ("id", ExamRecordModel.id),
+    ("created_at", ExamRecordModel.created_at),
+)
 
 @router.get("/exam-records", response_model=List[ExamRecord])
 async def get_exam_records(
     user_name: Optional[str] = None,
     department: Optional[str] = None,
     limit: Optional[int] = 100,
+    fast: bool = Query(False, description="快速模式，跳过模型校验直接序列化"),
     db: Session = Depends(get_db)
 ):
     """获取考试记录列表"""
-    query = db.query(ExamRecordModel)
+    if fast:
+        query = db.query(*[column for _, column in _FAST_RECORD_COLUMNS])
+    else:
+        query = db.query(ExamRecordModel)
     
     if user_name:
         query = query.filter(ExamRecordModel.user_name.contains(user_name))
@@ -234,6 +58,9 @@ async def get_exam_records(
     if limit:
         query = query.limit(limit)
     
+    if fast:
+        return rows_response([key for key, _ in _FAST_RECORD_COLUMNS], query.all())
+    
     return query.all()
 
 @router.post("/exam-records", response_model=dict)
@@ -258,8 +85,8 @@ async def save_exam_record(
             
             # 如果没有AI报告，异步生成（不阻塞响应）
             if not existing.ai_report:
-                import asyncio
-                asyncio.create_task(_generate_auto_report_async(existing.id, db))
+                from ..ai_report import generate_auto_report_async
+                background.spawn(generate_auto_report_async(existing.id), kind="ai_report")
             
             return {
                 "success": True,
@@ -286,10 +113,11 @@ async def save_exam_record(
             db.add(db_record)
             db.commit()
             db.refresh(db_record)
+            live_feed.exam_submitted(live_feed.record_summary(db_record))
             
             # 异步生成AI报告（不阻塞响应）
-            import asyncio
-            asyncio.create_task(_generate_auto_report_async(db_record.id, db))
+            from ..ai_report import generate_auto_report_async
+            background.spawn(generate_auto_report_async(db_record.id), kind="ai_report")
             
             return {
                 "success": True,
@@ -313,7 +141,11 @@ async def get_exam_record(
     ).first()
     
     if not record:
-        raise HTTPException(status_code=404, detail="考试记录不存在")
+        # 超过保留期的记录已移入归档文件
+        from ..archive import read_archived_record
+        record = read_archived_record(db, record_id)
+        if not record:
+            raise HTTPException(status_code=404, detail="考试记录不存在")
     
     return record
 
@@ -341,6 +173,8 @@ async def generate_ai_report(
     db: Session = Depends(get_db)
 ):
     """生成AI分析报告"""
+    from .. import ai_report
+    
     try:
         # 获取考试记录
         exam_record = db.query(ExamRecordModel).filter(
@@ -350,165 +184,34 @@ async def generate_ai_report(
         if not exam_record:
             raise HTTPException(status_code=404, detail="考试记录不存在")
         
-        # 获取API配置
-        api_config_record = db.query(SystemConfigModel).filter(
-            SystemConfigModel.key == "api_config"
-        ).first()
-        
-        api_config = None
-        if api_config_record and api_config_record.value:
-            try:
-                api_config = json.loads(api_config_record.value)
-            except:
-                pass
-        
-        # 如果数据库没有配置，使用环境变量
-        if not api_config or not api_config.get('key'):
-            env_api_key = getattr(settings, 'qwen_api_key', '')
-            if not env_api_key:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="未配置API密钥，请先在系统配置中设置"
-                )
-            api_config = {
-                "provider": "qwen",
-                "url": getattr(settings, 'qwen_api_url', 'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation'),
-                "model": getattr(settings, 'qwen_model', 'qwen-turbo'),
-                "key": env_api_key
-            }
-        
-        # 获取具体题目信息进行专业解析
-        from ..models import Question as QuestionModel
-        detailed_answers = json.loads(exam_record.detailed_answers) if isinstance(exam_record.detailed_answers, str) else exam_record.detailed_answers
-        
-        # 获取题目信息
-        question_analysis = []
-        if detailed_answers:
-            question_ids = list(detailed_answers.keys())
-            # 简化版本：假设题目ID对应数据库中的顺序
-            questions = db.query(QuestionModel).limit(len(question_ids)).all()
-            
-            for i, (q_key, user_answer) in enumerate(detailed_answers.items()):
-                if i < len(questions):
-                    q = questions[i]
-                    is_correct = user_answer.upper().strip() == q.answer.upper().strip()
-                    question_analysis.append({
-                        "question": q.question,
-                        "category": q.category,
-                        "type": q.question_type,
-                        "correct_answer": q.answer,
-                        "user_answer": user_answer,
-                        "is_correct": is_correct,
-                        "explanation": q.explanation or ""
-                    })
-        
-        # 准备AI分析数据
-        exam_data = request.exam_data
-        prompt = f"""
-基于以下测验结果，请为医药代表生成一份简洁的专业评价报告：
-
-**测验信息：**
-- 姓名：{exam_record.user_name}
-- 得分：{exam_record.score}分（满分100分）
-- 正确率：{exam_record.correct_count}/{exam_record.total_questions} = {round(exam_record.correct_count/exam_record.total_questions*100, 1)}%
-- 用时：{exam_record.duration // 60}分{exam_record.duration % 60}秒
-
-**题目解析：**
-{json.dumps(question_analysis, ensure_ascii=False, indent=2)}
-
-请提供：
-1. **简要表现评价**（2-3句话）
-2. **错题专业解析**（针对每道错题，简述知识点和正确理解）
-3. **改进建议**（2-3条具体建议）
-4. **学习重点**（推荐重点学习的知识模块）
-
-要求：
-- 内容简洁实用，总字数控制在500字以内
-- 专业术语准确，重点突出实用性
-- 针对医药代表工作需要提供指导
-        """
-        
-        # 调用AI API
-        provider = api_config.get('provider', 'qwen')
-        url = api_config['url']
-        
-        # 判断是否使用OpenAI兼容格式
-        is_openai_compatible = 'compatible-mode' in url or 'chat/completions' in url or provider != 'qwen'
+        api_config = ai_report.load_api_config(db)
+        if not api_config:
+            raise HTTPException(
+                status_code=400, 
+                detail="未配置API密钥，请先在系统配置中设置"
+            )
         
-        headers = {
-            "Authorization": f"Bearer {api_config['key']}",
-            "Content-Type": "application/json"
-        }
+        prompt = ai_report.build_prompt(exam_record, ai_report.question_analysis(exam_record, db))
+        usage = ai_report.TokenUsage()
+        report = await ai_report.request_report(api_config, prompt, max_tokens=2000, temperature=0.7,
+                                                 usage=usage, purpose="legacy")
         
-        if is_openai_compatible:
-            # OpenAI兼容格式
-            payload = {
-                "model": api_config['model'],
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": 2000,
-                "temperature": 0.7
-            }
-        else:
-            # 原生Qwen格式
-            payload = {
-                "model": api_config['model'],
-                "input": {
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ]
-                },
-                "parameters": {
-                    "max_tokens": 2000,
-                    "temperature": 0.7
-                }
-            }
+        # 保存AI报告到数据库
+        exam_record.ai_report = report
+        exam_record.ai_report_prompt_tokens = usage.prompt_tokens
+        exam_record.ai_report_completion_tokens = usage.completion_tokens
+        db.commit()
+        live_feed.ai_report_ready(request.exam_record_id)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                url,
-                headers=headers,
-                json=payload,
-                timeout=30.0
-            )
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            # 根据不同格式解析响应
-            if is_openai_compatible:
-                # OpenAI兼容格式
-                if 'choices' in result and len(result['choices']) > 0:
-                    ai_report = result['choices'][0]['message']['content']
-                else:
-                    raise ValueError("OpenAI兼容API响应格式异常")
-            else:
-                # 原生Qwen格式
-                if 'output' in result and 'text' in result['output']:
-                    ai_report = result['output']['text']
-                else:
-                    raise ValueError("通义千问API响应格式异常")
-            
-            # 保存AI报告到数据库
-            exam_record.ai_report = ai_report
-            db.commit()
-            
-            return AIReportResponse(
-                success=True,
-                report=ai_report
-            )
-        else:
-            error_detail = f"API调用失败: {response.status_code} - {response.text}"
-            return AIReportResponse(
-                success=False,
-                error=error_detail
-            )
+        return AIReportResponse(
+            success=True,
+            report=report
+        )
             
-    except httpx.TimeoutException:
+    except ai_report.AIReportError as e:
         return AIReportResponse(
             success=False,
-            error="API调用超时，请稍后重试"
+            error=str(e)
         )
     except Exception as e:
         return AIReportResponse(
@@ -516,6 +219,39 @@ async def generate_ai_report(
             error=f"生成报告失败: {str(e)}"
         )
 
+@router.get("/exam-records/{record_id}/ai-report/stream")
+async def stream_ai_report(
+    record_id: str,
+    regenerate: bool = Query(False, description="已有报告时重新生成"),
+    db: Session = Depends(get_db)
+):
+    """流式生成AI分析报告（Server-Sent Events）：delta 事件推送新增文本，done 事件表示报告已保存。
+    该记录正在生成报告（如提交后的自动生成）时读取同一个生成，不会重复调用大模型"""
+    from .. import ai_report
+    
+    stream = ai_report.inflight_report(record_id)
+    if stream is None:
+        exam_record = db.query(ExamRecordModel.ai_report).filter(
+            ExamRecordModel.id == record_id
+        ).first()
+        if not exam_record:
+            raise HTTPException(status_code=404, detail="考试记录不存在")
+        
+        if exam_record.ai_report and not regenerate:
+            events = ai_report.stored_report_events(record_id, exam_record.ai_report)
+        else:
+            if not ai_report.load_api_config(db):
+                raise HTTPException(status_code=400, detail="未配置API密钥，请先在系统配置中设置")
+            stream = ai_report.start_report(record_id, max_tokens=2000, temperature=0.7, use_cache=not regenerate)
+    
+    if stream is not None:
+        events = ai_report.report_events(stream)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/exam-analytics")
 async def get_exam_analytics(
     days: int = 30,
@@ -538,7 +274,34 @@ async def get_exam_analytics(
     
     records = query.all()
     
-    if not records:
+    # 按部门、日期汇总：[考试次数, 总分, 高分人数, 低分人数]
+    dept_stats = {}
+    daily_stats = {}
+    for record in records:
+        dept = record.department or "未分组"
+        date_key = record.created_at.strftime("%Y-%m-%d")
+        high, low = record.score >= 80, record.score < 60
+        for stats, key in ((dept_stats, dept), (daily_stats, date_key)):
+            item = stats.setdefault(key, [0, 0, 0, 0])
+            item[0] += 1
+            item[1] += record.score
+            item[2] += high
+            item[3] += low
+    
+    # 时间范围超出保留期时合并已归档记录的按日汇总
+    if start_date < datetime.now() - timedelta(days=settings.archive_after_days):
+        from ..archive import rollup_totals
+        for rollup in rollup_totals(db, start_date.date(), end_date.date(), department):
+            dept = rollup.department or "未分组"
+            date_key = rollup.day.strftime("%Y-%m-%d")
+            for stats, key in ((dept_stats, dept), (daily_stats, date_key)):
+                item = stats.setdefault(key, [0, 0, 0, 0])
+                item[0] += rollup.exam_count
+                item[1] += rollup.score_sum
+                item[2] += rollup.high_count
+                item[3] += rollup.low_count
+    
+    if not dept_stats:
         return {
             "total_exams": 0,
             "avg_score": 0,
@@ -549,43 +312,27 @@ async def get_exam_analytics(
         }
     
     # 基础统计
-    total_exams = len(records)
-    avg_score = sum(r.score for r in records) / total_exams
-    high_performers = len([r for r in records if r.score >= 80])
-    low_performers = len([r for r in records if r.score < 60])
-    
-    # 部门统计
-    dept_stats = {}
-    for record in records:
-        dept = record.department or "未分组"
-        if dept not in dept_stats:
-            dept_stats[dept] = []
-        dept_stats[dept].append(record.score)
+    total_exams = sum(item[0] for item in dept_stats.values())
+    avg_score = sum(item[1] for item in dept_stats.values()) / total_exams
+    high_performers = sum(item[2] for item in dept_stats.values())
+    low_performers = sum(item[3] for item in dept_stats.values())
     
     department_stats = []
-    for dept, scores in dept_stats.items():
+    for dept, (count, score_sum, high, low) in dept_stats.items():
         department_stats.append({
             "department": dept,
-            "exam_count": len(scores),
-            "avg_score": sum(scores) / len(scores),
-            "high_performers": len([s for s in scores if s >= 80]),
-            "low_performers": len([s for s in scores if s < 60])
+            "exam_count": count,
+            "avg_score": score_sum / count,
+            "high_performers": high,
+            "low_performers": low
         })
     
-    # 按日期统计
-    daily_stats = {}
-    for record in records:
-        date_key = record.created_at.strftime("%Y-%m-%d")
-        if date_key not in daily_stats:
-            daily_stats[date_key] = []
-        daily_stats[date_key].append(record.score)
-    
     daily_list = []
-    for date, scores in sorted(daily_stats.items()):
+    for date, (count, score_sum, _, _) in sorted(daily_stats.items()):
         daily_list.append({
             "date": date,
-            "exam_count": len(scores),
-            "avg_score": sum(scores) / len(scores)
+            "exam_count": count,
+            "avg_score": score_sum / count
         })
     
     return {
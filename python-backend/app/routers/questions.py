@@ -8,9 +8,29 @@ from datetime import datetime
 from ..database import get_db
 from ..models import Question as QuestionModel
 from ..schemas import Question, QuestionCreate, QuestionBank, QuestionBase
+from ..exam_payloads import invalidate_all_payloads
+from ..fast_json import rows_response
 
 router = APIRouter()
 
+# 快速模式下的输出字段（与 Question 模式的别名保持一致）
+_FAST_QUESTION_COLUMNS = (
+    ("bank_id", QuestionModel.bank_id),
+    ("category", QuestionModel.category),
+    ("type", QuestionModel.question_type),
+    ("question", QuestionModel.question),
+    ("optionA", QuestionModel.option_a),
+    ("optionB", QuestionModel.option_b),
+    ("optionC", QuestionModel.option_c),
+    ("optionD", QuestionModel.option_d),
+    ("answer", QuestionModel.answer),
+    ("explanation", QuestionModel.explanation),
+    ("questionId", QuestionModel.question_id),
+    ("id", QuestionModel.id),
+    ("created_at", QuestionModel.created_at),
+    ("updated_at", QuestionModel.updated_at),
+)
+
 @router.get("/questions", response_model=List[Question])
 async def get_questions(
     bank_id: Optional[int] = Query(None, description="题库ID筛选"),
@@ -18,12 +38,16 @@ async def get_questions(
     question_type: Optional[str] = Query(None, description="题目类型筛选"),
     limit: Optional[int] = Query(None, description="返回数量限制"),
     random_sample: bool = Query(False, description="是否随机抽取"),
+    fast: bool = Query(False, description="快速模式，跳过模型校验直接序列化"),
     db: Session = Depends(get_db)
 ):
     """获取题库列表"""
     from ..models import SystemConfig
     
-    query = db.query(QuestionModel)
+    if fast:
+        query = db.query(*[column for _, column in _FAST_QUESTION_COLUMNS])
+    else:
+        query = db.query(QuestionModel)
     
     # 如果没有指定题库ID，使用当前活动题库
     if bank_id is None:
@@ -39,12 +63,16 @@ async def get_questions(
     if question_type:
         query = query.filter(QuestionModel.question_type == question_type)
     
+    if limit and not random_sample:
+        query = query.limit(limit)
+    
     questions = query.all()
     
     if random_sample and limit:
         questions = random.sample(questions, min(limit, len(questions)))
-    elif limit:
-        questions = questions[:limit]
+    
+    if fast:
+        return rows_response([key for key, _ in _FAST_QUESTION_COLUMNS], questions)
     
     return questions
 
@@ -143,6 +171,7 @@ async def update_question(
     
     db.commit()
     db.refresh(db_question)
+    invalidate_all_payloads()
     
     return db_question
 
@@ -159,6 +188,7 @@ async def delete_question(
     
     db.delete(db_question)
     db.commit()
+    invalidate_all_payloads()
     
     return {"message": "题目删除成功"}
 
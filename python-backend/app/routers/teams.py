@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from typing import List, Optional
@@ -6,6 +6,7 @@ from datetime import datetime
 
 from ..database import get_db
 from ..models import ProductTeam, QuestionBank, Question, ExamRecord
+from ..fast_json import rows_response
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api", tags=["teams"])
@@ -38,10 +39,58 @@ class TeamWithStats(TeamResponse):
     exams_count: int
 
 # 团队管理接口
+def _get_teams_fast(db: Session):
+    """快速模式的团队列表：用分组聚合一次性统计，直接序列化列元组"""
+    banks = db.query(
+        QuestionBank.team_id,
+        func.count(QuestionBank.id).label("banks_count")
+    ).filter(QuestionBank.is_active == True).group_by(QuestionBank.team_id).subquery()
+    
+    questions = db.query(
+        QuestionBank.team_id,
+        func.count(Question.id).label("questions_count")
+    ).join(Question, Question.bank_id == QuestionBank.id).filter(
+        QuestionBank.is_active == True
+    ).group_by(QuestionBank.team_id).subquery()
+    
+    exams = db.query(
+        ExamRecord.team_id,
+        func.count(ExamRecord.id).label("exams_count")
+    ).group_by(ExamRecord.team_id).subquery()
+    
+    rows = db.query(
+        ProductTeam.name,
+        ProductTeam.code,
+        ProductTeam.description,
+        ProductTeam.is_active,
+        ProductTeam.id,
+        ProductTeam.created_at,
+        ProductTeam.updated_at,
+        func.coalesce(banks.c.banks_count, 0),
+        func.coalesce(questions.c.questions_count, 0),
+        func.coalesce(exams.c.exams_count, 0)
+    ).outerjoin(banks, banks.c.team_id == ProductTeam.id).outerjoin(
+        questions, questions.c.team_id == ProductTeam.id
+    ).outerjoin(
+        exams, exams.c.team_id == ProductTeam.id
+    ).filter(ProductTeam.is_active == True).all()
+    
+    keys = (
+        "name", "code", "description", "is_active", "id", "created_at", "updated_at",
+        "banks_count", "questions_count", "exams_count"
+    )
+    return rows_response(keys, rows)
+
 @router.get("/teams", response_model=List[TeamWithStats])
-async def get_teams(db: Session = Depends(get_db)):
+async def get_teams(
+    fast: bool = Query(False, description="快速模式，跳过模型校验直接序列化"),
+    db: Session = Depends(get_db)
+):
     """获取所有团队列表（带统计信息）"""
     try:
+        if fast:
+            return _get_teams_fast(db)
+        
         # 获取团队基本信息
         teams = db.query(ProductTeam).filter(ProductTeam.is_active == True).all()
         
@@ -181,4 +181,28 @@ class ExamAnalytics(BaseModel):
     high_performers: int
     low_performers: int
     department_stats: List[Dict[str, Any]]
-    weekly_trends: List[Dict[str, Any]]
\ No newline at end of file
+    weekly_trends: List[Dict[str, Any]]
+
+# 考试会话相关模式
+class ExamSessionStart(BaseModel):
+    exam_id: Optional[int] = None  # 为空表示每日测验
+    user_name: str = Field(alias="userName")
+    user_id: Optional[str] = None  # 提供时恢复该用户未交卷的会话
+    department: Optional[str] = None
+    region: Optional[str] = None
+
+    class Config:
+        allow_population_by_field_name = True
+
+class ExamSessionAnswers(BaseModel):
+    answers: Dict[str, Optional[str]]  # {"题目序号": 答案}
+    version: Optional[int] = None  # 客户端递增的版本号，缺省时使用服务器时间
+
+class ExamSessionSubmit(BaseModel):
+    answers: Optional[Dict[str, Optional[str]]] = None  # 为空时按最后一次保存的作答判分
+
+# 性能剖析相关模式
+class ProfilerStartRequest(BaseModel):
+    duration_seconds: float = Field(30, gt=0, le=3600)
+    sample_rate: float = Field(1.0, gt=0, le=1)
+    route: Optional[str] = None  # 路由模板，如 /api/exam-records；为空表示所有路由
@@ -0,0 +1,143 @@
+"""
+慢查询日志 - 记录超过阈值的SQL语句、参数结构、调用路由，
+SQLite 下自动附带 EXPLAIN QUERY PLAN 结果，保存在环形缓冲区中供管理接口查看
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import event
+
+from .config import settings
+from .metrics import Counter, current_route, registry
+
+logger = logging.getLogger("exam_system.slow_query")
+
+SLOW_QUERIES = registry.register(Counter(
+    "db_slow_statements_total", "超过慢查询阈值的SQL语句数"
+))
+
+# 按语句汇总时最多保留的不同语句数
+_MAX_SUMMARY_STATEMENTS = 500
+
+_entries = deque(maxlen=settings.slow_query_buffer_size)
+_summary: Dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+def _param_shape(value: Any):
+    """只记录参数的类型结构，不记录具体取值"""
+    if isinstance(value, dict):
+        return {key: type(item).__name__ for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [type(item).__name__ for item in value]
+    return type(value).__name__
+
+
+def _parameters_shape(parameters, executemany: bool):
+    if executemany:
+        rows = list(parameters or [])
+        return {"executemany": len(rows), "row": _param_shape(rows[0]) if rows else None}
+    return _param_shape(parameters)
+
+
+def _explain(conn, statement: str, parameters) -> List[str]:
+    """在同一连接上执行 EXPLAIN QUERY PLAN（仅 SQLite 的查询语句）"""
+    if conn.dialect.name != "sqlite":
+        return []
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+        return []
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception as e:
+        return [f"EXPLAIN 失败: {e}"]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["slow_query_start"].pop()) * 1000
+    if elapsed_ms < settings.slow_query_threshold_ms:
+        return
+
+    plan = []
+    if settings.slow_query_explain and not executemany:
+        plan = _explain(conn, statement, parameters)
+
+    entry = {
+        "time": datetime.now().isoformat(),
+        "duration_ms": round(elapsed_ms, 2),
+        "route": current_route(),
+        "statement": statement,
+        "parameters_shape": _parameters_shape(parameters, executemany),
+        "plan": plan,
+        "full_scan": any(line.startswith("SCAN") for line in plan)
+    }
+
+    SLOW_QUERIES.inc()
+    with _lock:
+        _entries.append(entry)
+        stats = _summary.get(statement)
+        if stats is None and len(_summary) < _MAX_SUMMARY_STATEMENTS:
+            stats = _summary[statement] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "routes": set()}
+        if stats is not None:
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if entry["route"]:
+                stats["routes"].add(entry["route"])
+
+    logger.warning(
+        "慢查询 %.1fms [%s] %s | 参数: %s | 计划: %s",
+        elapsed_ms, entry["route"] or "-", " ".join(statement.split()),
+        entry["parameters_shape"], "; ".join(plan) or "-"
+    )
+
+
+def install_slow_query_log(engine):
+    """在数据库引擎上挂载慢查询记录（重复调用无副作用）"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def get_slow_queries(limit: int = 50) -> dict:
+    """返回最近的慢查询及按语句汇总的统计"""
+    with _lock:
+        recent = list(_entries)[-limit:][::-1] if limit > 0 else []
+        summary = [
+            {
+                "statement": statement,
+                "count": stats["count"],
+                "avg_ms": round(stats["total_ms"] / stats["count"], 2),
+                "max_ms": round(stats["max_ms"], 2),
+                "routes": sorted(stats["routes"])
+            }
+            for statement, stats in _summary.items()
+        ]
+    summary.sort(key=lambda item: item["count"] * item["avg_ms"], reverse=True)
+    return {
+        "threshold_ms": settings.slow_query_threshold_ms,
+        "buffer_size": _entries.maxlen,
+        "recent": recent,
+        "summary": summary
+    }
+
+
+def clear_slow_queries():
+    """清空慢查询缓冲区"""
+    with _lock:
+        _entries.clear()
+        _summary.clear()
@@ -0,0 +1,53 @@
+"""
+启动耗时统计 - 记录应用导入、建表、路由注册等各阶段耗时，
+启动完成时写入日志，并以指标 app_startup_phase_seconds 导出。
+本模块只依赖标准库，须在 app.main 中最先导入，才能计入其余模块的导入耗时。
+"""
+
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger("exam_system.startup")
+
+_started = time.perf_counter()
+_last = _started
+_phases: List[Tuple[str, float]] = []
+_ready_seconds = None
+
+
+def mark(phase: str):
+    """记录从上一个阶段结束到现在的耗时"""
+    global _last
+    now = time.perf_counter()
+    _phases.append((phase, now - _last))
+    _last = now
+
+
+def mark_ready():
+    """应用启动完成，输出各阶段耗时"""
+    global _ready_seconds
+    mark("server_start")
+    _ready_seconds = time.perf_counter() - _started
+
+    # 指标模块此时已加载，不影响导入阶段的计时
+    from .metrics import Gauge, registry
+    gauge = registry.register(Gauge("app_startup_phase_seconds", "应用启动各阶段耗时（秒）", ("phase",)))
+    for phase, seconds in _phases:
+        gauge.set(phase, value=seconds)
+    logger.info(
+        "启动完成 %.0fms（%s）", _ready_seconds * 1000,
+        ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in _phases)
+    )
+
+
+def summary() -> Dict:
+    """启动耗时汇总"""
+    return {
+        "pid": os.getpid(),
+        "ready_ms": round(_ready_seconds * 1000, 1) if _ready_seconds is not None else None,
+        "phases": [{"phase": phase, "ms": round(seconds * 1000, 1)} for phase, seconds in _phases],
+        "loaded_modules": len(sys.modules)
+    }
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+序列化微基准 - 对比列表接口的两种响应路径：
+旧路径：ORM对象 -> Pydantic模型校验 -> jsonable_encoder -> json
+新路径：列元组 -> orjson
+
+用法: python -m benchmarks.bench_serialization [--rows 1000] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import parse_obj_as
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import Question as QuestionModel, ExamRecord as ExamRecordModel
+from app.schemas import Question, ExamRecord
+from app.fast_json import rows_response
+from app.routers.questions import _FAST_QUESTION_COLUMNS
+from app.routers.exams import _FAST_RECORD_COLUMNS
+
+
+def seed(session, rows: int):
+    """写入测试用的题目和考试记录"""
+    now = datetime.now()
+    session.bulk_insert_mappings(QuestionModel, [
+        {
+            "bank_id": 1,
+            "category": f"分类{i % 8}",
+            "question_type": "single" if i % 4 else "multiple",
+            "question": f"关于第{i}个知识点，以下哪项说法是正确的？" * 2,
+            "option_a": "选项A的内容描述",
+            "option_b": "选项B的内容描述",
+            "option_c": "选项C的内容描述",
+            "option_d": "选项D的内容描述",
+            "answer": "B",
+            "explanation": "这是题目的详细解析，说明正确答案的依据。" * 3,
+            "question_id": i,
+            "created_at": now,
+            "updated_at": now
+        }
+        for i in range(rows)
+    ])
+    session.bulk_insert_mappings(ExamRecordModel, [
+        {
+            "id": f"bench_{i}",
+            "user_name": f"用户{i % 300}",
+            "department": f"部门{i % 12}",
+            "score": (i * 37) % 101,
+            "correct_count": i % 20,
+            "total_questions": 20,
+            "duration": 300 + i % 600,
+            "exam_type": "daily_exam",
+            "detailed_answers": {str(j): "ABCD"[(i + j) % 4] for j in range(20)},
+            "ai_report": "AI分析报告内容。" * 20,
+            "created_at": now - timedelta(minutes=i)
+        }
+        for i in range(rows)
+    ])
+    session.commit()
+
+
+def old_path(session, model, schema):
+    objects = session.query(model).all()
+    validated = parse_obj_as(List[schema], objects)
+    return JSONResponse(jsonable_encoder(validated, by_alias=True)).body
+
+
+def new_path(session, columns):
+    rows = session.query(*[column for _, column in columns]).all()
+    return rows_response([key for key, _ in columns], rows).body
+
+
+def measure(func, repeat: int) -> float:
+    """返回多次运行中的最短耗时（毫秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表接口序列化微基准")
+    parser.add_argument("--rows", type=int, default=1000, help="题目和记录的数量")
+    parser.add_argument("--repeat", type=int, default=20, help="每项重复次数")
+    args = parser.parse_args()
+
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, args.rows)
+
+    cases = [
+        ("questions", QuestionModel, Question, _FAST_QUESTION_COLUMNS),
+        ("exam-records", ExamRecordModel, ExamRecord, _FAST_RECORD_COLUMNS),
+    ]
+
+    print(f"📊 序列化基准（{args.rows} 行，取 {args.repeat} 次最优）")
+    print("=" * 60)
+    print(f"{'接口':<16}{'旧路径(ms)':>12}{'新路径(ms)':>12}{'加速比':>10}")
+    for name, model, schema, columns in cases:
+        old_ms = measure(lambda: (old_path(session, model, schema), session.expunge_all()), args.repeat)
+        new_ms = measure(lambda: new_path(session, columns), args.repeat)
+        print(f"{name:<16}{old_ms:>12.2f}{new_ms:>12.2f}{old_ms / new_ms:>9.1f}x")
+
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
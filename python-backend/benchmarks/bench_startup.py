@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准 - 在独立进程中测量：
+- 导入 app.main 的耗时，并按 `python -X importtime` 输出汇总各依赖包/应用模块的导入耗时
+- 从启动 uvicorn 进程到 /ready 返回200的耗时
+
+可设置预算，超出时以非零状态退出，便于在CI中使用。
+
+用法: python -m benchmarks.bench_startup [--runs 5] [--import-budget-ms 1500] [--ready-budget-ms 3000]
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def _env(workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'startup.db')}"
+    env["PYTHONPATH"] = BACKEND_DIR
+    return env
+
+
+def measure_import(env: Dict[str, str]) -> Tuple[float, List[Tuple[int, int, int, str]]]:
+    """返回 (导入耗时秒, importtime 明细[(自身微秒, 累计微秒, 层级, 模块)])"""
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((int(self_us), int(cumulative_us), len(indent) // 2, module))
+    return float(result.stdout.strip().splitlines()[-1]), entries
+
+
+def breakdown(entries, top: int) -> Dict[str, List[dict]]:
+    """按顶层包汇总自身耗时；应用模块按累计耗时列出"""
+    packages: Dict[str, int] = {}
+    for self_us, _, _, module in entries:
+        package = module.split(".", 1)[0]
+        packages[package] = packages.get(package, 0) + self_us
+    app_modules = [
+        {"module": module, "cumulative_ms": round(cumulative_us / 1000, 1)}
+        for _, cumulative_us, _, module in entries if module == "app" or module.startswith("app.")
+    ]
+    app_modules.sort(key=lambda item: item["cumulative_ms"], reverse=True)
+    return {
+        "packages": [
+            {"package": name, "self_ms": round(us / 1000, 1)}
+            for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+        "app_modules": app_modules[:top]
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(env: Dict[str, str], timeout: float = 60) -> float:
+    """启动 uvicorn 进程并轮询 /ready，返回就绪耗时秒"""
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("服务进程启动失败")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError("等待就绪超时")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5, help="每项测量的次数（取中位数）")
+    parser.add_argument("--top", type=int, default=15, help="导入明细显示的条目数")
+    parser.add_argument("--skip-ready", action="store_true", help="只测量导入耗时")
+    parser.add_argument("--import-budget-ms", type=float, help="导入耗时中位数上限")
+    parser.add_argument("--ready-budget-ms", type=float, help="就绪耗时中位数上限")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="exam-startup-")
+    env = _env(workdir)
+    try:
+        # 先导入一次完成建表和字节码编译，之后的测量都是“热”文件系统下的冷启动
+        measure_import(env)
+        import_times, entries = [], []
+        for _ in range(args.runs):
+            seconds, entries = measure_import(env)
+            import_times.append(seconds)
+        ready_times = [] if args.skip_ready else [measure_ready(env) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        "import_ms": round(statistics.median(import_times) * 1000, 1),
+        "ready_ms": round(statistics.median(ready_times) * 1000, 1) if ready_times else None,
+        "breakdown": breakdown(entries, args.top)
+    }
+
+    print(f"📦 导入 app.main: {result['import_ms']}ms（{args.runs}次中位数）")
+    if result["ready_ms"] is not None:
+        print(f"🚀 启动到 /ready 就绪: {result['ready_ms']}ms")
+    print(f"\n{'依赖包':<28}{'自身耗时(ms)':>14}")
+    for row in result["breakdown"]["packages"]:
+        print(f"{row['package']:<28}{row['self_ms']:>14}")
+    print(f"\n{'应用模块':<36}{'累计耗时(ms)':>14}")
+    for row in result["breakdown"]["app_modules"]:
+        print(f"{row['module']:<36}{row['cumulative_ms']:>14}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    if args.import_budget_ms and result["import_ms"] > args.import_budget_ms:
+        print(f"\n❌ 导入耗时超出预算 {args.import_budget_ms}ms")
+        failed = True
+    if args.ready_budget_ms and result["ready_ms"] and result["ready_ms"] > args.ready_budget_ms:
+        print(f"\n❌ 就绪耗时超出预算 {args.ready_budget_ms}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+考试日负载测试 - 在进程内启动 uvicorn 和模拟大模型服务，
+用合成数据库重放考试日的典型流量，输出各接口的吞吐量与 p50/p95/p99 延迟。
+
+场景：
+- open:    所有考生同时打开正式考试题目 /api/exams/{id}/questions
+- submit:  所有考生在截止时间集中提交 /api/exam-records（触发AI报告生成）
+- admin:   管理员持续轮询 /api/exam-records 与 /api/exam-analytics
+- mixed:   以上三类流量同时进行
+
+用法: python -m benchmarks.load_test [--users 1000] [--records 100000] [--json result.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _stub_llm_app(latency: float):
+    """模拟 OpenAI 兼容的大模型接口，固定延迟后返回报告"""
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+
+    async def chat_completions(request):
+        await asyncio.sleep(latency)
+        return JSONResponse({
+            "choices": [{"message": {"role": "assistant", "content": "模拟AI分析报告"}}],
+            "usage": {"prompt_tokens": 800, "completion_tokens": 300, "total_tokens": 1100}
+        })
+
+    return Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+
+
+class ServerThread(threading.Thread):
+    """在后台线程中运行 uvicorn"""
+
+    def __init__(self, app, port: int):
+        import uvicorn
+        super().__init__(daemon=True)
+        self.server = uvicorn.Server(uvicorn.Config(
+            app, host="127.0.0.1", port=port, log_level="warning", access_log=False
+        ))
+
+    def run(self):
+        self.server.run()
+
+    def wait_started(self, timeout: float = 30):
+        deadline = time.time() + timeout
+        while not self.server.started:
+            if time.time() > deadline:
+                raise RuntimeError("服务启动超时")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.join(timeout=30)
+
+
+class Recorder:
+    """按接口记录延迟与错误"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.started = time.perf_counter()
+
+    def add(self, name: str, seconds: float, ok: bool):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self) -> List[dict]:
+        elapsed = time.perf_counter() - self.started
+        rows = []
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            rows.append({
+                "endpoint": name,
+                "requests": len(values),
+                "errors": self.errors.get(name, 0),
+                "throughput_rps": round(len(values) / elapsed, 1),
+                "p50_ms": round(_percentile(values, 50) * 1000, 1),
+                "p95_ms": round(_percentile(values, 95) * 1000, 1),
+                "p99_ms": round(_percentile(values, 99) * 1000, 1),
+            })
+        return rows
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+async def _timed(client, recorder: Recorder, name: str, method: str, url: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+        ok = response.status_code < 400
+    except Exception:
+        ok = False
+    recorder.add(name, time.perf_counter() - start, ok)
+
+
+async def scenario_open(client, recorder, exam_id: int, users: int):
+    await asyncio.gather(*[
+        _timed(client, recorder, "GET /api/exams/{id}/questions", "GET",
+               f"/api/exams/{exam_id}/questions", params={"sales": "true"},
+               headers={"Accept-Encoding": "gzip, br"})
+        for _ in range(users)
+    ])
+
+
+async def scenario_submit(client, recorder, users: int):
+    async def submit(index: int):
+        answers = {str(j): "ABCD"[(index + j) % 4] for j in range(20)}
+        await _timed(client, recorder, "POST /api/exam-records", "POST", "/api/exam-records", json={
+            "id": f"bench_{uuid.uuid4().hex}",
+            "userName": f"考生{index}",
+            "score": (index * 7) % 101,
+            "correctCount": index % 20,
+            "totalQuestions": 20,
+            "duration": 1200,
+            "exam_type": "formal_exam",
+            "detailed_answers": answers
+        })
+
+    await asyncio.gather(*[submit(i) for i in range(users)])
+
+
+async def scenario_admin(client, recorder, admins: int, duration: float, interval: float):
+    deadline = time.perf_counter() + duration
+
+    async def poll():
+        while time.perf_counter() < deadline:
+            await _timed(client, recorder, "GET /api/exam-records", "GET", "/api/exam-records")
+            await _timed(client, recorder, "GET /api/exam-analytics", "GET", "/api/exam-analytics")
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(*[poll() for _ in range(admins)])
+
+
+async def run_scenarios(base_url: str, args, exam_id: int) -> Dict[str, List[dict]]:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        for scenario in args.scenarios:
+            recorder = Recorder()
+            if scenario == "open":
+                await scenario_open(client, recorder, exam_id, args.users)
+            elif scenario == "submit":
+                await scenario_submit(client, recorder, args.users)
+            elif scenario == "admin":
+                await scenario_admin(client, recorder, args.admins, args.admin_duration, args.admin_interval)
+            elif scenario == "mixed":
+                await asyncio.gather(
+                    scenario_open(client, recorder, exam_id, args.users),
+                    scenario_submit(client, recorder, args.users),
+                    scenario_admin(client, recorder, args.admins, args.admin_duration, args.admin_interval),
+                )
+            results[scenario] = recorder.report()
+    return results
+
+
+def print_report(results: Dict[str, List[dict]]):
+    for scenario, rows in results.items():
+        print(f"\n📈 场景: {scenario}")
+        print(f"{'接口':<34}{'请求':>8}{'错误':>6}{'吞吐(rps)':>11}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+        for row in rows:
+            print(f"{row['endpoint']:<34}{row['requests']:>8}{row['errors']:>6}{row['throughput_rps']:>11}"
+                  f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="考试日负载测试")
+    parser.add_argument("--users", type=int, default=1000, help="同时参加考试的人数")
+    parser.add_argument("--admins", type=int, default=5, help="同时轮询的管理员数")
+    parser.add_argument("--admin-duration", type=float, default=10, help="管理员轮询时长（秒）")
+    parser.add_argument("--admin-interval", type=float, default=1, help="管理员轮询间隔（秒）")
+    parser.add_argument("--concurrency", type=int, default=200, help="客户端最大连接数")
+    parser.add_argument("--teams", type=int, default=5)
+    parser.add_argument("--questions-per-bank", type=int, default=200)
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="模拟大模型的响应延迟（秒）")
+    parser.add_argument("--scenarios", nargs="+", default=["open", "submit", "admin", "mixed"],
+                        choices=["open", "submit", "admin", "mixed"])
+    parser.add_argument("--json", help="把结果写入JSON文件，便于跨提交对比")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="exam-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # 必须在设置 DATABASE_URL 之后再导入应用
+    from app.main import app
+    from app.database import engine
+    from generate_data import generate
+
+    print("🌱 生成合成数据...")
+    info = generate(
+        engine, teams=args.teams, banks_per_team=2, questions_per_bank=args.questions_per_bank,
+        exams=5, questions_per_exam=20, users=max(args.users, 1000), records=args.records, days=180,
+        log=lambda message: print(f"   {message}")
+    )
+
+    llm_port, app_port = _free_port(), _free_port()
+    llm_server = ServerThread(_stub_llm_app(args.llm_latency), llm_port)
+    llm_server.start()
+    llm_server.wait_started()
+
+    with engine.begin() as conn:
+        from sqlalchemy import insert
+        from app.models import SystemConfig
+        conn.execute(insert(SystemConfig.__table__), [{
+            "key": "api_config",
+            "value": json.dumps({
+                "provider": "stub",
+                "url": f"http://127.0.0.1:{llm_port}/v1/chat/completions",
+                "model": "stub-model",
+                "key": "stub-key"
+            }),
+            "config_type": "json"
+        }])
+
+    app_server = ServerThread(app, app_port)
+    app_server.start()
+    app_server.wait_started()
+
+    try:
+        print(f"🚀 开始压测: {args.users} 名考生, {args.admins} 名管理员")
+        results = asyncio.run(run_scenarios(f"http://127.0.0.1:{app_port}", args, info["active_exam_id"]))
+        print_report(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 结果已写入 {args.json}")
+    finally:
+        app_server.stop()
+        llm_server.stop()
+        engine.dispose()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
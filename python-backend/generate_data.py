@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+合成数据生成工具
+按可配置的规模生成团队、题库、题目、考试、考试题目和考试记录，用于规模测试。
+考试记录使用预先序列化的JSON片段和批量写入，千万级记录可在数分钟内生成。
+
+用法:
+    python generate_data.py --records 1000000
+    python generate_data.py --scale xl --database-url sqlite:///./scale_test.db
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 预设规模
+SCALES = {
+    "small": {"teams": 3, "banks_per_team": 2, "questions_per_bank": 100, "exams": 10, "users": 300, "records": 10000,
+              "questions_data_ratio": 1.0},
+    "medium": {"teams": 5, "banks_per_team": 3, "questions_per_bank": 300, "exams": 50, "users": 2000, "records": 200000,
+               "questions_data_ratio": 1.0},
+    "large": {"teams": 10, "banks_per_team": 4, "questions_per_bank": 500, "exams": 200, "users": 10000, "records": 2000000,
+              "questions_data_ratio": 0.2},
+    "xl": {"teams": 20, "banks_per_team": 5, "questions_per_bank": 1000, "exams": 500, "users": 50000, "records": 10000000,
+           "questions_data_ratio": 0.05},
+}
+
+TEAM_NAMES = ["开普兰", "维派特", "左乙拉西坦", "拉考沙胺", "吡仑帕奈", "丙戊酸钠", "奥卡西平", "托吡酯"]
+CATEGORIES = ["疾病", "药品", "竞品", "指南共识", "合规", "销售技巧", "临床研究", "不良反应"]
+DEPARTMENTS = ["华东一区", "华东二区", "华北区", "华南区", "西南区", "华中区", "东北区", "西北区"]
+REGIONS = ["上海", "江苏", "浙江", "北京", "天津", "广东", "四川", "湖北", "辽宁", "陕西", "山东", "福建"]
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘"
+GIVEN = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰红梅琳晨宇轩浩然欣怡子涵"
+EXAM_TYPES = (("daily_exam", 0.6), ("formal_exam", 0.25), ("practice", 0.15))
+
+
+def _placeholders(paramstyle: str, count: int) -> str:
+    if paramstyle == "qmark":
+        return ",".join("?" * count)
+    if paramstyle == "numeric":
+        return ",".join(f":{i + 1}" for i in range(count))
+    return ",".join(["%s"] * count)
+
+
+class BulkWriter:
+    """绕过ORM，直接使用DBAPI executemany 批量写入"""
+
+    def __init__(self, engine, batch_size: int):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.is_sqlite = engine.dialect.name == "sqlite"
+        self.paramstyle = engine.dialect.paramstyle
+
+    def timestamp(self, value: datetime):
+        # SQLAlchemy 在 SQLite 中以字符串保存 DateTime
+        return value.strftime("%Y-%m-%d %H:%M:%S.%f") if self.is_sqlite else value
+
+    def write(self, table: str, columns, rows, progress=None) -> int:
+        sql = f"INSERT INTO {table} ({','.join(columns)}) VALUES ({_placeholders(self.paramstyle, len(columns))})"
+        total = 0
+        raw = self.engine.raw_connection()
+        try:
+            if self.is_sqlite:
+                cursor = raw.cursor()
+                cursor.execute("PRAGMA synchronous=OFF")
+                cursor.close()
+            cursor = raw.cursor()
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    cursor.executemany(sql, batch)
+                    raw.commit()
+                    total += len(batch)
+                    batch = []
+                    if progress:
+                        progress(total)
+            if batch:
+                cursor.executemany(sql, batch)
+                raw.commit()
+                total += len(batch)
+                if progress:
+                    progress(total)
+            cursor.close()
+        finally:
+            raw.close()
+        return total
+
+
+def _next_id(engine, table: str) -> int:
+    with engine.connect() as conn:
+        value = conn.exec_driver_sql(f"SELECT MAX(id) FROM {table}").scalar()
+    return (value or 0) + 1
+
+
+def _weighted_choice(rng: random.Random, options):
+    roll = rng.random()
+    for value, weight in options:
+        roll -= weight
+        if roll <= 0:
+            return value
+    return options[-1][0]
+
+
+def _work_time(rng: random.Random, day: datetime) -> datetime:
+    """工作时间内的随机时刻：上午9点和下午2点前后最集中"""
+    hour = rng.choice((9, 9, 10, 11, 14, 14, 15, 16, 17, 20))
+    return day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60),
+                       microsecond=rng.randrange(1000000))
+
+
+def _snapshot_content(question):
+    """题目在 questions_data 中的内容部分（与 app.question_snapshots.CONTENT_FIELDS 一致）"""
+    return {
+        "question": question["question"],
+        "optionA": question["option_a"],
+        "optionB": question["option_b"],
+        "optionC": question["option_c"],
+        "optionD": question["option_d"],
+        "correct_answer": question["answer"],
+        "question_type": question["question_type"],
+        "category": question["category"],
+        "explanation": question["explanation"],
+    }
+
+
+def _question_entries(question, snapshot_id=None):
+    """预先序列化 questions_data 中每道题在各种作答下的JSON片段（快照引用或旧格式的完整内容）"""
+    if snapshot_id is not None:
+        return {
+            answer: f'[{snapshot_id},"{answer}",{int(answer == question["answer"])}]'
+            for answer in {question["answer"], "A", "B", "C", "D"}
+        }
+    base = {
+        "question": question["question"],
+        "optionA": question["option_a"],
+        "optionB": question["option_b"],
+        "optionC": question["option_c"],
+        "optionD": question["option_d"],
+        "correct_answer": question["answer"],
+    }
+    entries = {}
+    for answer in {question["answer"], "A", "B", "C", "D"}:
+        item = dict(base)
+        item.update({
+            "user_answer": answer,
+            "question_type": question["question_type"],
+            "category": question["category"],
+            "explanation": question["explanation"],
+            "is_correct": answer == question["answer"],
+        })
+        entries[answer] = json.dumps(item, ensure_ascii=False)
+    return entries
+
+
+def generate(engine, teams: int, banks_per_team: int, questions_per_bank: int, exams: int,
+             questions_per_exam: int, users: int, records: int, days: int,
+             questions_data_ratio: float = 1.0, report_ratio: float = 0.8,
+             batch_size: int = 10000, seed: int = 42, legacy_questions_data: bool = False, log=print) -> dict:
+    """生成合成数据，返回生成结果摘要（含一场正在进行的正式考试ID）
+
+    legacy_questions_data: questions_data 按旧格式（每条记录保存完整题目内容的JSON文本）写入，用于测试转换
+    """
+    from app.database import Base
+    import app.models  # noqa: F401  注册所有表
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed)
+    writer = BulkWriter(engine, batch_size)
+    now = datetime.now()
+    ts = writer.timestamp
+    run_tag = f"{int(time.time()):x}"
+
+    # 1. 团队和题库
+    team_start = _next_id(engine, "product_teams")
+    team_ids = list(range(team_start, team_start + teams))
+    writer.write("product_teams", ("id", "name", "code", "description", "is_active", "created_at", "updated_at"), (
+        (team_id, f"{TEAM_NAMES[i % len(TEAM_NAMES)]}团队{i // len(TEAM_NAMES) or ''}",
+         f"syn_{run_tag}_{team_id}", "合成数据团队", True, ts(now), ts(now))
+        for i, team_id in enumerate(team_ids)
+    ))
+
+    bank_start = _next_id(engine, "question_banks")
+    bank_team = {}
+    for i in range(teams * banks_per_team):
+        bank_team[bank_start + i] = team_ids[i // banks_per_team]
+    writer.write("question_banks", ("id", "team_id", "name", "description", "is_active", "created_at", "updated_at"), (
+        (bank_id, team_id, f"题库{bank_id}", "合成数据题库", True, ts(now), ts(now))
+        for bank_id, team_id in bank_team.items()
+    ))
+    log(f"🏢 {teams} 个团队, {len(bank_team)} 个题库")
+
+    # 2. 题目
+    question_start = _next_id(engine, "questions")
+    questions = {}
+    question_id = question_start
+    for bank_id in bank_team:
+        for _ in range(questions_per_bank):
+            is_multiple = rng.random() < 0.2
+            answer = "".join(sorted(rng.sample("ABCD", rng.choice((2, 3))))) if is_multiple else rng.choice("ABCD")
+            category = rng.choice(CATEGORIES)
+            questions[question_id] = {
+                "id": question_id,
+                "bank_id": bank_id,
+                "category": category,
+                "question_type": "multiple" if is_multiple else "single",
+                "question": f"【{category}】第{question_id}题：关于该知识点的描述，以下{'哪些' if is_multiple else '哪项'}是正确的？",
+                "option_a": f"选项A：{category}相关表述一",
+                "option_b": f"选项B：{category}相关表述二",
+                "option_c": f"选项C：{category}相关表述三",
+                "option_d": f"选项D：{category}相关表述四",
+                "answer": answer,
+                "explanation": f"本题考查{category}知识点，正确答案为{answer}，依据最新临床指南与产品说明书。",
+                "difficulty": rng.betavariate(2, 5),
+            }
+            question_id += 1
+    question_columns = ("id", "bank_id", "category", "question_type", "question", "option_a", "option_b",
+                        "option_c", "option_d", "answer", "explanation", "question_id", "created_at", "updated_at")
+    writer.write("questions", question_columns, (
+        (q["id"], q["bank_id"], q["category"], q["question_type"], q["question"], q["option_a"], q["option_b"],
+         q["option_c"], q["option_d"], q["answer"], q["explanation"], q["id"], ts(now), ts(now))
+        for q in questions.values()
+    ))
+    log(f"📚 {len(questions)} 道题目")
+
+    snapshot_ids = {}
+    if not legacy_questions_data:
+        from app.compressed_json import pack
+        from app.question_snapshots import content_hash
+        snapshot_start = _next_id(engine, "question_snapshots")
+        snapshot_rows = []
+        for offset, q in enumerate(questions.values()):
+            content = _snapshot_content(q)
+            snapshot_ids[q["id"]] = snapshot_start + offset
+            snapshot_rows.append((
+                snapshot_start + offset, content_hash(content),
+                pack(json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")),
+                ts(now)
+            ))
+        writer.write("question_snapshots", ("id", "content_hash", "content", "created_at"), snapshot_rows)
+
+    bank_questions = {}
+    for q in questions.values():
+        bank_questions.setdefault(q["bank_id"], []).append(q["id"])
+
+    # 3. 正式考试（最后一场正在进行中）
+    exam_start = _next_id(engine, "exams")
+    exam_rows, exam_question_rows, exam_meta = [], [], []
+    for i in range(exams):
+        exam_id = exam_start + i
+        if i == exams - 1:
+            start_time = now - timedelta(hours=1)
+            end_time = now + timedelta(days=1)
+        else:
+            start_time = _work_time(rng, now - timedelta(days=rng.randrange(1, max(2, days))))
+            end_time = start_time + timedelta(hours=rng.choice((2, 8, 24)))
+        bank_id = rng.choice(list(bank_team))
+        pool = bank_questions[bank_id]
+        chosen = rng.sample(pool, min(questions_per_exam, len(pool)))
+        exam_meta.append((exam_id, bank_id, start_time, end_time, chosen))
+        exam_rows.append((exam_id, f"第{i + 1}期正式考试", "合成数据考试", "formal", rng.choice((20, 30, 45)),
+                          ts(start_time), ts(end_time), True, "generator", ts(start_time), ts(start_time)))
+        exam_question_rows.extend(
+            (exam_id, q_id, index + 1, ts(start_time)) for index, q_id in enumerate(chosen)
+        )
+    writer.write("exams", ("id", "exam_name", "description", "exam_type", "duration_minutes", "start_time",
+                           "end_time", "is_active", "created_by", "created_at", "updated_at"), exam_rows)
+    writer.write("exam_questions", ("exam_id", "question_id", "order_index", "created_at"), exam_question_rows)
+    log(f"📝 {exams} 场考试, {len(exam_question_rows)} 条考试题目关联")
+
+    # 4. 考生名册：每人有固定的团队、部门和能力水平
+    roster = []
+    for i in range(users):
+        team_id = rng.choice(team_ids)
+        name = rng.choice(SURNAMES) + "".join(rng.choice(GIVEN) for _ in range(rng.choice((1, 2))))
+        roster.append({
+            "name": f"{name}{i}",
+            "user_id": f"wx_{run_tag}_{i}",
+            "team_id": team_id,
+            "department": rng.choice(DEPARTMENTS),
+            "region": rng.choice(REGIONS),
+            "ability": min(0.98, max(0.15, rng.gauss(0.72, 0.12))),
+        })
+    team_banks = {}
+    for bank_id, team_id in bank_team.items():
+        team_banks.setdefault(team_id, []).append(bank_id)
+
+    # 5. 考试记录
+    # 每道题预先计算：正确答案、作答正确的难度系数、可选错误答案、各答案对应的JSON片段
+    answer_model = {}
+    for q_id, q in questions.items():
+        wrong = tuple(option for option in "ABCD" if option != q["answer"])
+        answer_model[q_id] = (q["answer"], 1 - q["difficulty"] * 0.5, wrong,
+                              _question_entries(q, snapshot_ids.get(q_id)))
+
+    def questions_value(fragments):
+        if legacy_questions_data:
+            return "[" + ",".join(fragments) + "]"
+        return pack(('{"v":1,"q":[' + ",".join(fragments) + "]}").encode("utf-8"))
+
+    def answers_value(answers):
+        if legacy_questions_data:
+            return "{" + ", ".join(answers) + "}"
+        return pack(("{" + ",".join(answers) + "}").encode("utf-8"))
+
+    rand = rng.random
+
+    def record_rows():
+        for i in range(records):
+            user = roster[int(rand() * len(roster))]
+            exam_type = _weighted_choice(rng, EXAM_TYPES)
+            if exam_type == "formal_exam" and exam_meta:
+                exam_id, bank_id, start_time, end_time, chosen = rng.choice(exam_meta)
+                created_at = start_time + (min(end_time, now) - start_time) * rand()
+                question_ids = chosen
+            else:
+                bank_id = rng.choice(team_banks[user["team_id"]])
+                created_at = _work_time(rng, now - timedelta(days=rng.randrange(days)))
+                count = 3 if exam_type == "daily_exam" else rng.choice((10, 15, 20))
+                pool = bank_questions[bank_id]
+                question_ids = rng.sample(pool, min(count, len(pool)))
+
+            ability = user["ability"]
+            with_questions = rand() < questions_data_ratio
+            answers = []
+            fragments = []
+            correct = 0
+            for index, q_id in enumerate(question_ids):
+                answer, factor, wrong, entries = answer_model[q_id]
+                if rand() < ability * factor:
+                    correct += 1
+                else:
+                    answer = wrong[int(rand() * len(wrong))]
+                answers.append(f'"{index}":"{answer}"')
+                if with_questions:
+                    fragments.append(entries[answer])
+
+            total = len(question_ids)
+            score = round(correct / total * 100) if total else 0
+            duration = int(total * rng.uniform(20, 75))
+            iso_year, iso_week, _ = created_at.isocalendar()
+            yield (
+                f"syn_{run_tag}_{i}", user["name"], user["user_id"], user["team_id"], bank_id,
+                user["department"], user["region"], score, correct, total, duration, exam_type,
+                iso_week, iso_year, answers_value(answers),
+                questions_value(fragments) if with_questions else None,
+                f"{user['name']}本次得分{score}分，建议重点复习错题涉及的知识点。" if rand() < report_ratio else None,
+                ts(created_at),
+            )
+
+    record_columns = ("id", "user_name", "user_id", "team_id", "bank_id", "department", "region", "score",
+                      "correct_count", "total_questions", "duration", "exam_type", "week_number", "year",
+                      "detailed_answers", "questions_data", "ai_report", "created_at")
+    started = time.time()
+    step = max(batch_size, 10 ** max(0, int(math.log10(max(records, 1))) - 1))
+
+    def progress(done):
+        if done % step < batch_size or done == records:
+            rate = done / max(time.time() - started, 1e-6)
+            log(f"   已写入 {done}/{records} 条记录 ({rate:,.0f} 条/秒)")
+
+    writer.write("exam_records", record_columns, record_rows(), progress)
+    log(f"📊 {records} 条考试记录, 用时 {time.time() - started:.1f}s")
+
+    return {
+        "team_ids": team_ids,
+        "bank_ids": list(bank_team),
+        "question_count": len(questions),
+        "exam_ids": [meta[0] for meta in exam_meta],
+        "active_exam_id": exam_meta[-1][0] if exam_meta else None,
+        "record_count": records,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成规模测试用的合成数据")
+    parser.add_argument("--database-url", default="sqlite:///./synthetic_exam_system.db",
+                        help="目标数据库（默认写入独立的 synthetic_exam_system.db，不影响正式数据）")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="预设规模")
+    parser.add_argument("--teams", type=int)
+    parser.add_argument("--banks-per-team", type=int)
+    parser.add_argument("--questions-per-bank", type=int)
+    parser.add_argument("--exams", type=int)
+    parser.add_argument("--questions-per-exam", type=int, default=20)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--records", type=int)
+    parser.add_argument("--days", type=int, default=180, help="记录分布的天数范围")
+    parser.add_argument("--questions-data-ratio", type=float,
+                        help="带完整题目数据(questions_data)的记录比例（每条约数KB，大规模预设默认只生成一部分）")
+    parser.add_argument("--report-ratio", type=float, default=0.8, help="已有AI报告的记录比例")
+    parser.add_argument("--legacy-questions-data", action="store_true",
+                        help="questions_data 按旧格式写入完整题目内容（用于测试 app.question_snapshots backfill）")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    options = dict(SCALES[args.scale])
+    for key in options:
+        value = getattr(args, key)
+        if value is not None:
+            options[key] = value
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import NullPool
+    engine = create_engine(args.database_url, poolclass=NullPool)
+
+    print("🚀 穆桥销售测验系统 - 合成数据生成工具")
+    print("=" * 50)
+    print(f"🎯 目标数据库: {args.database_url}")
+    summary = generate(
+        engine,
+        questions_per_exam=args.questions_per_exam,
+        days=args.days,
+        report_ratio=args.report_ratio,
+        batch_size=args.batch_size,
+        seed=args.seed,
+        legacy_questions_data=args.legacy_questions_data,
+        **options
+    )
+    print("=" * 50)
+    print(f"🎉 生成完成！进行中的正式考试ID: {summary['active_exam_id']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+穆桥销售测验系统 - 生产环境启动脚本（开发调试请使用 start.py）
+
+- 按CPU核数启动多个工作进程
+- 建表只在主进程执行一次：安装了 gunicorn 时预加载应用后再派生工作进程，
+  否则由本脚本先建表，再通过 uvicorn 多进程模式启动
+- 收到 SIGTERM/SIGINT 后停止接收新连接，等待进行中的请求和后台AI报告任务完成
+- 就绪检查: GET /ready，存活检查: GET /health
+- 作答保存缓冲和考试题目缓存在各工作进程内：交卷时页面提交完整作答；按已保存作答判分的交卷和
+  自动交卷会等待两个 EXAM_AUTOSAVE_FLUSH_SECONDS 周期，让其他进程先写入（也可以按会话ID粘性路由）
+
+用法:
+    python serve.py --workers 4 --port 8002
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class ExamApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("preload_app", True)
+            # 留出时间给应用内的后台任务排空
+            self.cfg.set("graceful_timeout", int(args.graceful_timeout) + 10)
+            self.cfg.set("timeout", 120)
+            self.cfg.set("accesslog", "-" if args.access_log else None)
+
+        def load(self):
+            from app.database import engine
+            from app.main import app
+            # 建表使用过的连接不能被派生出的工作进程共用
+            engine.dispose()
+            return app
+
+    ExamApplication().run()
+
+
+def _run_uvicorn(args):
+    import uvicorn
+    from app.database import engine, init_db
+
+    init_db()
+    engine.dispose()
+    # 工作进程重新导入应用，已建表无需重复执行
+    os.environ["AUTO_CREATE_TABLES"] = "false"
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=int(args.graceful_timeout),
+        access_log=args.access_log,
+        proxy_headers=True
+    )
+
+
+def main():
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="生产环境多进程启动")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--workers", type=int, default=settings.web_workers or os.cpu_count() or 1,
+                        help="工作进程数（默认按CPU核数，可用 WEB_WORKERS 配置）")
+    parser.add_argument("--graceful-timeout", type=float, default=settings.shutdown_drain_seconds,
+                        help="停止时等待进行中请求的最长时间（秒）")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "uvicorn"], default="auto",
+                        help="auto: 安装了 gunicorn 时使用 gunicorn 预加载模式")
+    parser.add_argument("--access-log", action="store_true", help="输出访问日志")
+    args = parser.parse_args()
+
+    server = args.server
+    if server == "auto":
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:
+            server = "uvicorn"
+
+    print("🐍 穆桥销售测验系统 - Python后端（生产模式）")
+    print("=" * 50)
+    print(f"📡 监听地址: http://{args.host}:{args.port}")
+    print(f"⚙️  工作进程: {args.workers} ({server})")
+    print(f"✅ 就绪检查: http://localhost:{args.port}/ready")
+    print("=" * 50)
+
+    if server == "gunicorn":
+        _run_gunicorn(args)
+    else:
+        _run_uvicorn(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+测试公共配置 - 在导入应用之前把数据库切换到临时文件，并用合成数据生成固定规模的测试库
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+_WORKDIR = tempfile.mkdtemp(prefix="exam-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_WORKDIR, 'test.db')}"
+os.environ.setdefault("SLOW_QUERY_THRESHOLD_MS", "100000")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 固定规模的测试库，修改后需要同步调整各接口的预算
+FIXTURE_SIZE = {
+    "teams": 3,
+    "banks_per_team": 2,
+    "questions_per_bank": 200,
+    "exams": 3,
+    "questions_per_exam": 20,
+    "users": 200,
+    "records": 3000,
+    "days": 60,
+}
+
+
+@pytest.fixture(scope="session")
+def fixture_db():
+    """生成测试库，返回生成结果摘要"""
+    from app.database import engine
+    from generate_data import generate
+
+    summary = generate(engine, seed=42, log=lambda message: None, **FIXTURE_SIZE)
+    yield summary
+    engine.dispose()
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def empty_engine(tmp_path):
+    """单个测试独享的空数据库（按当前模型建表），不影响性能测试使用的测试库"""
+    from sqlalchemy import create_engine
+
+    from app.database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'unit.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(empty_engine):
+    from sqlalchemy.orm import sessionmaker
+
+    session = sessionmaker(bind=empty_engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(empty_engine):
+    """请求使用 empty_engine 的测试客户端（不执行启动流程）"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import sessionmaker
+
+    from app.database import get_db
+    from app.main import app
+
+    make_session = sessionmaker(bind=empty_engine)
+
+    def _get_db():
+        session = make_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = _get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
@@ -0,0 +1,108 @@
+"""
+性能预算工具 - 统计每个请求执行的SQL次数、读取的行数和耗时
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+import pytest
+from sqlalchemy import event
+
+# 慢速机器上可通过 PERF_TIME_FACTOR 放宽耗时预算，SQL次数和行数预算不受影响
+TIME_FACTOR = float(os.getenv("PERF_TIME_FACTOR", "1"))
+
+_collector: ContextVar[Optional["RequestCost"]] = ContextVar("perf_collector", default=None)
+
+
+class RequestCost:
+    """单个请求的数据库开销"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.statements = []
+        self.open = True
+
+
+def _count_rows(conn, statement, parameters) -> int:
+    """在同一连接上统计查询返回的行数（不触发引擎事件，不计入SQL次数）"""
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*) FROM ({statement})", parameters or ())
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    cost = _collector.get()
+    if cost is None or not cost.open:
+        return
+    cost.queries += 1
+    cost.statements.append(" ".join(statement.split()))
+    if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        cost.rows += _count_rows(conn, statement, parameters)
+
+
+class _CostApp:
+    """为每个请求设置开销统计对象；响应结束后请求内创建的后台任务不再计入"""
+
+    def __init__(self, app):
+        self.app = app
+        self.last: Optional[RequestCost] = None
+
+    async def __call__(self, scope, receive, send):
+        cost = self.last = RequestCost()
+        token = _collector.set(cost)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            cost.open = False
+            _collector.reset(token)
+
+
+class Measurement:
+    def __init__(self, response, cost: RequestCost, seconds: float):
+        self.response = response
+        self.queries = cost.queries
+        self.rows = cost.rows
+        self.statements = cost.statements
+        self.seconds = seconds
+
+    def assert_within(self, queries: int, rows: int, ms: float):
+        detail = "\n".join(self.statements)
+        assert self.response.status_code < 400, self.response.text
+        assert self.queries <= queries, f"SQL次数 {self.queries} 超出预算 {queries}:\n{detail}"
+        assert self.rows <= rows, f"读取行数 {self.rows} 超出预算 {rows}:\n{detail}"
+        budget_ms = ms * TIME_FACTOR
+        assert self.seconds * 1000 <= budget_ms, f"耗时 {self.seconds * 1000:.1f}ms 超出预算 {budget_ms:.0f}ms"
+
+
+@pytest.fixture(scope="session")
+def measure(fixture_db):
+    """measure(method, url, repeat=3, **kwargs)：先预热一次，再取多次请求中的最短耗时"""
+    from fastapi.testclient import TestClient
+    from app.database import engine
+    from app.main import app
+
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    cost_app = _CostApp(app)
+    client = TestClient(cost_app)
+
+    def _measure(method: str, url: str, repeat: int = 3, warmup: bool = True, **kwargs) -> Measurement:
+        if warmup:
+            client.request(method, url, **kwargs)
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.request(method, url, **kwargs)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best.seconds:
+                best = Measurement(response, cost_app.last, elapsed)
+        return best
+
+    yield _measure
+    client.close()
+    event.remove(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,103 @@
+"""
+热点接口性能预算 - 固定规模测试库（见 tests/conftest.py）下的 SQL 次数、读取行数和耗时上限。
+改动路由导致查询次数或读取行数增加时测试会失败；确属预期的变化请同步调整这里的预算。
+"""
+
+import uuid
+
+import pytest
+
+from tests.conftest import FIXTURE_SIZE
+
+pytestmark = pytest.mark.perf
+
+BANK_QUESTIONS = FIXTURE_SIZE["questions_per_bank"]
+ALL_QUESTIONS = FIXTURE_SIZE["teams"] * FIXTURE_SIZE["banks_per_team"] * BANK_QUESTIONS
+
+
+@pytest.mark.parametrize("params, queries, rows, ms", [
+    # 当前题库配置（1行） + 题目列表
+    ({}, 2, 1 + BANK_QUESTIONS, 300),
+    ({"fast": "true"}, 2, 1 + BANK_QUESTIONS, 150),
+    ({"limit": 20}, 2, 1 + 20, 100),
+    ({"limit": 20, "random_sample": "true"}, 2, 1 + BANK_QUESTIONS, 200),
+])
+def test_questions(measure, params, queries, rows, ms):
+    measure("GET", "/api/questions", params=params).assert_within(queries, rows, ms)
+
+
+def test_master_questions(measure):
+    measure("GET", "/api/master-questions").assert_within(1, ALL_QUESTIONS, 1000)
+
+
+def test_exam_questions(measure, fixture_db):
+    exam_id = fixture_db["active_exam_id"]
+    result = measure("GET", f"/api/exams/{exam_id}/questions")
+    result.assert_within(2, FIXTURE_SIZE["questions_per_exam"] + 1, 100)
+
+
+def test_exam_questions_sales_cached(measure, fixture_db):
+    # 预热请求生成缓存后，重复请求不访问数据库
+    exam_id = fixture_db["active_exam_id"]
+    result = measure("GET", f"/api/exams/{exam_id}/questions",
+                     params={"sales": "true"}, headers={"Accept-Encoding": "gzip"})
+    result.assert_within(1, 1, 30)
+    assert result.response.headers["content-encoding"] == "gzip"
+
+
+def _exam_record(record_id: str) -> dict:
+    return {
+        "id": record_id,
+        "userName": "性能测试",
+        "score": 80,
+        "correctCount": 16,
+        "totalQuestions": 20,
+        "duration": 600,
+        "exam_type": "formal_exam",
+        "detailed_answers": {str(i): "A" for i in range(20)}
+    }
+
+
+def test_save_exam_record_create(measure):
+    # 查重 + 当前团队/题库配置 + 写入 + 刷新；后台AI报告任务可能在响应前读取记录和接口配置
+    result = measure("POST", "/api/exam-records", repeat=1, warmup=False,
+                     json=_exam_record(f"perf_{uuid.uuid4().hex}"))
+    result.assert_within(7, 4, 150)
+    assert result.response.json()["action"] == "created"
+
+
+def test_save_exam_record_update(measure):
+    record = _exam_record(f"perf_{uuid.uuid4().hex}")
+    result = measure("POST", "/api/exam-records", json=record)
+    result.assert_within(7, 4, 150)
+    assert result.response.json()["action"] == "updated"
+
+
+def test_exam_session_autosave(measure, fixture_db):
+    # 自动保存只写入内存，由后台任务批量写入，心跳请求不访问数据库
+    start = measure("POST", "/api/exam-sessions", repeat=1, warmup=False,
+                    json={"exam_id": fixture_db["active_exam_id"], "userName": "性能测试"})
+    session_id = start.response.json()["session_id"]
+    result = measure("PUT", f"/api/exam-sessions/{session_id}/answers",
+                     json={"answers": {"0": "A", "1": "B"}})
+    result.assert_within(0, 0, 20)
+
+
+def test_exam_analytics(measure):
+    measure("GET", "/api/exam-analytics").assert_within(1, FIXTURE_SIZE["records"], 600)
+
+
+@pytest.mark.parametrize("params, queries, rows, ms", [
+    # 默认模式每个团队分别统计题库、题目和记录数
+    ({}, 1 + 3 * FIXTURE_SIZE["teams"], 4 * FIXTURE_SIZE["teams"], 100),
+    ({"fast": "true"}, 1, FIXTURE_SIZE["teams"], 100),
+])
+def test_teams(measure, params, queries, rows, ms):
+    measure("GET", "/api/teams", params=params).assert_within(queries, rows, ms)
+
+
+def test_question_banks(measure):
+    # 题库列表 + 每个题库统计题目数 + 按团队懒加载团队名称
+    teams = FIXTURE_SIZE["teams"]
+    banks = teams * FIXTURE_SIZE["banks_per_team"]
+    measure("GET", "/api/question-banks").assert_within(1 + banks + teams, 2 * banks + teams, 100)
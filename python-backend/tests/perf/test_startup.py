@@ -0,0 +1,48 @@
+"""
+启动耗时预算 - 在独立进程中导入应用，检查导入耗时和按需加载的模块
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tests.perf.conftest import TIME_FACTOR
+
+pytestmark = pytest.mark.perf
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 只在用到时才导入的模块（AI报告客户端、性能剖析）
+LAZY_MODULES = ("httpx", "app.ai_report", "cProfile", "pstats")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "loaded": [name for name in %r if name in sys.modules]
+}))
+""" % (LAZY_MODULES,)
+
+
+def _import_app(tmp_path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}", PYTHONPATH=BACKEND_DIR)
+    result = subprocess.run([sys.executable, "-c", _PROBE], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_time(tmp_path):
+    # 第一次导入包含建表和字节码编译
+    _import_app(tmp_path)
+    seconds = min(_import_app(tmp_path)["seconds"] for _ in range(3))
+    budget = 1.5 * TIME_FACTOR
+    assert seconds <= budget, f"导入 app.main 耗时 {seconds * 1000:.0f}ms 超出预算 {budget * 1000:.0f}ms"
+
+
+def test_rarely_used_modules_are_lazy(tmp_path):
+    assert _import_app(tmp_path)["loaded"] == []
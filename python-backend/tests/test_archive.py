@@ -0,0 +1,103 @@
+"""
+考试记录归档 - 归档后按ID读取和数据分析不变，恢复后记录回到 exam_records；重复归档不重复计入汇总
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from app import archive
+from app.config import settings
+from app.models import ArchivedExamRecord, ExamRecord, ExamRecordArchive, ExamRecordRollup
+
+QUESTIONS = [
+    {"question": "题目一", "optionA": "甲", "optionB": "乙", "optionC": "丙", "optionD": "丁",
+     "correct_answer": "A", "user_answer": "A", "question_type": "single", "category": "产品",
+     "explanation": "", "is_correct": True},
+]
+
+
+@pytest.fixture
+def archive_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "archive_dir", str(tmp_path / "archive"))
+    monkeypatch.setattr(settings, "archive_after_days", 60)
+    monkeypatch.setattr(settings, "archive_compression", "gzip")
+    archive._find_line.cache_clear()
+    yield
+    archive._find_line.cache_clear()
+
+
+def _month(months_ago: int) -> datetime:
+    """若干个月前的月初（整月早于保留期）"""
+    day = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for _ in range(months_ago):
+        day = (day - timedelta(days=1)).replace(day=1)
+    return day
+
+
+def _add_records(db, start: datetime, scores, prefix: str = "r"):
+    for i, score in enumerate(scores):
+        db.add(ExamRecord(
+            id=f"{prefix}{start:%Y%m}_{i}", user_name=f"用户{i}", department="销售部" if i % 2 else "市场部",
+            score=score, correct_count=score // 10, total_questions=10, duration=60 + i, exam_type="daily_exam",
+            created_at=start + timedelta(days=i % 20, hours=9), detailed_answers={"0": "A"},
+            questions_data=QUESTIONS
+        ))
+    db.commit()
+
+
+def _rollups(db):
+    return sorted(
+        (row.day, row.department, row.exam_count, row.score_sum, row.high_count, row.low_count)
+        for row in db.query(ExamRecordRollup)
+    )
+
+
+def test_archive_read_through_analytics_and_restore(db, client, archive_settings):
+    month = _month(4)
+    _add_records(db, month, [95, 82, 71, 65, 40, 58, 90, 77])
+    _add_records(db, _month(0), [88, 50], prefix="hot")
+    before = client.get("/api/exam-analytics", params={"days": 365}).json()
+    record_id = f"r{month:%Y%m}_0"
+    original = client.get(f"/api/exam-records/{record_id}").json()
+
+    archived = archive.run_archive(db)
+    assert [item["month"] for item in archived] == [f"{month:%Y-%m}"]
+    assert db.query(func.count()).select_from(ExamRecord).scalar() == 2
+    assert db.query(func.count()).select_from(ArchivedExamRecord).scalar() == 8
+
+    response = client.get(f"/api/exam-records/{record_id}")
+    assert response.status_code == 200
+    assert response.json() == original
+    assert client.get("/api/exam-analytics", params={"days": 365}).json() == before
+
+    assert archive.restore_month(db, f"{month:%Y-%m}") == 8
+    assert db.query(func.count()).select_from(ExamRecord).scalar() == 10
+    assert db.query(ExamRecordRollup).count() == 0
+    assert db.query(ArchivedExamRecord).count() == 0
+    assert db.get(ExamRecord, record_id).questions_data == QUESTIONS
+    assert client.get(f"/api/exam-records/{record_id}").json() == original
+    assert client.get("/api/exam-analytics", params={"days": 365}).json() == before
+
+
+def test_rearchiving_a_month_does_not_duplicate_rollups(db, archive_settings):
+    month = _month(3)
+    _add_records(db, month, [95, 60, 45])
+    assert len(archive.run_archive(db)) == 1
+    first = _rollups(db)
+
+    # 再次执行时该月已没有记录
+    assert archive.run_archive(db) == []
+    assert archive.archive_month(db, f"{month:%Y-%m}") is None
+    assert _rollups(db) == first
+
+    # 之后补录的记录写入下一个分片，计入已有的按日汇总
+    _add_records(db, month, [80], prefix="late")
+    (result,) = archive.run_archive(db)
+    assert result["file_name"].startswith(f"exam_records_{month:%Y-%m}_02")
+    rollups = _rollups(db)
+    assert len(rollups) == len(first)
+    assert sum(row[2] for row in rollups) == 4
+    assert sum(row[3] for row in rollups) == 95 + 60 + 45 + 80
+    assert db.query(ExamRecordArchive).count() == 2
@@ -0,0 +1,27 @@
+"""
+后台任务 - 请求中创建的任务不继承请求的SQL统计
+"""
+
+import asyncio
+
+from app import background
+from app.metrics import RequestStats, _current, current_request_stats
+
+
+def test_spawned_task_does_not_inherit_request_stats():
+    async def in_request():
+        token = _current.set(RequestStats())
+        try:
+            assert current_request_stats() is not None
+            task = background.spawn(asyncio.sleep(0, result=None), kind="test")
+            seen = background.spawn(_read_stats(), kind="test")
+            await task
+            return await seen
+        finally:
+            _current.reset(token)
+
+    async def _read_stats():
+        return current_request_stats()
+
+    assert asyncio.run(in_request()) is None
+    assert background.pending_count() == 0
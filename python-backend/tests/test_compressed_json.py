@@ -0,0 +1,42 @@
+"""
+压缩JSON字段 - 短JSON不压缩、长JSON压缩，读取时兼容旧的JSON文本
+"""
+
+import json
+import zlib
+
+from sqlalchemy import text
+
+from app.compressed_json import MIN_COMPRESS_SIZE, CompressedJSON, decode
+from app.models import ExamRecord
+
+column = CompressedJSON()
+
+
+def test_round_trip():
+    short = {"0": "A"}
+    long = {str(i): "ABCD" for i in range(50)}
+    short_raw = column.process_bind_param(short, None)
+    long_raw = column.process_bind_param(long, None)
+    assert len(short_raw) < MIN_COMPRESS_SIZE and short_raw.startswith(b"{")
+    assert long_raw[:1] == b"\x78" and json.loads(zlib.decompress(long_raw)) == long
+    assert column.process_result_value(short_raw, None) == short
+    assert column.process_result_value(long_raw, None) == long
+    assert column.process_bind_param(None, None) is None
+    assert column.process_result_value(None, None) is None
+
+
+def test_reads_legacy_json_text():
+    assert decode('{"0": "A", "1": "中文"}') == {"0": "A", "1": "中文"}
+    assert decode(memoryview(b'[1, 2]')) == [1, 2]
+    assert decode("") is None
+
+
+def test_legacy_rows_in_database(db):
+    # 压缩存储之前以JSON文本写入的记录
+    db.execute(text(
+        "INSERT INTO exam_records (id, user_name, score, correct_count, total_questions, duration, detailed_answers) "
+        "VALUES ('legacy', '张三', 80, 4, 5, 60, :answers)"
+    ), {"answers": '{"0": "A", "1": "BC"}'})
+    db.commit()
+    assert db.get(ExamRecord, "legacy").detailed_answers == {"0": "A", "1": "BC"}
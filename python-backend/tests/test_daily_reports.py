@@ -0,0 +1,42 @@
+"""
+每日测验报告 - 同一天的报告只保存一份
+"""
+
+from datetime import date
+
+from sqlalchemy.orm import sessionmaker
+
+from app import daily_reports
+from app.models import DailyReport
+
+DAY = date(2024, 5, 1)
+
+
+def _report(participants: int) -> dict:
+    return {"date": DAY.isoformat(), "has_data": True, "statistics": {"total_participants": participants}}
+
+
+def test_save_conflict_keeps_first_report(db):
+    assert daily_reports.save(db, DAY, _report(3)) is True
+    assert daily_reports.save(db, DAY, _report(5)) is False
+    # 冲突只回滚保存点，会话仍可继续使用
+    assert db.query(DailyReport).count() == 1
+    assert daily_reports.stored(db, DAY) == daily_reports.dumps(_report(3)).decode("utf-8")
+
+
+def test_save_conflict_with_another_process(empty_engine, db):
+    other = sessionmaker(bind=empty_engine)()
+    try:
+        assert daily_reports.save(other, DAY, _report(3)) is True
+    finally:
+        other.close()
+    assert daily_reports.save(db, DAY, _report(5)) is False
+    assert db.query(DailyReport.participants).scalar() == 3
+
+
+def test_reports_are_keyed_by_team_and_bank(db):
+    assert daily_reports.save(db, DAY, _report(3)) is True
+    assert daily_reports.save(db, DAY, _report(2), team_id=1) is True
+    assert daily_reports.save(db, DAY, _report(1), team_id=1, bank_id=2) is True
+    assert daily_reports.save(db, DAY, _report(9), team_id=1) is False
+    assert db.query(DailyReport).count() == 3
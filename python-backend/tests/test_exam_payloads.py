@@ -0,0 +1,64 @@
+"""
+正式考试题目负载 - 每种编码的 ETag 不同，If-None-Match 按弱比较匹配
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import exam_payloads
+from app.exam_payloads import etag_matches
+from app.models import Exam, ExamQuestion, Question
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"xyz", W/"abc"', True),
+    ("*", True),
+    ('"abc-gzip"', False),
+    ('"ab"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+@pytest.fixture(autouse=True)
+def _clear_payloads():
+    exam_payloads.invalidate_all_payloads()
+    yield
+    exam_payloads.invalidate_all_payloads()
+
+
+@pytest.fixture
+def exam_id(db):
+    now = datetime.now()
+    exam = Exam(exam_name="季度考试", exam_type="formal", start_time=now - timedelta(hours=1),
+                end_time=now + timedelta(hours=1), is_active=True)
+    question = Question(question="题目", option_a="甲", option_b="乙", answer="A", question_type="single",
+                        category="产品")
+    db.add_all([exam, question])
+    db.flush()
+    db.add(ExamQuestion(exam_id=exam.id, question_id=question.id, order_index=1))
+    db.commit()
+    return exam.id
+
+
+def test_etag_differs_per_encoding(client, exam_id):
+    url = f"/api/exams/{exam_id}/questions?sales=true"
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert plain.status_code == gzipped.status_code == 200
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert plain.json() == gzipped.json()
+    assert plain.headers["etag"] != gzipped.headers["etag"]
+
+    etag = gzipped.headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": header})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+    # gzip 响应体的 ETag 不能用于未压缩的响应
+    response = client.get(url, headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 200
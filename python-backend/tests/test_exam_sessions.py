@@ -0,0 +1,90 @@
+"""
+考试会话 - 交卷时的提交锁、截止时间后的作答和超时自动交卷
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import exam_sessions
+from app.config import settings
+from app.models import ExamRecord, ExamSession, Question
+
+
+@pytest.fixture
+def questions(db):
+    rows = [
+        Question(question=f"题目{i}", option_a="甲", option_b="乙", option_c="丙", option_d="丁",
+                 answer=answer, question_type=question_type, category="产品")
+        for i, (answer, question_type) in enumerate([("A", "single"), ("BC", "multiple"), ("D", "single")])
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def _start(db, questions, minutes_left: float = 10, session_id: str = "s1") -> ExamSession:
+    now = datetime.now()
+    session = ExamSession(
+        id=session_id, exam_type="daily_exam", user_name="张三", user_id="u1", department="销售部",
+        question_ids=[question.id for question in questions],
+        started_at=now - timedelta(minutes=5), deadline=now + timedelta(minutes=minutes_left)
+    )
+    db.add(session)
+    db.commit()
+    exam_sessions.remember(session)
+    return session
+
+
+def test_submit_grades_and_writes_record(db, questions):
+    session = _start(db, questions)
+    record = exam_sessions.submit(db, session, {"0": "A", "1": "CB", "2": "A"})
+    assert record.id == "daily_s1"
+    assert (record.correct_count, record.total_questions, record.score) == (2, 3, 67)
+    db.refresh(session)
+    assert (session.status, session.record_id) == ("submitted", "daily_s1")
+
+
+def test_second_submit_loses_the_claim(db, questions):
+    session = _start(db, questions)
+    # 另一个请求（或进程）读取会话后先交卷
+    other = ExamSession.__table__
+    db.execute(other.update().where(other.c.id == session.id).values(status="submitted"))
+    db.commit()
+    assert exam_sessions.submit(db, session, {"0": "A"}) is None
+    assert db.query(ExamRecord).count() == 0
+
+
+def test_answers_after_deadline_are_ignored(db, questions):
+    session = _start(db, questions, minutes_left=-5)
+    session.answers, session.answers_version = {"0": "A"}, 1
+    db.commit()
+    assert not exam_sessions.accepts_answers(session)
+    record = exam_sessions.submit(db, session, {"0": "A", "1": "BC", "2": "D"})
+    assert record.correct_count == 1
+
+
+def test_settle_delay():
+    now = datetime.now()
+    session = ExamSession(deadline=now + timedelta(minutes=10))
+    settle = settings.exam_autosave_flush_seconds * 2
+    assert exam_sessions.settle_delay(session, {"0": "A"}, now) == 0
+    assert exam_sessions.settle_delay(session, None, now) == pytest.approx(settle)
+    # 截止时间（加宽限）之后足够久，其他进程的保存已写入
+    session.deadline = now - timedelta(seconds=settings.exam_session_grace_seconds + settle + 1)
+    assert exam_sessions.settle_delay(session, {"0": "A"}, now) == 0
+
+
+def test_expire_overdue_waits_for_settle_time(db, questions):
+    grace = settings.exam_session_grace_seconds
+    settle = settings.exam_autosave_flush_seconds * 2
+    recent = _start(db, questions, minutes_left=-(grace + 1) / 60, session_id="recent")
+    overdue = _start(db, questions, minutes_left=-(grace + settle + 60) / 60, session_id="overdue")
+    overdue.answers, overdue.answers_version = {"0": "A", "1": "BC"}, 3
+    db.commit()
+
+    assert exam_sessions.expire_overdue(db) == ["daily_overdue"]
+    db.refresh(recent)
+    db.refresh(overdue)
+    assert (recent.status, overdue.status) == ("active", "expired")
+    assert db.get(ExamRecord, "daily_overdue").correct_count == 2
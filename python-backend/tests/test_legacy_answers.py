@@ -0,0 +1,34 @@
+"""
+旧记录的题目还原 - 作答键按序号还是按题目ID解析
+"""
+
+from types import SimpleNamespace
+
+from app.legacy_answers import plan
+
+
+def _record(answers, total_questions):
+    return SimpleNamespace(detailed_answers=answers, total_questions=total_questions)
+
+
+def test_session_question_order_wins():
+    assert plan(_record({"0": "A", "2": "C"}, 3), [11, 12, 13]) == ([11, 12, 13], {"0": "A", "2": "C"})
+
+
+def test_positional_keys_without_session_are_unresolved():
+    assert plan(_record({"0": "A", "1": "BC"}, 3), None) is None
+
+
+def test_question_id_keys():
+    assert plan(_record('{"105": "A", "230": "BD"}', 2), None) == ([105, 230], {"0": "A", "1": "BD"})
+
+
+def test_mixed_keys_are_unresolved():
+    # "1" 可能是序号也可能是题目ID，不能按题目ID解析
+    assert plan(_record({"1": "A", "105": "B"}, 3), None) is None
+    assert plan(_record({"105": "A", "note": "B"}, 3), None) is None
+
+
+def test_empty_or_invalid_answers():
+    assert plan(_record({}, 3), None) is None
+    assert plan(_record("not json", 3), None) is None
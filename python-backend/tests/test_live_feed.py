@@ -0,0 +1,69 @@
+"""
+管理后台实时推送 - 断线重连只补发本进程发出的事件
+"""
+
+import asyncio
+
+import pytest
+
+from app import live_feed
+
+
+@pytest.fixture(autouse=True)
+def _no_database(monkeypatch):
+    async def snapshot():
+        return {"total_exams": 0}
+
+    monkeypatch.setattr(live_feed, "_fresh_snapshot", snapshot)
+
+
+def _event_id(event: str) -> str:
+    return event.split("\n", 1)[0][len("id: "):]
+
+
+def _connect(last_event_id, count):
+    async def read():
+        events = live_feed.stream(last_event_id)
+        try:
+            return [await events.__anext__() for _ in range(count)]
+        finally:
+            await events.aclose()
+
+    return asyncio.run(read())
+
+
+def test_event_ids_carry_process_epoch():
+    live_feed.publish("ai_report", {"id": "r1"})
+    event_id = _event_id(live_feed.format_event(live_feed._history[-1]))
+    assert event_id == f"{live_feed._epoch}-{live_feed._history[-1][0]}"
+    assert live_feed.parse_event_id(event_id) == live_feed._history[-1][0]
+
+
+@pytest.mark.parametrize("value", [None, "", "12", "other-12", "x-abc"])
+def test_foreign_event_ids_are_ignored(value):
+    assert live_feed.parse_event_id(value) is None
+
+
+def test_reconnect_replays_only_same_process_events():
+    live_feed.publish("ai_report", {"id": "first"})
+    last_seen = live_feed.format_event(live_feed._history[-1])
+    live_feed.publish("ai_report", {"id": "second"})
+    live_feed.publish("ai_report", {"id": "third"})
+
+    events = _connect(_event_id(last_seen), 4)
+    assert events[0].startswith("retry:")
+    assert ['"second"' in events[1], '"third"' in events[2]] == [True, True]
+    assert events[3].startswith("event: aggregates")
+
+    # 其他进程发出的ID（序号相同）不补发，只推送最新统计
+    foreign = "0000-" + _event_id(last_seen).rpartition("-")[2]
+    events = _connect(foreign, 2)
+    assert events[1].startswith("event: aggregates")
+
+
+def test_forked_worker_gets_new_epoch():
+    live_feed.publish("ai_report", {"id": "r1"})
+    epoch = live_feed._epoch
+    live_feed._after_fork()
+    assert live_feed._epoch != epoch
+    assert not live_feed._history
@@ -0,0 +1,69 @@
+"""
+大模型接口保护 - 熔断状态变化
+"""
+
+import pytest
+
+from app import llm_guard
+from app.config import settings
+from app.llm_guard import CLOSED, HALF_OPEN, OPEN, ProviderGuard, ProviderUnavailable
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的 time.monotonic"""
+    now = [1000.0]
+    monkeypatch.setattr(llm_guard.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(settings, "llm_circuit_failure_threshold", 3)
+    monkeypatch.setattr(settings, "llm_circuit_reset_seconds", 30)
+    return now
+
+
+def test_opens_after_consecutive_failures(clock):
+    guard = ProviderGuard("unit-test")
+    for _ in range(2):
+        assert guard._admit() is False
+        guard.failure("timeout")
+    assert guard.state == CLOSED
+    guard.failure("timeout")
+    assert guard.state == OPEN
+    with pytest.raises(ProviderUnavailable):
+        guard._admit()
+
+
+def test_success_resets_failure_count(clock):
+    guard = ProviderGuard("unit-test")
+    guard.failure("timeout")
+    guard.failure("timeout")
+    guard.success()
+    guard.failure("timeout")
+    assert (guard.state, guard.failures) == (CLOSED, 1)
+
+
+def test_half_open_admits_a_single_probe(clock):
+    guard = ProviderGuard("unit-test")
+    for _ in range(3):
+        guard.failure("503")
+    clock[0] += 30
+    assert guard._admit() is True
+    assert guard.state == HALF_OPEN
+    with pytest.raises(ProviderUnavailable):
+        guard._admit()
+
+    guard.success()
+    assert (guard.state, guard.failures) == (CLOSED, 0)
+    assert guard._admit() is False
+
+
+def test_failed_probe_reopens(clock):
+    guard = ProviderGuard("unit-test")
+    for _ in range(3):
+        guard.failure("503")
+    clock[0] += 30
+    assert guard._admit() is True
+    guard.failure("503")
+    assert guard.state == OPEN
+    assert guard.status()["retry_in_seconds"] == 30
+    clock[0] += 29
+    with pytest.raises(ProviderUnavailable):
+        guard._admit()
@@ -0,0 +1,68 @@
+"""
+大模型调用用量 - 增量合并到汇总表，包括其他进程同时插入同一行的情况
+"""
+
+from datetime import date
+
+from sqlalchemy import select
+
+from app import llm_usage
+from app.llm_usage import _COUNT_COLUMNS, _merge, _table
+
+KEY = (date(2024, 5, 1), "api.example.com", "model-a", "report", "200")
+
+
+def _item(calls: int, latency_ms: int) -> dict:
+    item = dict.fromkeys(_COUNT_COLUMNS, 0)
+    item.update(calls=calls, prompt_tokens=100 * calls, latency_ms_sum=latency_ms, latency_le_1s=calls,
+                latency_ms_max=latency_ms)
+    return item
+
+
+def _row(conn):
+    return conn.execute(select(_table.c.calls, _table.c.prompt_tokens, _table.c.latency_ms_max)).one()
+
+
+def test_merge_inserts_then_updates(empty_engine):
+    with empty_engine.begin() as conn:
+        _merge(conn, KEY, _item(2, 800))
+    with empty_engine.begin() as conn:
+        _merge(conn, KEY, _item(1, 300))
+        assert _row(conn) == (3, 300, 800)
+
+
+class _MissFirstUpdate:
+    """第一次 UPDATE 返回0行，模拟更新之后、插入之前其他进程插入了同一行"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.missed = False
+
+    def execute(self, statement, *args):
+        if not self.missed and statement.is_dml and statement.is_update:
+            self.missed = True
+            return type("Result", (), {"rowcount": 0})()
+        return self.conn.execute(statement, *args)
+
+    def begin_nested(self):
+        return self.conn.begin_nested()
+
+
+def test_merge_updates_when_insert_conflicts(empty_engine):
+    with empty_engine.begin() as conn:
+        _merge(conn, KEY, _item(2, 800))
+    with empty_engine.begin() as conn:
+        proxy = _MissFirstUpdate(conn)
+        _merge(proxy, KEY, _item(1, 1500))
+        assert proxy.missed
+        assert _row(conn) == (3, 300, 1500)
+
+
+def test_flush_merges_pending(empty_engine, monkeypatch):
+    monkeypatch.setattr(llm_usage, "_pending", {})
+    llm_usage.record_cache({"url": "https://api.example.com/v1", "model": "model-a"}, "report", hits=2, misses=1)
+    assert llm_usage.flush(empty_engine) == 1
+    with empty_engine.connect() as conn:
+        assert conn.execute(select(_table.c.status, _table.c.cache_hits, _table.c.cache_misses)).one() == (
+            "cache", 2, 1
+        )
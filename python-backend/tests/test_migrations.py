@@ -0,0 +1,56 @@
+"""
+数据库迁移 - 从仓库中的基线数据库升级后，表结构与按当前模型新建的数据库一致；回滚后可再次升级
+"""
+
+import os
+import shutil
+
+from sqlalchemy import create_engine, inspect
+
+from app import migrations
+
+BASELINE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "exam_system.db")
+
+
+def _schema(engine) -> dict:
+    inspector = inspect(engine)
+    schema = {}
+    for table in inspector.get_table_names():
+        if table == "schema_migrations":
+            continue
+        schema[table] = (
+            sorted(column["name"] for column in inspector.get_columns(table)),
+            sorted((index["name"], tuple(index["column_names"]), bool(index["unique"]))
+                   for index in inspector.get_indexes(table)),
+        )
+    return schema
+
+
+def _baseline(tmp_path):
+    path = tmp_path / "baseline.db"
+    shutil.copyfile(BASELINE_DB, path)
+    return create_engine(f"sqlite:///{path}")
+
+
+def test_upgrade_from_baseline_matches_models(tmp_path, empty_engine):
+    engine = _baseline(tmp_path)
+    try:
+        executed = migrations.upgrade(engine)
+        assert executed == [migration.version for migration in migrations.discover()]
+        assert _schema(engine) == _schema(empty_engine)
+        assert migrations.upgrade(engine) == []
+    finally:
+        engine.dispose()
+
+
+def test_downgrade_and_upgrade_again(tmp_path, empty_engine):
+    engine = _baseline(tmp_path)
+    try:
+        migrations.upgrade(engine)
+        latest = migrations.discover()[-1].version
+        rolled_back = migrations.downgrade(engine, "0008")
+        assert rolled_back and rolled_back[0] == latest
+        assert migrations.upgrade(engine) == list(reversed(rolled_back))
+        assert _schema(engine) == _schema(empty_engine)
+    finally:
+        engine.dispose()
@@ -0,0 +1,64 @@
+"""
+按需性能剖析 - 同步路由函数在线程池中执行，其调用同样计入剖析结果
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+
+from app import profiler
+from app.profiler import ProfilingMiddleware
+
+
+def sync_report_work():
+    return sum(i * i for i in range(20000))
+
+
+async def async_report_work():
+    await asyncio.sleep(0)
+    return sum(i * i for i in range(20000))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(profiler, "_instrumented", False)
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_endpoint():
+        return {"value": sync_report_work()}
+
+    @app.get("/async")
+    async def async_endpoint():
+        return {"value": await async_report_work()}
+
+    app.add_middleware(ProfilingMiddleware)
+    yield TestClient(app)
+    profiler.stop_profiling()
+
+
+def _functions(session) -> set:
+    return {name for _, _, name in session.stats.stats}
+
+
+def test_sync_endpoint_runs_under_profiler(client):
+    session = profiler.start_profiling(60)
+    assert client.get("/sync").json()["value"] > 0
+    assert session.profiled_requests == 1
+    assert {"sync_endpoint", "sync_report_work"} <= _functions(session)
+    assert "sync_report_work" in profiler.render_text(session)
+
+
+def test_async_endpoint_and_unprofiled_requests(client):
+    assert client.get("/sync").status_code == 200
+    session = profiler.start_profiling(60, route="/async")
+    client.get("/sync")
+    assert session.stats is None
+    client.get("/async")
+    assert session.profiled_requests == 1
+    assert "async_report_work" in _functions(session)
+    assert "sync_report_work" not in _functions(session)
@@ -0,0 +1,92 @@
+"""
+题目快照 - 考试记录的题目内容按内容去重存储，读取时还原为完整题目列表；旧数据可重复转换
+"""
+
+import json
+
+import pytest
+from sqlalchemy import LargeBinary, func, select, text, type_coerce
+
+from app import question_snapshots
+from app.models import ExamRecord, QuestionSnapshot
+
+
+def _questions(*answers):
+    return [
+        {"question": f"题目{i}", "optionA": "甲", "optionB": "乙", "optionC": "丙", "optionD": "丁",
+         "correct_answer": "A", "user_answer": answer, "question_type": "single", "category": "产品",
+         "explanation": "", "is_correct": answer == "A"}
+        for i, answer in enumerate(answers)
+    ]
+
+
+def _record(record_id, questions_data):
+    return ExamRecord(id=record_id, user_name="张三", score=50, correct_count=1, total_questions=2, duration=60,
+                      detailed_answers={"0": "A"}, questions_data=questions_data)
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    question_snapshots._cache.clear()
+    yield
+    question_snapshots._cache.clear()
+
+
+def _stored(db, record_id):
+    raw = db.execute(select(type_coerce(ExamRecord.__table__.c.questions_data, LargeBinary)).where(
+        ExamRecord.__table__.c.id == record_id
+    )).scalar()
+    return question_snapshots.decode(raw)
+
+
+def test_records_with_same_questions_share_snapshots(db):
+    db.add_all([_record("a", _questions("A", "B")), _record("b", _questions("C", "A"))])
+    db.commit()
+    assert db.query(func.count()).select_from(QuestionSnapshot).scalar() == 2
+    first, second = _stored(db, "a"), _stored(db, "b")
+    assert question_snapshots.is_compact(first) and question_snapshots.is_compact(second)
+    assert [entry[0] for entry in first["q"]] == [entry[0] for entry in second["q"]]
+
+
+def test_questions_data_round_trip(db):
+    record = _record("a", _questions("A", "B"))
+    # 写入前读取的是刚设置的值
+    assert record.questions_data == _questions("A", "B")
+    db.add(record)
+    db.commit()
+    db.expunge_all()
+    assert db.get(ExamRecord, "a").questions_data == _questions("A", "B")
+
+    # 修改后同样换成快照引用
+    loaded = db.get(ExamRecord, "a")
+    loaded.questions_data = _questions("B", "B")
+    db.commit()
+    db.expunge_all()
+    assert db.get(ExamRecord, "a").questions_data == _questions("B", "B")
+    assert db.query(func.count()).select_from(QuestionSnapshot).scalar() == 2
+
+
+def test_backfill_converts_legacy_rows_once(db, empty_engine):
+    legacy = _questions("A", "D")
+    db.execute(text(
+        "INSERT INTO exam_records (id, user_name, score, correct_count, total_questions, duration, "
+        "detailed_answers, questions_data) VALUES (:id, '张三', 50, 1, 2, 60, :answers, :questions)"
+    ), [{"id": record_id, "answers": json.dumps({"0": "A", "1": "D"}),
+         "questions": json.dumps(legacy, ensure_ascii=False)} for record_id in ("old1", "old2")])
+    db.add(_record("new", _questions("A", "B")))
+    db.commit()
+    db.expunge_all()
+    assert db.get(ExamRecord, "old1").questions_data == legacy
+
+    log = []
+    first = question_snapshots.backfill(empty_engine, batch_size=2, log=log.append)
+    assert (first["scanned"], first["converted"]) == (3, 2)
+    second = question_snapshots.backfill(empty_engine, batch_size=2, log=log.append)
+    assert (second["scanned"], second["converted"]) == (3, 0)
+
+    db.expunge_all()
+    assert question_snapshots.is_compact(_stored(db, "old1"))
+    assert db.get(ExamRecord, "old1").questions_data == legacy
+    assert db.get(ExamRecord, "old2").detailed_answers == {"0": "A", "1": "D"}
+    # 快照内容不含作答，三条记录共用两道题的快照
+    assert db.query(func.count()).select_from(QuestionSnapshot).scalar() == 2
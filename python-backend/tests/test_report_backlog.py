@@ -0,0 +1,24 @@
+"""
+AI报告积压处理 - 合并输出按 ===报告 N=== 拆分
+"""
+
+from app.report_backlog import split_sections
+
+
+def test_split_sections():
+    text = "好的，以下是报告：\n===报告 1===\n第一份\n\n=== 报告 2 ===\n第二份\n第二行\n"
+    assert split_sections(text, 2) == {1: "第一份", 2: "第二份\n第二行"}
+
+
+def test_missing_empty_and_out_of_range_sections_are_dropped():
+    text = "===报告 1===\n\n===报告 3===\n第三份\n===报告 9===\n多余\n"
+    assert split_sections(text, 3) == {3: "第三份"}
+
+
+def test_duplicate_section_keeps_first():
+    text = "===报告 1===\n第一份\n===报告 1===\n重复\n"
+    assert split_sections(text, 1) == {1: "第一份"}
+
+
+def test_marker_must_be_on_its_own_line():
+    assert split_sections("正文中提到 ===报告 1=== 的标记", 1) == {}
@@ -0,0 +1,99 @@
+"""
+AI报告缓存 - 错题指纹（答案规范化、与顺序无关、得分区间）和同一指纹的并发生成合并
+"""
+
+import asyncio
+
+import pytest
+
+from app.report_cache import ReportCache, fingerprint
+
+PARAMS = {"model": "model-a", "temperature": 0.7, "prompt": 1}
+
+
+def _item(number: int, user_answer: str, correct_answer: str = "A") -> dict:
+    return {"question": f"题目{number}", "category": "产品", "correct_answer": correct_answer,
+            "user_answer": user_answer, "is_correct": user_answer == correct_answer}
+
+
+def test_fingerprint_normalizes_answers_and_order():
+    analysis = [_item(1, "A"), _item(2, "CB", "AD"), _item(3, "b")]
+    same = [_item(3, " B "), _item(1, "A"), _item(2, "bc", "DA")]
+    assert fingerprint(analysis, 33, 3, PARAMS) == fingerprint(same, 33, 3, PARAMS)
+
+
+def test_fingerprint_ignores_correct_answers():
+    assert fingerprint([_item(1, "A"), _item(2, "B")], 50, 2, PARAMS) == \
+        fingerprint([_item(3, "A"), _item(2, "B")], 50, 2, PARAMS)
+
+
+def test_fingerprint_distinguishes_people():
+    base = fingerprint([_item(1, "B"), _item(2, "A")], 85, 10, PARAMS)
+    # 同一得分区间内的分数相同
+    assert fingerprint([_item(1, "B"), _item(2, "A")], 88, 10, PARAMS) == base
+    assert fingerprint([_item(1, "B"), _item(2, "A")], 92, 10, PARAMS) != base
+    assert fingerprint([_item(1, "C"), _item(2, "A")], 85, 10, PARAMS) != base
+    assert fingerprint([_item(1, "B"), _item(4, "B")], 85, 10, PARAMS) != base
+    assert fingerprint([_item(1, "B"), _item(2, "A")], 85, 20, PARAMS) != base
+    assert fingerprint([_item(1, "B"), _item(2, "A")], 85, 10, {**PARAMS, "model": "model-b"}) != base
+
+
+def test_concurrent_misses_generate_once():
+    cache = ReportCache(max_entries=10, ttl_seconds=60)
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "报告正文"
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_generate("key", generate) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(source for _, source in results) == ["coalesced"] * 4 + ["miss"]
+    assert {body for body, _ in results} == {"报告正文"}
+    assert asyncio.run(cache.get_or_generate("key", generate)) == ("报告正文", "hit")
+
+
+def test_concurrent_waiters_receive_the_error():
+    cache = ReportCache(max_entries=10, ttl_seconds=60)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("接口超时")
+
+    async def run():
+        return await asyncio.gather(*[cache.get_or_generate("key", failing) for _ in range(3)],
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "接口超时" for result in results)
+
+    # 失败不写入缓存，下次重新生成
+    async def generate():
+        return "报告正文"
+
+    assert asyncio.run(cache.get_or_generate("key", generate)) == ("报告正文", "miss")
+
+
+def test_regenerate_bypasses_cache_and_updates_it():
+    cache = ReportCache(max_entries=10, ttl_seconds=60)
+    cache.put("key", "旧正文")
+
+    async def generate():
+        return "新正文"
+
+    assert asyncio.run(cache.get_or_generate("key", generate, use_cache=False)) == ("新正文", "miss")
+    assert cache.get("key") == "新正文"
+
+
+@pytest.mark.parametrize("ttl, expected", [(60, "正文"), (-1, None)])
+def test_entries_expire(ttl, expected):
+    cache = ReportCache(max_entries=10, ttl_seconds=ttl)
+    cache.put("key", "正文")
+    assert cache.get("key") == expected